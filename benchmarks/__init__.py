@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for INTELLIMESH.
+
+Run from the project root, e.g. `python -m benchmarks.bench_pages`. All
+benchmarks use the fake backend (`LLM_BACKEND=fake`) and write JSON results
+to `benchmarks/results/`.
+"""
@@ -0,0 +1,158 @@
+"""
+Embedding provider comparison: throughput and retrieval quality.
+
+The corpus (synthetic, or `--corpus` PDFs) is chunked the way page 9 chunks
+it, then for every provider in `core.embedding_providers` (and every
+`--threads` value for the local one) it measures:
+- chunks_per_sec / chars_per_sec: embedding all chunks in ingest-sized batches
+- query_s: `embed_query` latency (p50/p99)
+- hit_at_k / mrr: each query is a passage cut from a chunk; a hit is that
+  chunk ranking in the top k of exact search over all chunk vectors
+
+Offline, "gemini" is served by the fake backend (deterministic but
+meaningless vectors, `FAKE_EMBEDDING_LATENCY_MS` per batch), so its quality
+numbers are a floor. With `--live` and a GOOGLE_API_KEY the real API is
+called, rate limits included.
+
+Usage:
+    python -m benchmarks.bench_embeddings [--providers gemini local]
+        [--threads 1 4] [--docs 20] [--pages 10] [--queries 200] [--k 4]
+        [--live] [--baseline results/embeddings-....json]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks.common import compare, summarize, use_fake_backend, write_results
+from benchmarks.corpus import load_corpus, synthetic_corpus
+
+QUERY_CHARS = 200
+
+
+def chunk_corpus(corpus, chunk_size, chunk_overlap):
+    from core.ingest import iter_chunks
+    from core.pdf import iter_pages
+
+    chunks = []
+    for data in corpus:
+        chunks.extend(iter_chunks(iter_pages([data]), chunk_size, chunk_overlap))
+    return chunks
+
+
+def make_queries(chunks, count, seed):
+    """(passage, index of the chunk it was cut from) pairs"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        source = rng.randrange(len(chunks))
+        chunk = chunks[source]
+        start = rng.randrange(max(1, len(chunk) - QUERY_CHARS))
+        queries.append((chunk[start:start + QUERY_CHARS], source))
+    return queries
+
+
+def bench_provider(embeddings, chunks, queries, k, batch_size):
+    import faiss
+    import numpy as np
+
+    from core.ingest import batched
+
+    start = time.perf_counter()
+    vectors = []
+    for batch in batched(chunks, batch_size):
+        vectors.extend(embeddings.embed_documents(batch))
+    seconds = time.perf_counter() - start
+
+    index = faiss.IndexFlatL2(len(vectors[0]))
+    index.add(np.asarray(vectors, dtype=np.float32))
+
+    latencies, query_vectors = [], []
+    for text, _ in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(text))
+        latencies.append(time.perf_counter() - start)
+    _, found = index.search(np.asarray(query_vectors, dtype=np.float32), k)
+
+    hits, reciprocal_ranks = 0, 0.0
+    for (_, source), ranked in zip(queries, found):
+        ranked = list(ranked)
+        if source in ranked:
+            hits += 1
+            reciprocal_ranks += 1.0 / (ranked.index(source) + 1)
+    return {
+        "dim": len(vectors[0]),
+        "embed_s": seconds,
+        "chunks_per_sec": len(chunks) / seconds,
+        "chars_per_sec": sum(map(len, chunks)) / seconds,
+        "query_s": summarize(latencies),
+        "hit_at_k": hits / len(queries),
+        "mrr": reciprocal_ranks / len(queries),
+    }
+
+
+def main(argv=None):
+    from core.ingest import CHUNK_OVERLAP, CHUNK_SIZE, EMBED_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="*", default=["gemini", "local"])
+    parser.add_argument("--threads", nargs="*", type=int, default=[1, os.cpu_count() or 1],
+                        help="thread counts to try for the local embedder")
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of the synthetic corpus")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true", help="call the real Gemini API")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/embeddings-<time>.json)")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if not args.live:
+        # The fake backend stands in for the API; don't add the real API's rate limits on top
+        os.environ.setdefault("GEMINI_RPM", "1000000")
+        os.environ.setdefault("GEMINI_TPM", "1000000000")
+        use_fake_backend()
+    from core.embedding_providers import get_embedding_provider
+    from core.embeddings import HashingEmbeddings
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.docs, args.pages, seed=args.seed)
+    chunks = chunk_corpus(corpus, args.chunk_size, args.chunk_overlap)
+    queries = make_queries(chunks, args.queries, args.seed)
+    results = {"corpus": {"documents": len(corpus), "chunks": len(chunks)}}
+    print(f"{len(corpus)} documents, {len(chunks)} chunks, {len(queries)} queries")
+
+    for name in args.providers:
+        provider = get_embedding_provider(name)
+        variants = {name: provider.embeddings()}
+        if isinstance(variants[name], HashingEmbeddings):
+            base = variants.pop(name)
+            for threads in dict.fromkeys(args.threads):
+                variants[f"{name}_threads{threads}"] = HashingEmbeddings(base.dim, base.ngrams, threads)
+        for label, embeddings in variants.items():
+            row = bench_provider(embeddings, chunks, queries, args.k, args.batch_size)
+            results[label] = row
+            print(f"{label:18} dim {row['dim']:4}  {row['chunks_per_sec']:9.1f} chunks/s  "
+                  f"{row['chars_per_sec'] / 1e6:7.2f} Mchars/s  "
+                  f"query p50 {row['query_s']['p50'] * 1000:.2f}ms  "
+                  f"hit@{args.k} {row['hit_at_k']:.3f}  mrr {row['mrr']:.3f}")
+
+    write_results("embeddings", results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Cold-start and warm-rerun budget check for every page.
+
+Each page is run in a fresh interpreter under `python -X importtime` (fake
+backend, Streamlit `AppTest`), so the first run pays every import the page
+triggers, exactly like the first visit after a server start. For each page it
+reports:
+- cold_run_s: first run of the script in a fresh process
+- rerun_s: the following (warm) rerun
+- top_imports: the slowest top-level imports triggered by the page itself
+
+Usage:
+    python -m benchmarks.bench_imports [--pages 5 9] [--budgets budgets.json]
+
+Exits with status 1 when any page fails, raises an exception (a page that
+crashes early is fast, not fine) or exceeds its budget. Budgets are seconds per
+page stem, e.g. {"9_chat_with_pdf": {"cold_run_s": 1.5, "rerun_s": 0.2}};
+pages without an entry use "default".
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+from benchmarks.common import ROOT, write_results
+
+DEFAULT_BUDGETS = {
+    "default": {"cold_run_s": 2.0, "rerun_s": 0.3},
+}
+
+_CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from benchmarks.common import use_fake_backend
+use_fake_backend()
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+sys.stderr.write("--- page start ---\\n"); sys.stderr.flush()
+at = AppTest.from_file({path!r}, default_timeout=120)
+start = time.perf_counter(); at.run(); cold = time.perf_counter() - start
+start = time.perf_counter(); at.run(); warm = time.perf_counter() - start
+print(json.dumps({{
+    "cold_run_s": cold,
+    "rerun_s": warm,
+    "new_modules": len(set(sys.modules) - before),
+    "exceptions": [str(e.value) for e in at.exception],
+}}))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _top_imports(stderr, limit):
+    """Slowest top-level imports logged after the page started running"""
+    _, _, page_part = stderr.partition("--- page start ---")
+    imports = []
+    for match in _IMPORTTIME.finditer(page_part):
+        _, cumulative, indent, name = match.groups()
+        if len(indent) <= 1:  # top-level import, not a nested one
+            imports.append((int(cumulative) / 1e6, name))
+    imports.sort(reverse=True)
+    return [{"module": name, "cumulative_s": seconds} for seconds, name in imports[:limit]]
+
+
+def profile_page(path, top):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(root=str(ROOT), path=str(path))],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["top_imports"] = _top_imports(proc.stderr, top)
+    return result
+
+
+def check_budget(page, result, budgets):
+    budget = budgets.get(page, budgets.get("default", {}))
+    return [
+        f"{page}: {metric} {result[metric]:.3f}s > budget {limit:.3f}s"
+        for metric, limit in budget.items()
+        if metric in result and result[metric] > limit
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="*", help="page numbers to run (default: all)")
+    parser.add_argument("--budgets", help="JSON file with per-page budgets")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to report per page")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/imports-<time>.json)")
+    args = parser.parse_args(argv)
+
+    budgets = dict(DEFAULT_BUDGETS)
+    if args.budgets:
+        with open(args.budgets) as f:
+            budgets.update(json.load(f))
+
+    pages = sorted((ROOT / "pages").glob("*.py"), key=lambda p: int(p.name.split("_", 1)[0]))
+    if args.pages:
+        pages = [p for p in pages if p.name.split("_", 1)[0] in args.pages]
+
+    results, failures = {}, []
+    for path in pages:
+        result = profile_page(path, args.top)
+        results[path.stem] = result
+        if "error" in result:
+            failures.append(f"{path.stem}: {result['error']}")
+            print(f"{path.stem:32} ERROR {result['error']}")
+            continue
+        if result["exceptions"]:
+            failures.append(f"{path.stem}: raised {'; '.join(result['exceptions'])}")
+        failures.extend(check_budget(path.stem, result, budgets))
+        slowest = ", ".join(f"{i['module']} {i['cumulative_s']:.2f}s" for i in result["top_imports"][:3])
+        print(f"{path.stem:32} cold {result['cold_run_s']:.3f}s  rerun {result['rerun_s']:.3f}s  [{slowest}]"
+              + (f"  errors: {result['exceptions']}" if result["exceptions"] else ""))
+
+    write_results("imports", {"budgets": budgets, "pages": results}, args.output)
+    for line in failures:
+        print(f"FAILED {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
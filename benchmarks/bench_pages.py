@@ -0,0 +1,196 @@
+"""
+End-to-end page benchmark driven by Streamlit's `AppTest` and the fake backend.
+
+For every page script it measures:
+- cold_run_s: first script run in this process (imports, first render)
+- rerun_s: warm reruns with no interaction (what every widget change costs)
+- e2e_s: a scripted interaction (fill the inputs, press the main button)
+- peak_mem_mb: peak Python heap allocation (tracemalloc) during the page run
+
+File uploads can't be scripted, so for the PDF page (9) the text extraction
+its "Process" button runs is measured directly, on a synthetic PDF: serial,
+then through the process pool (cold, including worker start-up, and warm).
+
+Usage:
+    python -m benchmarks.bench_pages [--pages 1 3] [--reruns 5]
+                                     [--pdf-pages 400] [--pdf-padding-mb 50]
+                                     [--baseline results/pages-....json]
+
+Exits with status 1 if `--baseline` is given and a timing/memory metric got
+worse by more than `--tolerance`.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import ROOT, compare, summarize, use_fake_backend, write_results
+
+PAGES_DIR = ROOT / "pages"
+
+
+def _button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+
+def _text_generation(at):
+    at.text_area[0].input("Write a short story about a robot learning to paint")
+    _button(at, "🚀 Generate Text").click()
+
+
+def _code_generator(at):
+    at.text_area[0].input("A function that reverses a string")
+    _button(at, "Generate Code").click()
+
+
+def _document_summarizer(at):
+    at.text_area[0].input("Streamlit reruns the script on every interaction. " * 50)
+    _button(at, "Summarize").click()
+
+
+def _chat_assistant(at):
+    at.text_input(key="chat_input").input("What can you help me with?")
+    _button(at, "📤 Send").click()
+
+
+def _translation_tool(at):
+    at.text_area[0].input("Good morning, how are you today?")
+    _button(at, "Translate").click()
+
+
+def _sql_query(at):
+    at.button(key="load_sample").click().run()
+    at.text_input(key="natural_query").input("Show all students")
+    _button(at, "🚀 Generate & Execute").click()
+
+
+# Pages that need a file upload (not supported by AppTest) are rerun-only
+SCENARIOS = {
+    "1_text_generation.py": _text_generation,
+    "3_code_generator.py": _code_generator,
+    "4_document_summarizer.py": _document_summarizer,
+    "5_chat_assistant.py": _chat_assistant,
+    "6_translation_tool.py": _translation_tool,
+    "10_natural_lang_sql_query.py": _sql_query,
+}
+
+
+def bench_pdf_extraction(pages, padding_mb):
+    from benchmarks.corpus import synthetic_corpus
+    from core.pdf import MAX_WORKERS, iter_pages
+
+    data = synthetic_corpus(docs=1, pages=pages, padding=int(padding_mb * 1024 * 1024))[0]
+    workers = max(2, MAX_WORKERS)  # the pool path even on one CPU (pool size: PDF_WORKERS)
+    result = {"pages": pages, "pdf_mb": len(data) / (1024 * 1024), "workers": MAX_WORKERS}
+    # Timed untraced: tracemalloc slows the serial path (in this process) but not the workers
+    for name, run_workers in (("serial", 1), ("pool_cold", workers), ("pool", workers)):
+        start = time.perf_counter()
+        extracted = sum(1 for _ in iter_pages([data], run_workers))
+        result[f"{name}_s"] = time.perf_counter() - start
+        assert extracted == pages, f"extracted {extracted} of {pages} pages"
+    tracemalloc.start()
+    for _ in iter_pages([data], workers):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["pool_peak_mem_mb"] = peak / (1024 * 1024)
+    return result
+
+
+def _page_files(selected):
+    files = sorted(PAGES_DIR.glob("*.py"), key=lambda p: int(p.name.split("_", 1)[0]))
+    if selected:
+        files = [p for p in files if p.name.split("_", 1)[0] in selected]
+    return files
+
+
+def bench_page(path, reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    result = {"scenario": path.name in SCENARIOS}
+    tracemalloc.start()
+    try:
+        at = AppTest.from_file(str(path), default_timeout=timeout)
+
+        start = time.perf_counter()
+        at.run()
+        result["cold_run_s"] = time.perf_counter() - start
+
+        samples = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - start)
+        result["rerun_s"] = summarize(samples)
+
+        scenario = SCENARIOS.get(path.name)
+        if scenario is not None:
+            start = time.perf_counter()
+            scenario(at)
+            at.run()
+            result["e2e_s"] = time.perf_counter() - start
+
+        result["exceptions"] = [str(e.value) for e in at.exception]
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    result["peak_mem_mb"] = peak / (1024 * 1024)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="*", help="page numbers to run (default: all)")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--pdf-pages", type=int, default=400, help="pages of the PDF extraction benchmark (0 = skip)")
+    parser.add_argument("--pdf-padding-mb", type=float, default=50.0,
+                        help="non-text bytes added to that PDF (images in a real document)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pages-<time>.json)")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    use_fake_backend()
+    results = {}
+    # Pages write chat history / indexes to the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for path in _page_files(args.pages):
+                page = path.stem
+                results[page] = bench_page(path, args.reruns, args.timeout)
+                row = results[page]
+                print(
+                    f"{page:32} cold {row['cold_run_s']:.3f}s  "
+                    f"rerun p50 {row['rerun_s'].get('p50', 0):.3f}s  "
+                    f"e2e {row.get('e2e_s', float('nan')):.3f}s  "
+                    f"peak {row['peak_mem_mb']:.1f}MB"
+                    + (f"  errors: {row['exceptions']}" if row["exceptions"] else "")
+                )
+                if path.name == "9_chat_with_pdf.py" and args.pdf_pages:
+                    row["pdf_extract"] = extract = bench_pdf_extraction(args.pdf_pages, args.pdf_padding_mb)
+                    print(
+                        f"{'  pdf extraction':32} {extract['pages']} pages / {extract['pdf_mb']:.0f}MB: "
+                        f"serial {extract['serial_s']:.2f}s  pool cold {extract['pool_cold_s']:.2f}s  "
+                        f"warm {extract['pool_s']:.2f}s  peak {extract['pool_peak_mem_mb']:.1f}MB"
+                    )
+        finally:
+            os.chdir(cwd)
+
+    write_results("pages", results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
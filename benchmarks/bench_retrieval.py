@@ -0,0 +1,196 @@
+"""
+Offline retrieval benchmark for the PDF question-answering path (page 9).
+
+A synthetic PDF corpus (`benchmarks/corpus.py`, or `--corpus` for a
+directory of real PDFs) is embedded with a deterministic local embedder
+(`--embedder local`, the CPU hashing embedder, or `fake`, the fake backend's
+random unit vectors - the worst case for approximate indexes), then for
+every chunking configuration it measures:
+- ingest: pages/s and chunks/s through `core.ingest.ingest_pdfs`
+  (extract -> chunk -> embed -> flat index, no cache)
+
+and for every chunking x index spec (`core.vector_index.INDEX_SPECS`):
+- build_s: training + adding all vectors
+- index_bytes / rss_mb: serialized index size and resident memory growth
+- query_s: latency of `similarity_search_by_vector` (p50/p99)
+- recall_at_k: overlap of the top-k with exact (flat) search on the same vectors
+
+Usage:
+    python -m benchmarks.bench_retrieval [--docs 40] [--pages 25]
+        [--chunking 10000:1000 2000:200] [--specs flat ivf-flat hnsw ivf-pq]
+        [--queries 200] [--k 4] [--embedder local] [--baseline results/retrieval-....json]
+
+Exits with status 1 if `--baseline` is given and a timing/memory metric got
+worse by more than `--tolerance`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import compare, summarize, use_fake_backend, write_results
+from benchmarks.corpus import load_corpus, synthetic_corpus
+
+QUERY_CHARS = 200
+
+
+def _rss_mb():
+    """Current resident set size (Linux only, else None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RecordingEmbeddings(Embeddings):
+    """Passes calls through and keeps every document (text, vector) in add order"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.pairs = []
+
+    def embed_documents(self, texts):
+        vectors = self.inner.embed_documents(texts)
+        self.pairs.extend(zip(texts, vectors))
+        return vectors
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+def bench_ingest(corpus, embeddings, chunk_size, chunk_overlap):
+    from core.ingest import ingest_pdfs
+
+    recorder = RecordingEmbeddings(embeddings)
+    _, stats = ingest_pdfs(corpus, recorder, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                           index_spec="flat")
+    seconds = stats["seconds"] or float("nan")
+    result = {
+        "pages": stats["pages"],
+        "chunks": stats["chunks"],
+        "ingest_s": stats["seconds"],
+        "pages_per_sec": stats["pages"] / seconds,
+        "chunks_per_sec": stats["chunks"] / seconds,
+    }
+    return result, recorder.pairs
+
+
+def bench_index(spec, pairs, embeddings, queries, k, batch_size=64):
+    import faiss
+    import numpy as np
+
+    from core.vector_index import IndexBuilder
+
+    rss_before = _rss_mb()
+    builder = IndexBuilder(embeddings, spec)
+    for start in range(0, len(pairs), batch_size):
+        builder.add(pairs[start:start + batch_size])
+    store = builder.finish()
+    rss_after = _rss_mb()
+
+    latencies = []
+    for vector in queries:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(vector.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+
+    vectors = np.asarray([vector for _, vector in pairs], dtype=np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, expected = exact.search(queries, k)
+    _, found = store.index.search(queries, k)
+    hits = sum(len(set(e[e >= 0]) & set(f[f >= 0])) for e, f in zip(expected, found))
+    return {
+        "index": builder.factory,
+        "build_s": builder.build_seconds,
+        "index_bytes": int(faiss.serialize_index(store.index).nbytes),
+        "rss_mb": None if rss_before is None else rss_after - rss_before,
+        "query_s": summarize(latencies),
+        "recall_at_k": hits / (len(queries) * min(k, len(pairs))),
+    }
+
+
+def _query_vectors(pairs, embeddings, count, seed):
+    """Embed `count` random passages cut from the indexed chunks"""
+    import numpy as np
+
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        chunk = rng.choice(pairs)[0]
+        start = rng.randrange(max(1, len(chunk) - QUERY_CHARS))
+        texts.append(chunk[start:start + QUERY_CHARS])
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def _chunking(value):
+    size, overlap = value.split(":")
+    return int(size), int(overlap)
+
+
+def main(argv=None):
+    from core.vector_index import INDEX_SPECS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of the synthetic corpus")
+    parser.add_argument("--docs", type=int, default=40, help="synthetic documents")
+    parser.add_argument("--pages", type=int, default=25, help="pages per synthetic document")
+    parser.add_argument("--chunking", nargs="*", type=_chunking, default=[(10000, 1000), (2000, 200)],
+                        help="chunk_size:chunk_overlap pairs")
+    parser.add_argument("--specs", nargs="*", default=list(INDEX_SPECS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embedder", choices=["local", "fake"], default="local")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/retrieval-<time>.json)")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    # Measure the local pipeline, not simulated network time or the rate limiter
+    os.environ.setdefault("FAKE_EMBEDDING_LATENCY_MS", "0")
+    use_fake_backend()
+    from core import models
+    from core.embedding_providers import get_embedding_provider
+
+    if args.embedder == "local":
+        embeddings = get_embedding_provider("local").embeddings()
+    else:
+        embeddings = models.get_backend().embeddings("models/embedding-001")
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.docs, args.pages, seed=args.seed)
+    results = {"corpus": {"documents": len(corpus), "bytes": sum(map(len, corpus)), "embedder": args.embedder}}
+    for chunk_size, chunk_overlap in args.chunking:
+        name = f"chunk{chunk_size}_overlap{chunk_overlap}"
+        ingest, pairs = bench_ingest(corpus, embeddings, chunk_size, chunk_overlap)
+        print(f"{name:28} {ingest['pages']} pages  {ingest['chunks']} chunks  "
+              f"{ingest['pages_per_sec']:.0f} pages/s  {ingest['chunks_per_sec']:.0f} chunks/s")
+        entry = {"ingest": ingest, "indexes": {}}
+        if pairs:
+            queries = _query_vectors(pairs, embeddings, args.queries, args.seed)
+            for spec in args.specs:
+                row = bench_index(spec, pairs, embeddings, queries, args.k)
+                entry["indexes"][spec] = row
+                print(f"  {spec:10} {row['index']:18} build {row['build_s']:.3f}s  "
+                      f"{row['index_bytes'] / 1024 ** 2:.1f}MB  "
+                      f"query p50 {row['query_s']['p50'] * 1000:.2f}ms p99 {row['query_s']['p99'] * 1000:.2f}ms  "
+                      f"recall@{args.k} {row['recall_at_k']:.3f}")
+        results[name] = entry
+
+    write_results("retrieval", results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
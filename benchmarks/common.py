@@ -0,0 +1,107 @@
+"""Helpers shared by the benchmark scripts: result files and regression checks"""
+
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def use_fake_backend():
+    """Point the shared model registry at the offline fake backend"""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from core import models
+
+    models.use_backend("fake")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of a non-empty list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    """p50/p99/mean/max of a list of samples"""
+    if not values:
+        return {}
+    return {
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+        "mean": statistics.fmean(values),
+        "max": max(values),
+        "n": len(values),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name, results, output=None):
+    """Write `results` with run metadata to `output` (default results/<name>-<time>.json)"""
+    payload = {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    Path(output).write_text(json.dumps(payload, indent=2, default=str))
+    print(f"Results written to {output}")
+    return output
+
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(results, baseline_path, tolerance=0.2, lower_is_better=("_s", "_mb", "seconds", "bytes")):
+    """
+    Compare numeric results against a previous results file.
+
+    Returns:
+        list[str]: one line per metric that got worse by more than `tolerance`
+        (only metrics whose name ends with one of `lower_is_better` are checked)
+    """
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    old, new = _flatten(baseline), _flatten(results)
+    regressions = []
+    for path, value in sorted(new.items()):
+        before = old.get(path)
+        leaf = path.rsplit(".", 1)[-1]
+        parent = path.rsplit(".", 2)[-2] if path.count(".") >= 1 else ""
+        if before is None or before <= 0:
+            continue
+        if not any(leaf.endswith(s) or parent.endswith(s) for s in lower_is_better):
+            continue
+        if value > before * (1 + tolerance):
+            regressions.append(f"{path}: {before:.4g} -> {value:.4g} (+{(value / before - 1) * 100:.0f}%)")
+    return regressions
@@ -0,0 +1,87 @@
+"""
+Synthetic PDF corpus for the retrieval benchmarks.
+
+Documents are generated from a seeded RNG, so every run (and every machine)
+sees the same text: each document draws most of its words from its own
+"topic" vocabulary and the rest from a shared one, which gives chunks that
+are similar within a document and different across documents. The PDFs are
+written by a minimal writer (one Helvetica text object per page), good
+enough for PyPDF2 to extract the text back.
+"""
+
+import random
+from pathlib import Path
+
+SYLLABLES = ("ka", "lo", "mi", "ren", "tas", "vo", "qui", "del", "sar", "nu", "pe", "zor", "hin", "ba", "tel")
+LINE_CHARS = 90
+
+
+def _vocabulary(rng, size):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages, padding=0):
+    """
+    PDF bytes with one page per string in `pages` (latin-1 text), plus
+    `padding` bytes of unreferenced stream data standing in for images
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = [text[j:j + LINE_CHARS] for j in range(0, len(text), LINE_CHARS)]
+        ops = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+    if padding:
+        objects.append(f"<< /Length {padding} >>\nstream\n{'0' * padding}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def synthetic_corpus(docs=40, pages=25, chars_per_page=3000, seed=0, padding=0):
+    """`docs` PDFs (as bytes) of `pages` pages each (see `write_pdf` for `padding`)"""
+    rng = random.Random(seed)
+    shared = _vocabulary(rng, 2000)
+    corpus = []
+    for _ in range(docs):
+        topic = _vocabulary(rng, 300)
+        texts = []
+        for _ in range(pages):
+            words, length = [], 0
+            while length < chars_per_page:
+                sentence = [
+                    rng.choice(topic) if rng.random() < 0.6 else rng.choice(shared)
+                    for _ in range(rng.randint(8, 16))
+                ]
+                sentence = " ".join(sentence).capitalize() + ". "
+                words.append(sentence)
+                length += len(sentence)
+            texts.append("".join(words))
+        corpus.append(write_pdf(texts, padding))
+    return corpus
+
+
+def load_corpus(directory):
+    """All `*.pdf` files under `directory` (as bytes), sorted by path"""
+    return [path.read_bytes() for path in sorted(Path(directory).rglob("*.pdf"))]
@@ -0,0 +1,7 @@
+"""
+Shared runtime for the INTELLIMESH pages.
+
+Everything in here is process-wide: Streamlit re-executes each page script on
+every rerun, so state that should outlive a rerun (model handles, caches,
+schedulers) lives in these modules instead of in the pages themselves.
+"""
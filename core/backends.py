@@ -0,0 +1,96 @@
+"""
+Model backends used by the shared model registry.
+
+A backend knows how to configure its client library once per process and how
+to build the three kinds of handles the pages need: raw `GenerativeModel`
+objects, LangChain chat models and LangChain embeddings. The Gemini backend is
+the default; other backends (e.g. an offline fake) register themselves with
+`register_backend()` and are selected with the `LLM_BACKEND` env variable.
+"""
+
+import os
+
+
+class ConfigurationError(RuntimeError):
+    """Raised when a backend cannot be configured (e.g. missing API key)"""
+
+
+class Backend:
+    """Interface every model backend implements"""
+
+    name = "base"
+
+    def configure(self):
+        """Configure the client library. Called once per process."""
+        raise NotImplementedError
+
+    def generative_model(self, model_name, generation_config=None):
+        """Return a handle exposing `generate_content(...)`"""
+        raise NotImplementedError
+
+    def chat_model(self, model_name, **params):
+        """Return a LangChain-compatible chat model (`invoke`, `stream`)"""
+        raise NotImplementedError
+
+    def embeddings(self, model_name):
+        """Return a LangChain-compatible embeddings object"""
+        raise NotImplementedError
+
+
+class GeminiBackend(Backend):
+    """Google Gemini through `google.generativeai` and `langchain_google_genai`"""
+
+    name = "gemini"
+
+    def configure(self):
+        import google.generativeai as genai
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ConfigurationError("GOOGLE_API_KEY not found in .env file")
+        # genai keeps one client (and its gRPC channel) per process once configured
+        genai.configure(api_key=api_key)
+
+    def generative_model(self, model_name, generation_config=None):
+        import google.generativeai as genai
+
+        return genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def chat_model(self, model_name, **params):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(model=model_name, **params)
+
+    def embeddings(self, model_name):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=model_name)
+
+
+def _fake_backend():
+    from core.fake_backend import FakeBackend
+
+    return FakeBackend()
+
+
+_BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    "fake": _fake_backend,
+}
+
+
+def register_backend(name, factory):
+    """Make a backend selectable by name (via `LLM_BACKEND` or `use_backend`)"""
+    _BACKENDS[name] = factory
+
+
+def create_backend(name=None):
+    """Instantiate the backend called `name` (defaults to `LLM_BACKEND` or gemini)"""
+    name = name or os.getenv("LLM_BACKEND", GeminiBackend.name)
+    try:
+        factory = _BACKENDS[name]
+    except KeyError:
+        raise ConfigurationError(
+            f"Unknown LLM backend '{name}'. Available: {', '.join(sorted(_BACKENDS))}"
+        ) from None
+    return factory()
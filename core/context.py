@@ -0,0 +1,162 @@
+"""
+Token-budgeted context packing for the RAG page.
+
+Retrieved chunks overlap (the chunker repeats up to `CHUNK_OVERLAP`
+characters between neighbours) and are large, so "stuffing" the raw top-k
+into the prompt sends a lot of duplicated text. `pack_context` takes more
+candidates than needed, most relevant first, and:
+
+- drops chunks contained in an already selected one and trims spans that
+  overlap the start or end of one
+- optionally re-ranks with maximal marginal relevance (MMR) over word
+  shingles, so near-duplicate passages do not crowd out other ones
+- fills `budget_tokens` (estimated like the scheduler does, ~4 chars per
+  token), cutting the last chunk on a word boundary if it does not fit
+- returns the selection in relevance order
+"""
+
+import logging
+import os
+import zlib
+
+from core import metrics
+from core.scheduler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "8"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA")) if os.getenv("CONTEXT_MMR_LAMBDA") else None
+MIN_OVERLAP_CHARS = 64  # shorter shared spans are coincidence, not chunk overlap
+MIN_PARTIAL_TOKENS = 100  # don't bother adding a truncated chunk smaller than this
+SHINGLE_WORDS = 3
+
+
+def _head_overlap(text, kept, min_overlap):
+    """Length of the longest prefix of `text` that is a suffix of `kept`"""
+    probe = text[:min_overlap]
+    position = kept.find(probe)
+    while position != -1:
+        if text.startswith(kept[position:]):
+            return len(kept) - position
+        position = kept.find(probe, position + 1)
+    return 0
+
+
+def _tail_overlap(text, kept, min_overlap):
+    """Length of the longest suffix of `text` that is a prefix of `kept`"""
+    probe = kept[:min_overlap]
+    position = text.find(probe)
+    while position != -1:
+        if kept.startswith(text[position:]):
+            return len(text) - position
+        position = text.find(probe, position + 1)
+    return 0
+
+
+def remove_overlap(text, kept_texts, min_overlap=MIN_OVERLAP_CHARS):
+    """`text` without spans it shares with the start or end of any of `kept_texts` ("" if contained)"""
+    for kept in kept_texts:
+        if len(text) < min_overlap:
+            break
+        if text in kept:
+            return ""
+        text = text[_head_overlap(text, kept, min_overlap):]
+        tail = _tail_overlap(text, kept, min_overlap)
+        if tail:
+            text = text[:len(text) - tail]
+    return text.strip()
+
+
+def _shingles(text):
+    words = text.lower().split()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _mmr_order(texts, mmr_lambda):
+    """Indices of `texts` (most relevant first) re-ranked by maximal marginal relevance"""
+    shingles = [_shingles(text) for text in texts]
+    # Rank-based relevance: the vector store's distances are not comparable across index types
+    relevance = [1.0 - i / len(texts) for i in range(len(texts))]
+    remaining, order = list(range(len(texts))), []
+    while remaining:
+        def score(i):
+            redundancy = max((_jaccard(shingles[i], shingles[j]) for j in order), default=0.0)
+            return mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+
+        best = max(remaining, key=score)
+        remaining.remove(best)
+        order.append(best)
+    return order
+
+
+def _truncate(text, tokens):
+    """`text` cut to about `tokens` tokens, on a word boundary"""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit]
+
+
+def pack_context(docs, budget_tokens=CONTEXT_TOKEN_BUDGET, mmr_lambda=CONTEXT_MMR_LAMBDA,
+                 min_overlap=MIN_OVERLAP_CHARS):
+    """
+    Select and trim retrieved chunks to fit a prompt token budget.
+
+    Args:
+        docs (list[Document]): retrieved chunks, most relevant first
+        budget_tokens (int): upper bound on the estimated tokens of all chunks
+        mmr_lambda (float | None): relevance/diversity trade-off in (0, 1]
+            for MMR re-ranking; None keeps the retrieval order
+        min_overlap (int): shortest shared span (chars) treated as overlap
+
+    Returns:
+        (list[Document], dict): packed chunks (copies with trimmed text, in
+        relevance order) and stats (candidates, selected, tokens_before,
+        tokens_after, overlap_chars_removed)
+    """
+    texts = [doc.page_content for doc in docs]
+    order = _mmr_order(texts, mmr_lambda) if mmr_lambda is not None and texts else range(len(texts))
+
+    selected, kept_texts = [], []  # (original rank, text)
+    used = removed = 0
+    for rank in order:
+        text = remove_overlap(texts[rank].strip(), kept_texts, min_overlap)
+        removed += len(texts[rank].strip()) - len(text)
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        if used + tokens > budget_tokens:
+            if budget_tokens - used >= MIN_PARTIAL_TOKENS:
+                text = _truncate(text, budget_tokens - used)
+                selected.append((rank, text))
+                used += estimate_tokens(text)
+            break
+        selected.append((rank, text))
+        kept_texts.append(text)
+        used += tokens
+
+    selected.sort()
+    packed = [type(docs[rank])(page_content=text, metadata=docs[rank].metadata) for rank, text in selected]
+    stats = {
+        "candidates": len(docs),
+        "selected": len(packed),
+        "tokens_before": sum(estimate_tokens(text) for text in texts),
+        "tokens_after": used,
+        "overlap_chars_removed": removed,
+    }
+    logger.info(
+        "context packing: %d candidates, %d -> %d prompt tokens (%d chunks, %d overlapping chars removed)",
+        stats["candidates"], stats["tokens_before"], stats["tokens_after"], stats["selected"], removed,
+    )
+    metrics.record_tokens("rag.context_unpacked", prompt_tokens=stats["tokens_before"])
+    metrics.record_tokens("rag.context", prompt_tokens=stats["tokens_after"])
+    return packed, stats
@@ -0,0 +1,87 @@
+"""
+Near-duplicate chunk detection with MinHash + LSH.
+
+PDF collections repeat themselves: boilerplate pages, the same appendix in
+several reports, re-uploads of slightly different versions. Every repeated
+chunk costs an embedding call and index space while adding nothing to
+retrieval. `NearDuplicateFilter` sits between chunking and embedding and
+drops chunks whose estimated Jaccard similarity (over word shingles) with an
+earlier chunk reaches `threshold`.
+
+Signatures are computed with numpy: shingle hashes from the word hashes,
+then `num_perm` multiply-shift hash functions and a row-wise minimum.
+Locality-sensitive hashing over `bands` bands of the signature finds
+candidate matches without comparing every pair, and candidates are confirmed
+by the fraction of agreeing signature rows.
+"""
+
+import os
+import zlib
+
+DEDUPE_ENABLED = os.getenv("CHUNK_DEDUPE", "1") != "0"
+DEDUPE_THRESHOLD = float(os.getenv("CHUNK_DEDUPE_THRESHOLD", "0.8"))
+SHINGLE_WORDS = 5
+_SHINGLE_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the chunks it accepts. `check(text, owner)` returns the owner
+    (e.g. document index, never None) of an earlier near-duplicate of `text`,
+    or None after accepting `text` as new.
+    """
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD, num_perm=64, bands=16, seed=1):
+        import numpy as np
+
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self._owners = []
+
+    @property
+    def key(self):
+        """Identifies the settings; part of cache keys for deduplicated chunk sets"""
+        return f"minhash{self.num_perm}x{self.bands}-{self.threshold}"
+
+    def signature(self, text):
+        import numpy as np
+
+        words = text.lower().split()
+        if not words:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+        n = min(SHINGLE_WORDS, len(hashes))
+        shingles = hashes[:len(hashes) - n + 1].copy()
+        for offset in range(1, n):
+            shingles = shingles * np.uint64(_SHINGLE_MULTIPLIER) + hashes[offset:len(hashes) - n + 1 + offset]
+        shingles = np.unique(shingles)
+        permuted = (shingles[None, :] * self._a[:, None] + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+    def check(self, text, owner):
+        signature = self.signature(text)
+        rows = self.num_perm // self.bands
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+        seen = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if (self._signatures[candidate] == signature).mean() >= self.threshold:
+                    return self._owners[candidate]
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._owners.append(owner)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return None
@@ -0,0 +1,89 @@
+"""
+Pluggable embedding providers for the RAG page.
+
+A provider names a source of LangChain embeddings plus a `model_id` that
+keys everything derived from its vectors (cached chunk vectors, index
+namespaces): vectors from different providers are not comparable, so an
+index must be queried with the provider that built it.
+
+Built-in providers:
+    gemini  `models/embedding-001` through the model registry (rate limited,
+            one network round trip per batch / question)
+    local   `HashingEmbeddings` on the CPU, no network or quota
+
+Only the registry lives here; embedding classes are imported on first use,
+so listing providers does not pull in LangChain.
+"""
+
+import os
+import threading
+
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+DEFAULT_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "512"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(min(4, os.cpu_count() or 1))))
+
+
+class EmbeddingProvider:
+    """Named, lazily created LangChain embeddings"""
+
+    def __init__(self, name, model_id, factory, description=""):
+        self.name = name
+        self.model_id = model_id
+        self.description = description
+        self._factory = factory
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    def embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = self._factory()
+            return self._embeddings
+
+
+def _gemini_embeddings():
+    from core import models
+
+    return models.get_embeddings(GEMINI_EMBEDDING_MODEL)
+
+
+def _local_embeddings():
+    from core.embeddings import HashingEmbeddings
+
+    return HashingEmbeddings(dim=LOCAL_EMBEDDING_DIM, threads=LOCAL_EMBEDDING_THREADS)
+
+
+_PROVIDERS = {}
+
+
+def register_embedding_provider(provider):
+    """Make `provider` selectable by its name"""
+    _PROVIDERS[provider.name] = provider
+
+
+def embedding_providers():
+    """Registered providers by name"""
+    return dict(_PROVIDERS)
+
+
+def get_embedding_provider(name=None):
+    """
+    Look up a provider; defaults to `EMBEDDING_PROVIDER` (gemini).
+
+    Raises:
+        ValueError: no provider is registered under `name`
+    """
+    name = name or DEFAULT_PROVIDER
+    try:
+        return _PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown embedding provider {name!r}; choose one of {sorted(_PROVIDERS)}") from None
+
+
+register_embedding_provider(EmbeddingProvider(
+    "gemini", GEMINI_EMBEDDING_MODEL, _gemini_embeddings, "Gemini embedding-001 (API)",
+))
+register_embedding_provider(EmbeddingProvider(
+    "local", f"local-hash-{LOCAL_EMBEDDING_DIM}-v1", _local_embeddings, "Local hashing embedder (CPU, offline)",
+))
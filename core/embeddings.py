@@ -0,0 +1,136 @@
+"""
+Embedding wrappers used by the RAG page.
+
+Kept out of `core.scheduler` so importing the scheduler (every page does)
+does not pull in LangChain. Pages pick an implementation through
+`core.embedding_providers`.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from core.scheduler import Priority, estimate_tokens, get_scheduler
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:  # langchain is only needed by the RAG page
+    _EmbeddingsBase = object
+
+
+class ScheduledEmbeddings(_EmbeddingsBase):
+    """
+    LangChain embeddings wrapper that routes every call through the scheduler.
+
+    Document embedding (ingestion) runs as BULK, query embedding as INTERACTIVE.
+    """
+
+    def __init__(self, inner, scheduler=None):
+        self.inner = inner
+        self._scheduler = scheduler
+
+    @property
+    def scheduler(self):
+        return self._scheduler or get_scheduler()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        with metrics.timed("embed.documents"):
+            return self.scheduler.run(
+                lambda: self.inner.embed_documents(texts),
+                priority=Priority.BULK,
+                tokens=sum(estimate_tokens(text) for text in texts),
+            )
+
+    def embed_query(self, text):
+        with metrics.timed("embed.query"):
+            return self.scheduler.run(
+                lambda: self.inner.embed_query(text),
+                priority=Priority.INTERACTIVE,
+                tokens=estimate_tokens(text),
+            )
+
+
+# Odd 64-bit constants for the n-gram rolling hash and its finalizer (splitmix64)
+_PRIME = 0x100000001B3
+_MIX = 0xBF58476D1CE4E5B9
+
+
+class HashingEmbeddings(_EmbeddingsBase):
+    """
+    CPU-only embeddings from hashed character n-grams: no model, no network.
+
+    Each text becomes a `dim`-dimensional vector of signed n-gram counts
+    (feature hashing), log-scaled and L2-normalized, so texts that share
+    words and word fragments end up close together. A batch is hashed with
+    whole-array numpy operations, split across `threads` worker threads
+    (numpy releases the GIL for large arrays). Results are identical across
+    processes and machines.
+    """
+
+    def __init__(self, dim=512, ngrams=(3, 5), threads=1):
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+        self.threads = max(1, threads)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _embed_batch(self, texts):
+        import numpy as np
+
+        encoded = [text.lower().encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        counts = np.zeros(len(texts) * self.dim)
+        prime, mix, dim = np.uint64(_PRIME), np.uint64(_MIX), np.uint64(self.dim)
+        for n in self.ngrams:
+            count = len(data) - n + 1
+            if count <= 0:
+                continue
+            hashes = data[:count].copy()
+            for offset in range(1, n):
+                hashes = hashes * prime + data[offset:offset + count]
+            # Drop n-grams that run from one text into the next
+            same_text = rows[:count] == rows[n - 1:n - 1 + count]
+            hashes, owner = hashes[same_text], rows[:count][same_text]
+            hashes ^= hashes >> np.uint64(31)
+            hashes *= mix
+            hashes ^= hashes >> np.uint64(29)
+            signs = 1.0 - 2.0 * (hashes >> np.uint64(63)).astype(np.float64)
+            index = (hashes % dim).astype(np.int64) + owner * self.dim
+            counts += np.bincount(index, weights=signs, minlength=counts.size)
+
+        vectors = counts.reshape(len(texts), self.dim)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="embed")
+            return self._pool
+
+    def embed_array(self, texts):
+        """Embed `texts` into a float32 array of shape (len(texts), dim)"""
+        import numpy as np
+
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        parts = min(self.threads, len(texts))
+        if parts == 1:
+            return self._embed_batch(texts)
+        size = -(-len(texts) // parts)
+        slices = [texts[i:i + size] for i in range(0, len(texts), size)]
+        return np.vstack(list(self._executor().map(self._embed_batch, slices)))
+
+    def embed_documents(self, texts):
+        with metrics.timed("embed.local_documents"):
+            return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        with metrics.timed("embed.local_query"):
+            return self._embed_batch([text])[0].tolist()
@@ -0,0 +1,303 @@
+"""
+Offline stand-in for `google.generativeai` and `langchain_google_genai`.
+
+Select it with `LLM_BACKEND=fake` (or `models.use_backend("fake")`). It
+behaves like the real backend as far as the pages are concerned:
+
+- configurable latency distribution (log-normal around a median)
+- streaming in chunks with per-chunk delay
+- deterministic embeddings (same text -> same unit vector)
+- injected 429 / 500 errors at configurable rates
+- `usage_metadata` token counts on responses
+
+Configuration comes from `FakeConfig` or these env variables:
+    FAKE_LLM_LATENCY_MS      median latency of a full response (default 200)
+    FAKE_LLM_LATENCY_SIGMA   log-normal sigma (default 0.5)
+    FAKE_LLM_CHUNKS          chunks per streamed response (default 8)
+    FAKE_LLM_OUTPUT_WORDS    words per generated response (default 120)
+    FAKE_LLM_ERROR_429       probability of a 429 per call (default 0)
+    FAKE_LLM_ERROR_500       probability of a 500 per call (default 0)
+    FAKE_EMBEDDING_DIM       embedding size (default 768)
+    FAKE_EMBEDDING_LATENCY_MS  latency per embedding batch (default 20)
+    FAKE_LLM_SEED            RNG seed for latency/errors (default 0)
+"""
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.backends import Backend
+
+_WORDS = (
+    "the model reads context and writes a clear answer with useful detail about data "
+    "systems latency cache index query page user result stream token vector"
+).split()
+
+
+def _env(name, default, cast=float):
+    return field(default_factory=lambda: cast(os.getenv(name, default)))
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = _env("FAKE_LLM_LATENCY_MS", "200")
+    latency_sigma: float = _env("FAKE_LLM_LATENCY_SIGMA", "0.5")
+    chunks: int = _env("FAKE_LLM_CHUNKS", "8", int)
+    output_words: int = _env("FAKE_LLM_OUTPUT_WORDS", "120", int)
+    error_429: float = _env("FAKE_LLM_ERROR_429", "0")
+    error_500: float = _env("FAKE_LLM_ERROR_500", "0")
+    embedding_dim: int = _env("FAKE_EMBEDDING_DIM", "768", int)
+    embedding_latency_ms: float = _env("FAKE_EMBEDDING_LATENCY_MS", "20")
+    seed: int = _env("FAKE_LLM_SEED", "0", int)
+    sleep: Any = field(default=time.sleep, repr=False)
+
+
+# Named like the google-api-core exceptions so `is_retryable` treats them the same
+class FakeAPIError(Exception):
+    code = 500
+
+
+class ResourceExhausted(FakeAPIError):
+    code = 429
+
+
+class InternalServerError(FakeAPIError):
+    code = 500
+
+
+def _count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _prompt_text(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        return " ".join(_prompt_text(part) for part in prompt)
+    if isinstance(prompt, dict):
+        return "[blob]"
+    return str(getattr(prompt, "content", prompt))
+
+
+def _seed_for(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+class FakeEngine:
+    """Shared behaviour (latency, errors, canned answers) for all fake handles"""
+
+    def __init__(self, config=None):
+        self.config = config or FakeConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def latency(self):
+        """One sample (seconds) from the configured log-normal distribution"""
+        with self._lock:
+            sample = self._rng.lognormvariate(0.0, self.config.latency_sigma)
+        return self.config.latency_ms / 1000.0 * sample
+
+    def maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+        if roll < self.config.error_429:
+            raise ResourceExhausted("429 Resource has been exhausted (fake)")
+        if roll < self.config.error_429 + self.config.error_500:
+            raise InternalServerError("500 Internal error (fake)")
+
+    def answer(self, model_name, prompt_text):
+        """Deterministic text for a prompt; SQL prompts get a runnable query"""
+        if "SQLite" in prompt_text and "- Table:" in prompt_text:
+            table = re.search(r"- Table: (\w+)", prompt_text).group(1)
+            return f"SELECT * FROM {table};"
+        rng = random.Random(_seed_for(model_name + prompt_text))
+        return " ".join(rng.choice(_WORDS) for _ in range(self.config.output_words))
+
+    def pieces(self, text):
+        words = text.split(" ")
+        size = max(1, -(-len(words) // max(1, self.config.chunks)))
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def complete(self, model_name, prompt_text):
+        self.maybe_fail()
+        self.config.sleep(self.latency())
+        return self.answer(model_name, prompt_text)
+
+    def stream(self, model_name, prompt_text):
+        """
+        Yield `(piece, is_last)` for the answer, spread over one latency sample.
+
+        Callers run `maybe_fail()` first so errors surface on the request.
+        """
+        pieces = self.pieces(self.answer(model_name, prompt_text))
+        delay = self.latency() / len(pieces)
+        for i, piece in enumerate(pieces):
+            self.config.sleep(delay)
+            yield piece, i == len(pieces) - 1
+
+    def embed(self, texts):
+        import numpy as np
+
+        self.maybe_fail()
+        self.config.sleep(self.config.embedding_latency_ms / 1000.0)
+        vectors = np.empty((len(texts), self.config.embedding_dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(_seed_for(text))
+            vectors[i] = rng.standard_normal(self.config.embedding_dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.tolist()
+
+
+# ---- google.generativeai look-alikes ---------------------------------------
+
+
+@dataclass
+class _Usage:
+    prompt_token_count: int
+    candidates_token_count: int
+
+
+@dataclass
+class _Part:
+    text: str
+
+
+@dataclass
+class _Content:
+    parts: list
+
+
+@dataclass
+class _Candidate:
+    content: _Content
+
+
+class FakeResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.candidates = [_Candidate(_Content([_Part(text)]))]
+        self.usage_metadata = usage
+
+
+class FakeGenerativeModel:
+    def __init__(self, engine, model_name, generation_config=None):
+        self.engine = engine
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        prompt_text = _prompt_text(prompt)
+        prompt_tokens = _count_tokens(prompt_text)
+        if not stream:
+            text = self.engine.complete(self.model_name, prompt_text)
+            return FakeResponse(text, _Usage(prompt_tokens, _count_tokens(text)))
+        # Like the real client, request errors surface here rather than mid-stream
+        self.engine.maybe_fail()
+        return self._stream(prompt_text, prompt_tokens)
+
+    def _stream(self, prompt_text, prompt_tokens):
+        output_tokens = 0
+        for piece, last in self.engine.stream(self.model_name, prompt_text):
+            output_tokens += _count_tokens(piece)
+            # The last chunk carries the usage totals, as with Gemini
+            usage = _Usage(prompt_tokens, output_tokens) if last else None
+            yield FakeResponse(piece, usage)
+
+
+# ---- langchain_google_genai look-alikes ------------------------------------
+
+try:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+except ImportError:  # only needed by the LangChain-based pages
+    BaseChatModel = None
+    Embeddings = object
+
+
+def _messages_text(messages):
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+
+def _usage(prompt_text, text):
+    prompt_tokens, output_tokens = _count_tokens(prompt_text), _count_tokens(text)
+    return {
+        "input_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": prompt_tokens + output_tokens,
+    }
+
+
+if BaseChatModel is not None:
+
+    class FakeChatModel(BaseChatModel):
+        """Chat model usable anywhere `ChatGoogleGenerativeAI` is (invoke, stream, chains)"""
+
+        model: str = "fake"
+        engine: Any = None
+
+        @property
+        def _llm_type(self):
+            return "fake-gemini"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt_text = _messages_text(messages)
+            text = self.engine.complete(self.model, prompt_text)
+            message = AIMessage(content=text, usage_metadata=_usage(prompt_text, text))
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt_text = _messages_text(messages)
+            self.engine.maybe_fail()
+            output = []
+            for piece, last in self.engine.stream(self.model, prompt_text):
+                output.append(piece)
+                usage = _usage(prompt_text, "".join(output)) if last else None
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+                if run_manager:
+                    run_manager.on_llm_new_token(piece, chunk=chunk)
+                yield chunk
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic unit-vector embeddings derived from a hash of the text"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def embed_documents(self, texts):
+        return self.engine.embed(list(texts))
+
+    def embed_query(self, text):
+        return self.engine.embed([text])[0]
+
+
+class FakeBackend(Backend):
+    """`LLM_BACKEND=fake`: no network, no API key"""
+
+    name = "fake"
+
+    def __init__(self, config=None):
+        self.engine = FakeEngine(config)
+
+    def configure(self):
+        pass
+
+    def generative_model(self, model_name, generation_config=None):
+        return FakeGenerativeModel(self.engine, model_name, generation_config)
+
+    def chat_model(self, model_name, **params):
+        if BaseChatModel is None:
+            raise ImportError("langchain-core is required for the fake chat model")
+        return FakeChatModel(model=model_name, engine=self.engine)
+
+    def embeddings(self, model_name):
+        return FakeEmbeddings(self.engine)
@@ -0,0 +1,258 @@
+"""
+Streaming extract -> chunk -> embed -> index pipeline for the RAG page.
+
+Nothing here holds a whole document: pages are read one at a time, chunks
+are cut from a small rolling buffer (overlap carried across page
+boundaries), embeddings are requested in bounded batches and every batch is
+added to the FAISS index as soon as it arrives. Peak memory is roughly one
+page + one chunk + one batch of vectors, plus the index itself.
+
+With a `PdfCache`, documents seen before skip extraction (same bytes) and
+chunking + embedding (same bytes, chunking parameters and embedding model).
+
+With a `NearDuplicateFilter`, chunks that nearly repeat an earlier chunk of
+the same upload are dropped before they are embedded.
+"""
+
+import time
+from itertools import islice
+
+from core import metrics
+from core.pdf import iter_pages, read_bytes
+from core.pdf_cache import digest, params_key
+from core.vector_index import DEFAULT_SPEC, IndexBuilder
+
+CHUNK_SIZE = 10000
+CHUNK_OVERLAP = 1000
+EMBED_BATCH_SIZE = 64
+SEPARATORS = ("\n\n", "\n", " ")
+
+
+def _split_point(buffer, chunk_size):
+    """Where to end a chunk: the last separator in its second half, else a hard cut"""
+    for separator in SEPARATORS:
+        index = buffer.rfind(separator, chunk_size // 2, chunk_size)
+        if index != -1:
+            return index + len(separator)
+    return chunk_size
+
+
+def _overlap_start(buffer, cut, chunk_overlap):
+    """Start of the next chunk: `chunk_overlap` chars back, moved to a word boundary"""
+    start = max(0, cut - chunk_overlap)
+    boundary = buffer.find(" ", start, cut)
+    return boundary + 1 if boundary != -1 else start
+
+
+def iter_chunks(texts, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Split a stream of texts (e.g. pages) into overlapping chunks.
+
+    Roughly equivalent to `RecursiveCharacterTextSplitter(chunk_size,
+    chunk_overlap).split_text("".join(texts))` - chunks end on paragraph,
+    line or word boundaries where possible and consecutive chunks share up to
+    `chunk_overlap` characters - but only ever buffers about one chunk plus
+    the current text.
+    """
+    if not 0 <= chunk_overlap < chunk_size // 2:
+        raise ValueError("chunk_overlap must be smaller than half of chunk_size")
+    buffer = ""
+    carried = 0  # length of the overlap prefix at the start of `buffer`
+    for text in texts:
+        buffer += text
+        while len(buffer) > chunk_size:
+            cut = _split_point(buffer, chunk_size)
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            start = _overlap_start(buffer, cut, chunk_overlap)
+            buffer = buffer[start:]
+            carried = cut - start
+    # Flush the tail unless it is nothing but overlap already emitted
+    if len(buffer) > carried and buffer.strip():
+        yield buffer.strip()
+
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _unique_chunks(chunks, dedupe, owner, stats, foreign):
+    """Chunks `dedupe` has not seen yet; `foreign[0]` is set when one repeats another document"""
+    for chunk in chunks:
+        match = dedupe.check(chunk, owner)
+        if match is None:
+            yield chunk
+            continue
+        stats["duplicate_chunks"] += 1
+        stats["embeddings_saved"] += 1
+        if match != owner:
+            foreign[0] = True
+
+
+def _unique_batches(batches, dedupe, owner, stats):
+    """Cached `(chunks, vectors)` batches without near-duplicates (no embeddings to save here)"""
+    for chunks, vectors in batches:
+        keep = [i for i, chunk in enumerate(chunks) if dedupe.check(chunk, owner) is None]
+        stats["duplicate_chunks"] += len(chunks) - len(keep)
+        if keep:
+            yield [chunks[i] for i in keep], [vectors[i] for i in keep]
+
+
+def _document_batches(data, embeddings, chunk_size, chunk_overlap, batch_size,
+                      cache, embedding_model, stats, dedupe=None, owner=0):
+    """`(chunks, vectors)` batches for one PDF, from the cache where possible"""
+    foreign = [False]
+    if cache is None:
+        chunks = iter_chunks(_extracted(iter_pages([data]), stats), chunk_size, chunk_overlap)
+        if dedupe is not None:
+            chunks = _unique_chunks(chunks, dedupe, owner, stats, foreign)
+        for batch in batched(chunks, batch_size):
+            yield batch, embeddings.embed_documents(batch)
+        return
+
+    sha = digest(data)
+    params = params_key(chunk_size, chunk_overlap, embedding_model, dedupe.key if dedupe is not None else None)
+    cached = cache.load_chunks(sha, params, batch_size)
+    if cached is not None:
+        stats["cached_documents"] += 1
+        yield from (_unique_batches(cached, dedupe, owner, stats) if dedupe is not None else cached)
+        return
+
+    texts = cache.iter_text(sha)
+    if texts is None:
+        texts = cache.write_text(sha, _extracted(iter_pages([data]), stats))
+    writer = cache.chunk_writer(
+        sha, params, chunk_size=chunk_size, chunk_overlap=chunk_overlap, embedding_model=embedding_model
+    )
+    chunks = iter_chunks(texts, chunk_size, chunk_overlap)
+    if dedupe is not None:
+        chunks = _unique_chunks(chunks, dedupe, owner, stats, foreign)
+    try:
+        for batch in batched(chunks, batch_size):
+            vectors = embeddings.embed_documents(batch)
+            writer.add(batch, vectors)
+            yield batch, vectors
+    except BaseException:
+        writer.discard()
+        raise
+    if foreign[0]:
+        # The chunk set depends on the other documents of this upload; don't cache it
+        writer.discard()
+        return
+    writer.commit()
+    cache.evict(keep={sha})
+
+
+def _extracted(pages, stats):
+    """
+    Count the pages of one document and time their extraction as the
+    `pdf.extract` stage: only the time spent waiting for the next page, not
+    the chunking and embedding done in between.
+    """
+    pages = iter(pages)
+    seconds, outcome = 0.0, "ok"
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                text = next(pages)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+            stats["pages"] += 1
+            yield text
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        stats["extract_seconds"] += seconds
+        metrics.record_stage("pdf.extract", seconds, outcome)
+
+
+def ingest_pdfs(
+    pdf_docs,
+    embeddings,
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    batch_size=EMBED_BATCH_SIZE,
+    on_progress=None,
+    cache=None,
+    embedding_model=None,
+    vector_store=None,
+    index_spec=DEFAULT_SPEC,
+    dedupe=None,
+):
+    """
+    Build a FAISS vector store from `pdf_docs` batch by batch, or extend
+    `vector_store` with them.
+
+    Each PDF is chunked on its own (overlap never spans two documents) so its
+    chunks and vectors can be cached by content hash.
+
+    Args:
+        pdf_docs (list): uploaded files, paths or bytes
+        embeddings: LangChain embeddings used for documents and later queries
+        on_progress (callable): called as `on_progress(stats)` after every batch
+        cache (PdfCache): content-addressed cache; None disables caching
+        embedding_model (str): part of the cache key for vectors
+        vector_store (FAISS): existing store to add to; modified in place
+        index_spec (str): index type for a new store, see `INDEX_SPECS`
+        dedupe (NearDuplicateFilter): drop near-duplicate chunks across the upload
+
+    Returns:
+        (FAISS | None, dict): the vector store (None if no text was found
+        and no `vector_store` was given)
+        and stats (pages, chunks, batches, cached_documents, seconds,
+        extract_seconds (time spent extracting pages), pages_per_second
+        (extraction throughput), duplicate_chunks, embeddings_saved, index_bytes_saved, index_spec,
+        build_seconds)
+    """
+    stats = {
+        "pages": 0, "chunks": 0, "batches": 0, "cached_documents": 0, "seconds": 0.0, "extract_seconds": 0.0,
+        "duplicate_chunks": 0, "embeddings_saved": 0, "index_bytes_saved": 0,
+    }
+    dim = 0
+    start = time.perf_counter()
+    builder = IndexBuilder(embeddings, index_spec) if vector_store is None else None
+
+    with metrics.timed("pdf.ingest"):
+        for owner, pdf in enumerate(pdf_docs):
+            batches = _document_batches(
+                read_bytes(pdf), embeddings, chunk_size, chunk_overlap, batch_size,
+                cache, embedding_model, stats, dedupe, owner,
+            )
+            for batch, vectors in batches:
+                dim = dim or len(vectors[0])
+                pairs = list(zip(batch, vectors))
+                with metrics.timed("faiss.add"):
+                    if builder is not None:
+                        builder.add(pairs)
+                    else:
+                        vector_store.add_embeddings(pairs)
+                stats["chunks"] += len(batch)
+                stats["batches"] += 1
+                stats["seconds"] = time.perf_counter() - start
+                if on_progress is not None:
+                    on_progress(dict(stats))
+
+    if builder is not None:
+        vector_store = builder.finish()
+        stats["index_spec"] = builder.factory
+        stats["build_seconds"] = builder.build_seconds
+    stats["seconds"] = time.perf_counter() - start
+    stats["pages_per_second"] = stats["pages"] / stats["extract_seconds"] if stats["extract_seconds"] else 0.0
+    # Raw float32 vector size; approximate for compressed (PQ) indexes
+    stats["index_bytes_saved"] = stats["duplicate_chunks"] * dim * 4
+    metrics.count("pdf_pages_extracted_total", stats["pages"], help_text="PDF pages extracted")
+    if stats["pages"]:
+        metrics.observe("pdf_extract_pages_per_second", stats["pages_per_second"],
+                        help_text="PDF extraction throughput per ingestion", buckets=metrics.THROUGHPUT_BUCKETS)
+    if stats["duplicate_chunks"]:
+        metrics.count("pdf_duplicate_chunks_total", stats["duplicate_chunks"],
+                      help_text="Near-duplicate PDF chunks dropped before embedding")
+    return vector_store, stats
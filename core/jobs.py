@@ -0,0 +1,172 @@
+"""
+Background jobs for long-running page work (PDF ingestion).
+
+A Streamlit script run blocks its session and is thrown away when the user
+navigates elsewhere, so long work is submitted to a process-wide worker
+pool instead. The page keeps the job ID in its session state and polls the
+`Job` for its state, current stage and progress counters; the job keeps
+running if the user leaves the page and is still there when they return.
+
+Cancellation is cooperative: `cancel()` sets a flag and the job function
+calls `job.check_cancelled()` (e.g. from a progress callback), which raises
+`JobCancelled`. Finished jobs are forgotten after `retention` seconds.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from core import metrics
+
+DEFAULT_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+DEFAULT_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job after `cancel()` was requested"""
+
+
+class Job:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.state = JobState.QUEUED
+        self.stage = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.state in (JobState.SUCCEEDED, JobState.FAILED, JobState.CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def update(self, stage=None, **progress):
+        """Set the current stage and/or progress counters (called by the job)"""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            self.progress.update(progress)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def cancel(self):
+        self._cancel.set()
+
+    def snapshot(self):
+        """Consistent copy of the job's status for display"""
+        with self._lock:
+            elapsed = (self.finished or time.time()) - (self.started or self.created)
+            return {
+                "id": self.id,
+                "name": self.name,
+                "state": self.state.value,
+                "stage": self.stage,
+                "progress": dict(self.progress),
+                "error": self.error,
+                "seconds": elapsed if self.started else 0.0,
+                "cancel_requested": self._cancel.is_set(),
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers=DEFAULT_WORKERS, retention=DEFAULT_RETENTION):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _run(self, job, fn, args, kwargs, page):
+        metrics.set_page(page)
+        if job.cancel_requested:
+            job.finished = time.time()
+            job.state = JobState.CANCELLED
+            return
+        job.state, job.started = JobState.RUNNING, time.time()
+        job.update("starting")
+        state = JobState.FAILED
+        try:
+            with metrics.timed(f"job.{job.name}"):
+                job.result = fn(job, *args, **kwargs)
+            state = JobState.SUCCEEDED
+        except JobCancelled:
+            state = JobState.CANCELLED
+        except Exception as exc:
+            job.error = str(exc) or type(exc).__name__
+        finally:
+            # `finished` and `result` are set before `state` makes the job `done`
+            job.finished = time.time()
+            job.state = state
+            metrics.count("jobs_finished_total", job_name=job.name, state=job.state.value,
+                          help_text="Background jobs finished, by final state")
+
+    def submit(self, name, fn, *args, **kwargs):
+        """
+        Run `fn(job, *args, **kwargs)` on the worker pool.
+
+        Returns:
+            Job: poll its `state`, `stage` and `progress`; `result` is the
+            return value of `fn` once it succeeded
+        """
+        self._prune()
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs, metrics.current_page())
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [i for i, job in self._jobs.items() if job.done and job.finished < cutoff]:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state.value: states.count(state) for state in JobState}
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Process-wide `JobManager`, shared by all sessions"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+            metrics.register_collector("jobs", _job_manager.stats)
+        return _job_manager
@@ -0,0 +1,238 @@
+"""
+Single entry point for text generation calls made by the pages.
+
+Pages call `generate_text(...)` / `stream_text(...)` / `stream_chat(...)`
+instead of talking to the model handles directly so cross-cutting behaviour
+(response caching, single-flight coalescing, scheduling/retries, timing, ...)
+is applied in one place.
+"""
+
+import logging
+import time
+
+from core import metrics, models
+from core.cache import get_response_cache, make_key
+from core.scheduler import Priority, estimate_tokens, get_scheduler
+from core.singleflight import Abandoned, get_single_flight
+
+logger = logging.getLogger(__name__)
+
+
+def is_deterministic(generation_config):
+    """True when the call is expected to return the same text for the same prompt"""
+    return bool(generation_config) and generation_config.get("temperature") == 0
+
+
+def _request_key(model_name, prompt, generation_config):
+    """Identity of a request (for caching and coalescing); None for non-text prompts"""
+    if not isinstance(prompt, str):
+        return None
+    return make_key(model_name, prompt, generation_config)
+
+
+def _use_cache(generation_config, cache):
+    return is_deterministic(generation_config) if cache is None else cache
+
+
+def generate_text(model_name, prompt, generation_config=None, cache=None, priority=Priority.DEFAULT):
+    """
+    Generate text with `model_name` and return `response.text`.
+
+    Identical concurrent text requests share a single upstream call.
+
+    Args:
+        model_name (str): Gemini model name, e.g. "gemini-2.5-flash"
+        prompt (str): Full prompt
+        generation_config (dict): Optional generation config
+        cache (bool): Force caching on/off. By default only deterministic
+            calls (temperature 0) are cached.
+        priority (Priority): Scheduler priority class
+
+    Returns:
+        str: The generated text
+    """
+    key = _request_key(model_name, prompt, generation_config)
+    use_cache = key is not None and _use_cache(generation_config, cache)
+    if use_cache:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return cached
+
+    model = models.get_model(model_name, generation_config)
+
+    def request():
+        response = model.generate_content(prompt)
+        metrics.record_usage("llm.generate", getattr(response, "usage_metadata", None))
+        return response.text
+
+    def call():
+        with metrics.timed("llm.generate", model=model_name):
+            return get_scheduler().run(request, priority=priority, tokens=estimate_tokens(prompt))
+
+    text = call() if key is None else get_single_flight().do(key, call)
+
+    if use_cache:
+        get_response_cache().set(key, text)
+    return text
+
+
+class TimedStream:
+    """
+    Iterator over text chunks that records time-to-first-token and total time.
+
+    Wrap any chunk iterator and hand it to `st.write_stream(...)`; afterwards
+    `first_token_seconds`, `total_seconds` and `text` describe the request.
+    """
+
+    def __init__(self, chunks, label="stream", started_at=None, stage="llm.stream"):
+        self._chunks = chunks
+        self.label = label
+        self.started_at = started_at
+        self.stage = stage
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self._parts = []
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def __iter__(self):
+        start = self.started_at if self.started_at is not None else time.perf_counter()
+        outcome = "ok"
+        try:
+            for chunk in self._chunks:
+                if not chunk:
+                    continue
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - start
+                    metrics.record_first_token(self.stage, self.first_token_seconds)
+                self._parts.append(chunk)
+                yield chunk
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.total_seconds = time.perf_counter() - start
+            metrics.record_stage(self.stage, self.total_seconds, outcome, model=self.label)
+            logger.info(
+                "%s: first token %.3fs, total %.3fs, %d chars",
+                self.label,
+                self.first_token_seconds or 0.0,
+                self.total_seconds,
+                len(self.text),
+            )
+
+    def summary(self):
+        """Short human readable timing line for the UI"""
+        if self.total_seconds is None:
+            return ""
+        first = self.first_token_seconds if self.first_token_seconds is not None else self.total_seconds
+        return f"⏱️ First token in {first:.2f}s · total {self.total_seconds:.2f}s"
+
+
+def _chunk_texts(response):
+    usage = None
+    for chunk in response:
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        try:
+            yield chunk.text
+        except ValueError:
+            # Chunks without parts (e.g. safety-filtered) carry no text
+            continue
+    # The final chunk carries the usage totals for the whole response
+    metrics.record_usage("llm.stream", usage)
+
+
+def _chunk_contents(stream):
+    usage = None
+    for chunk in stream:
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        yield chunk.content
+    metrics.record_usage("llm.chat", usage)
+
+
+def _coalesced(key, upstream, use_cache):
+    """
+    Stream `upstream()` once for all identical concurrent requests.
+
+    The first caller (leader) streams chunks as usual and publishes the full
+    text at the end; followers receive that text as a single chunk, or start
+    their own stream if the leader gave up half way.
+    """
+    flights = get_single_flight()
+    call, leader = flights.join(key)
+    if not leader:
+        try:
+            yield call.wait()
+            return
+        except Abandoned:
+            yield from upstream()
+            return
+
+    parts = []
+    try:
+        for chunk in upstream():
+            parts.append(chunk)
+            yield chunk
+    except GeneratorExit:
+        flights.abandon(key, call)
+        raise
+    except BaseException as exc:
+        flights.complete(key, call, error=exc)
+        raise
+    text = "".join(parts)
+    flights.complete(key, call, value=text)
+    if use_cache:
+        get_response_cache().set(key, text)
+
+
+def stream_text(model_name, prompt, generation_config=None, cache=None, priority=Priority.DEFAULT):
+    """
+    Stream generated text as it arrives (`generate_content(..., stream=True)`).
+
+    Takes the same arguments as `generate_text`. A cached response is replayed
+    as a single chunk; otherwise the full text is cached once the stream ends.
+    A request identical to one already streaming waits for it and receives its
+    full text as one chunk.
+
+    Returns:
+        TimedStream: iterator of text chunks with timing information
+    """
+    key = _request_key(model_name, prompt, generation_config)
+    use_cache = key is not None and _use_cache(generation_config, cache)
+    if use_cache:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return TimedStream(iter([cached]), label=model_name, stage="llm.cached")
+
+    # Measured from here so time spent queued in the scheduler counts
+    started_at = time.perf_counter()
+    model = models.get_model(model_name, generation_config)
+
+    def upstream():
+        return get_scheduler().run_stream(
+            lambda: _chunk_texts(model.generate_content(prompt, stream=True)),
+            priority=priority,
+            tokens=estimate_tokens(prompt),
+        )
+
+    chunks = upstream() if key is None else _coalesced(key, upstream, use_cache)
+    return TimedStream(chunks, label=model_name, started_at=started_at, stage="llm.stream")
+
+
+def stream_chat(model_name, messages, priority=Priority.INTERACTIVE, **params):
+    """
+    Stream a LangChain chat model reply token by token (`.stream(messages)`).
+
+    Returns:
+        TimedStream: iterator of text chunks with timing information
+    """
+    started_at = time.perf_counter()
+    model = models.get_chat_model(model_name, **params)
+    chunks = get_scheduler().run_stream(
+        lambda: _chunk_contents(model.stream(messages)),
+        priority=priority,
+        tokens=estimate_tokens([message.content for message in messages]),
+    )
+    return TimedStream(chunks, label=model_name, started_at=started_at, stage="llm.chat")
@@ -0,0 +1,356 @@
+"""
+In-process metrics: counters and histograms labelled by page and stage.
+
+Every model, embedding, FAISS, PDF-extraction and SQLite call is wrapped in
+`timed(stage)`, which records its duration and outcome. Token usage and
+time-to-first-token are recorded by `core.llm`. Components with their own
+counters (response cache, scheduler, single-flight) register collectors that
+are read at export time.
+
+Export:
+    to_prometheus()  -> Prometheus text exposition format
+    snapshot()       -> JSON-serialisable dict incl. p50/p90/p99 per series
+    Set METRICS_PORT to also serve both over HTTP (/metrics, /metrics.json).
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "intellimesh_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+THROUGHPUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+RESERVOIR_SIZE = 2048
+
+_local = threading.local()
+
+
+def set_page(page):
+    """Label every metric recorded by the current script thread with `page`"""
+    _local.page = page
+    _ensure_server()
+
+
+def current_page():
+    return getattr(_local, "page", "unknown")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list(extra or [])
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in items
+    )
+    return "{" + body + "}"
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def series(self):
+        with self._lock:
+            return dict(self._values)
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.series().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self):
+        return [{"labels": dict(key), "value": value} for key, value in sorted(self.series().items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus a bounded sample reservoir for quantiles"""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                    "samples": deque(maxlen=RESERVOIR_SIZE),
+                }
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["samples"].append(value)
+
+    def _copy(self):
+        with self._lock:
+            return {
+                key: {
+                    "counts": list(s["counts"]),
+                    "sum": s["sum"],
+                    "count": s["count"],
+                    "samples": sorted(s["samples"]),
+                }
+                for key, s in self._series.items()
+            }
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self._copy().items()):
+            for bound, count in zip(self.buckets, s["counts"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {s['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {s['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {s['count']}")
+        return lines
+
+    def snapshot(self):
+        result = []
+        for key, s in sorted(self._copy().items()):
+            samples = s["samples"]
+            result.append({
+                "labels": dict(key),
+                "count": s["count"],
+                "sum": s["sum"],
+                "p50": _quantile(samples, 0.50),
+                "p90": _quantile(samples, 0.90),
+                "p99": _quantile(samples, 0.99),
+                "max": samples[-1] if samples else None,
+            })
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        full_name = PREFIX + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = cls(full_name, help_text, **kwargs)
+                self._metrics[full_name] = metric
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, name, fn):
+        """`fn()` returns a flat dict of numbers exported as `<name>_<key>` gauges"""
+        with self._lock:
+            self._collectors[name] = fn
+
+    def _collect(self):
+        with self._lock:
+            collectors = dict(self._collectors)
+        values = {}
+        for name, fn in collectors.items():
+            try:
+                stats = fn()
+            except Exception:
+                logger.exception("Metrics collector %s failed", name)
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    values[f"{PREFIX}{name}_{key}"] = value
+        return values
+
+    def to_prometheus(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in sorted(metrics, key=lambda m: m.name):
+            lines.extend(metric.prometheus())
+        for name, value in sorted(self._collect().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "timestamp": time.time(),
+            "metrics": {metric.name: metric.snapshot() for metric in metrics},
+            "gauges": self._collect(),
+        }
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "stage_duration_seconds", "Duration of instrumented calls by page, stage and outcome"
+)
+STAGE_CALLS = REGISTRY.counter(
+    "stage_calls_total", "Instrumented calls by page, stage and outcome"
+)
+LLM_TOKENS = REGISTRY.histogram(
+    "llm_tokens", "Tokens per model call by page, stage and kind (prompt/output)", TOKEN_BUCKETS
+)
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time to first streamed chunk by page and stage"
+)
+
+
+def record_stage(stage, seconds, outcome="ok", page=None, **labels):
+    """Record one call of `stage` that took `seconds`"""
+    labels = {"page": page or current_page(), "stage": stage, "outcome": outcome, **labels}
+    STAGE_DURATION.observe(seconds, **labels)
+    STAGE_CALLS.inc(**labels)
+
+
+@contextmanager
+def timed(stage, page=None, **labels):
+    """Record duration and outcome (ok/error) of the wrapped block"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start, outcome, page=page, **labels)
+
+
+def count(name, amount=1, help_text="", **labels):
+    """Increment counter `name` labelled with the current page"""
+    REGISTRY.counter(name, help_text).inc(amount, page=current_page(), **labels)
+
+
+def observe(name, value, help_text="", buckets=LATENCY_BUCKETS, **labels):
+    """Add `value` to histogram `name` labelled with the current page"""
+    REGISTRY.histogram(name, help_text, buckets).observe(value, page=current_page(), **labels)
+
+
+def record_tokens(stage, prompt_tokens=None, output_tokens=None, page=None):
+    labels = {"page": page or current_page(), "stage": stage}
+    if prompt_tokens is not None:
+        LLM_TOKENS.observe(prompt_tokens, kind="prompt", **labels)
+    if output_tokens is not None:
+        LLM_TOKENS.observe(output_tokens, kind="output", **labels)
+
+
+def record_usage(stage, usage, page=None):
+    """Record token counts from a Gemini `usage_metadata` or LangChain usage dict"""
+    if not usage:
+        return
+    if isinstance(usage, dict):
+        prompt_tokens, output_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+    else:
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+    record_tokens(stage, prompt_tokens, output_tokens, page=page)
+
+
+def record_first_token(stage, seconds, page=None):
+    LLM_FIRST_TOKEN.observe(seconds, page=page or current_page(), stage=stage)
+
+
+def register_collector(name, fn):
+    REGISTRY.register_collector(name, fn)
+
+
+def to_prometheus():
+    return REGISTRY.to_prometheus()
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+# ---- HTTP export -----------------------------------------------------------
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") == "/metrics":
+            body = to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body = json.dumps(snapshot(), default=str).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        return _server
+
+
+def _ensure_server():
+    global _server_attempted
+    port = os.getenv("METRICS_PORT")
+    if port and not _server_attempted:
+        _server_attempted = True
+        try:
+            start_http_server(int(port))
+        except OSError as exc:
+            # Another worker process already owns the port
+            logger.warning("Could not start metrics server on port %s: %s", port, exc)
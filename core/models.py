@@ -0,0 +1,121 @@
+"""
+Process-wide model registry shared by every page.
+
+Pages used to call `genai.configure(...)` at import time and build a new
+`GenerativeModel` / `ChatGoogleGenerativeAI` on every button click. The
+registry configures the backend once per process and hands out one handle per
+(model name, generation config), so the underlying HTTP/gRPC channels are
+reused across reruns and sessions.
+
+Usage:
+    from core import models
+
+    models.configure()
+    model = models.get_model("gemini-2.5-flash", {"temperature": 0.7})
+    response = model.generate_content(prompt)
+"""
+
+import json
+import threading
+
+from core.backends import ConfigurationError, create_backend
+
+__all__ = [
+    "ConfigurationError",
+    "configure",
+    "get_backend",
+    "use_backend",
+    "get_model",
+    "get_chat_model",
+    "get_embeddings",
+    "clear",
+]
+
+DEFAULT_EMBEDDING_MODEL = "models/embedding-001"
+
+_lock = threading.RLock()
+_backend = None
+_configured = False
+_handles = {}
+
+
+def _handle_key(kind, model_name, config):
+    """Stable key for a handle; configs are dicts so serialise them sorted"""
+    return kind, model_name, json.dumps(config or {}, sort_keys=True, default=str)
+
+
+def get_backend():
+    """Return the active backend, creating it on first use"""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def use_backend(backend):
+    """
+    Swap the active backend (e.g. a fake one in tests and benchmarks).
+
+    Args:
+        backend: a `Backend` instance or a registered backend name
+
+    Drops every cached handle so nothing built by the previous backend leaks.
+    """
+    global _backend, _configured
+    with _lock:
+        _backend = create_backend(backend) if isinstance(backend, str) else backend
+        _configured = False
+        _handles.clear()
+
+
+def configure():
+    """Configure the active backend once per process. Safe to call on every rerun."""
+    global _configured
+    with _lock:
+        if not _configured:
+            get_backend().configure()
+            _configured = True
+
+
+def _get_or_create(key, factory):
+    handle = _handles.get(key)
+    if handle is not None:
+        return handle
+    with _lock:
+        handle = _handles.get(key)
+        if handle is None:
+            configure()
+            handle = factory()
+            _handles[key] = handle
+        return handle
+
+
+def get_model(model_name, generation_config=None):
+    """Shared `GenerativeModel`-style handle for `model_name` + `generation_config`"""
+    key = _handle_key("model", model_name, generation_config)
+    return _get_or_create(
+        key, lambda: get_backend().generative_model(model_name, generation_config)
+    )
+
+
+def get_chat_model(model_name, **params):
+    """Shared LangChain chat model for `model_name` + params (temperature, ...)"""
+    key = _handle_key("chat", model_name, params)
+    return _get_or_create(key, lambda: get_backend().chat_model(model_name, **params))
+
+
+def get_embeddings(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Shared LangChain embeddings object for `model_name`, routed through the scheduler"""
+    from core.embeddings import ScheduledEmbeddings
+
+    key = _handle_key("embeddings", model_name, None)
+    return _get_or_create(
+        key, lambda: ScheduledEmbeddings(get_backend().embeddings(model_name))
+    )
+
+
+def clear():
+    """Forget every cached handle (the backend stays configured)"""
+    with _lock:
+        _handles.clear()
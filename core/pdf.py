@@ -0,0 +1,132 @@
+"""
+PDF text extraction for the RAG page.
+
+Large PDFs are split into page ranges that are extracted in parallel by a
+process pool (PyPDF2 is pure Python, so threads would serialise on the GIL).
+The PDF is handed to the workers once, as a temporary file: tasks carry only
+its path and a page range, and each worker reads and parses a document once
+and keeps the reader for its following ranges.
+"""
+
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Below this many pages the pool's start-up/pickling cost outweighs the gain
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+MAX_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+WORKER_READERS = 2  # parsed documents each worker keeps (concurrent uploads interleave)
+
+_pool = None
+_pool_lock = threading.Lock()
+_readers = OrderedDict()  # in worker processes: (path, inode, mtime) -> PdfReader
+
+
+def _get_pool():
+    """Process pool shared by all sessions; spawn avoids forking Streamlit's threads"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def read_bytes(pdf):
+    """Raw bytes of an uploaded file, a path or a bytes object"""
+    if isinstance(pdf, (bytes, bytearray)):
+        return bytes(pdf)
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as f:
+            return f.read()
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def count_pages(data):
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def _reader(path):
+    """PdfReader for the file at `path`, parsed once per worker"""
+    from PyPDF2 import PdfReader
+
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_mtime_ns)
+    reader = _readers.get(key)
+    if reader is None:
+        with open(path, "rb") as f:
+            reader = PdfReader(io.BytesIO(f.read()))  # don't keep the parent's temp file open
+        _readers[key] = reader
+        while len(_readers) > WORKER_READERS:
+            _readers.popitem(last=False)
+    else:
+        _readers.move_to_end(key)
+    return reader
+
+
+def extract_page_range(path, start, stop):
+    """Texts of pages [start, stop) of the PDF file at `path` (runs in worker processes)"""
+    reader = _reader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _ranges(num_pages, parts):
+    size = -(-num_pages // parts)
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+def iter_pages(pdf_docs, workers=None):
+    """
+    Yield the text of every page of every PDF, in document/page order.
+
+    Large PDFs are extracted by the process pool, but only a bounded window of
+    page ranges is in flight at a time, so memory does not grow with the
+    document: pages are handed out as soon as their range is done.
+    """
+    from PyPDF2 import PdfReader
+
+    workers = workers or MAX_WORKERS
+    for pdf in pdf_docs:
+        data = read_bytes(pdf)
+        reader = PdfReader(io.BytesIO(data))
+        num_pages = len(reader.pages)
+        if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            continue
+        del reader
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(data)
+        del data
+        # A few ranges per worker keeps them busy when pages vary in cost
+        ranges = iter(_ranges(num_pages, workers * 4))
+        pool = _get_pool()
+        window = deque(
+            pool.submit(extract_page_range, f.name, a, b) for a, b in islice(ranges, workers * 2)
+        )
+        try:
+            while window:
+                texts = window.popleft().result()
+                for a, b in islice(ranges, 1):
+                    window.append(pool.submit(extract_page_range, f.name, a, b))
+                yield from texts
+        finally:
+            # Consumer stopped early (error, cancelled job): don't extract the rest
+            for future in window:
+                future.cancel()
+            for future in window:
+                if not future.cancelled():
+                    future.exception()  # wait for running tasks, which may still be reading the file
+            os.remove(f.name)
+
@@ -0,0 +1,255 @@
+"""
+Content-addressed on-disk cache of extracted text, chunks and embeddings.
+
+Entries are keyed by the SHA-256 of the PDF bytes, so the same file uploaded
+again - by anyone - skips extraction, and with the same chunking parameters
+and embedding model also skips chunking and embedding:
+
+    <root>/<sha256>/text.txt                       extracted text (page order)
+    <root>/<sha256>/chunks-<params>/chunks.jsonl   one chunk per line
+    <root>/<sha256>/chunks-<params>/vectors.f32    float32 row-major vectors
+    <root>/<sha256>/chunks-<params>/meta.json      {"count", "dim", ...}
+
+Everything is written to a temporary name and renamed into place when
+complete, so readers never see partial entries. When the cache grows past
+`max_bytes` the least recently used documents are evicted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from core import metrics
+
+DEFAULT_ROOT = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdf"))
+DEFAULT_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+TEXT_BLOCK_CHARS = 64 * 1024
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def params_key(chunk_size, chunk_overlap, embedding_model, dedupe=None):
+    params = [chunk_size, chunk_overlap, embedding_model]
+    if dedupe is not None:
+        params.append(dedupe)
+    payload = json.dumps(params)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class ChunkWriter:
+    """Appends chunk/vector batches to a temporary entry; `commit()` publishes it"""
+
+    def __init__(self, final_dir, meta):
+        parent = os.path.dirname(final_dir)
+        os.makedirs(parent, exist_ok=True)
+        self.final_dir = final_dir
+        self.meta = dict(meta, count=0, dim=None)
+        self.tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        self._chunks = open(os.path.join(self.tmp_dir, "chunks.jsonl"), "w", encoding="utf-8")
+        self._vectors = open(os.path.join(self.tmp_dir, "vectors.f32"), "wb")
+
+    def add(self, chunks, vectors):
+        import numpy as np
+
+        array = np.asarray(vectors, dtype=np.float32)
+        self.meta["dim"] = int(array.shape[1])
+        for chunk in chunks:
+            self._chunks.write(json.dumps(chunk) + "\n")
+        self._vectors.write(array.tobytes())
+        self.meta["count"] += len(chunks)
+
+    def commit(self):
+        self._chunks.close()
+        self._vectors.close()
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+        try:
+            os.rename(self.tmp_dir, self.final_dir)
+        except OSError:
+            # Another session published the same entry first
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def discard(self):
+        self._chunks.close()
+        self._vectors.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class PdfCache:
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {
+            "text_hits": 0,
+            "text_misses": 0,
+            "chunk_hits": 0,
+            "chunk_misses": 0,
+            "evictions": 0,
+        }
+        os.makedirs(root, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _doc_dir(self, sha):
+        return os.path.join(self.root, sha)
+
+    def _touch(self, sha):
+        marker = os.path.join(self._doc_dir(sha), ".used")
+        try:
+            with open(marker, "a"):
+                pass
+            os.utime(marker)
+        except OSError:
+            pass
+
+    # ---- extracted text ------------------------------------------------------
+
+    def iter_text(self, sha):
+        """Cached text in blocks, or None on a miss"""
+        path = os.path.join(self._doc_dir(sha), "text.txt")
+        if not os.path.exists(path):
+            self._count("text_misses")
+            return None
+        self._count("text_hits")
+        self._touch(sha)
+
+        def blocks():
+            with open(path, "r", encoding="utf-8") as f:
+                while block := f.read(TEXT_BLOCK_CHARS):
+                    yield block
+
+        return blocks()
+
+    def write_text(self, sha, texts):
+        """Pass `texts` through while saving them; published only if fully consumed"""
+        doc_dir = self._doc_dir(sha)
+        os.makedirs(doc_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=doc_dir, prefix=".tmp-", suffix=".txt")
+        complete = False
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for text in texts:
+                    f.write(text)
+                    yield text
+            os.replace(tmp_path, os.path.join(doc_dir, "text.txt"))
+            complete = True
+            self._touch(sha)
+        finally:
+            if not complete and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # ---- chunks and vectors ------------------------------------------------
+
+    def _chunk_dir(self, sha, params):
+        return os.path.join(self._doc_dir(sha), f"chunks-{params}")
+
+    def load_chunks(self, sha, params, batch_size):
+        """
+        Cached `(chunks, vectors)` batches for a document, or None on a miss.
+
+        Vectors are memory-mapped, so only one batch is materialised at a time.
+        """
+        import numpy as np
+
+        chunk_dir = self._chunk_dir(sha, params)
+        meta_path = os.path.join(chunk_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            self._count("chunk_misses")
+            return None
+        self._count("chunk_hits")
+        self._touch(sha)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        def batches():
+            if not meta["count"]:
+                return
+            vectors = np.memmap(
+                os.path.join(chunk_dir, "vectors.f32"),
+                dtype=np.float32,
+                mode="r",
+                shape=(meta["count"], meta["dim"]),
+            )
+            with open(os.path.join(chunk_dir, "chunks.jsonl"), encoding="utf-8") as f:
+                row, batch = 0, []
+                for line in f:
+                    batch.append(json.loads(line))
+                    if len(batch) == batch_size:
+                        yield batch, np.array(vectors[row:row + len(batch)])
+                        row += len(batch)
+                        batch = []
+                if batch:
+                    yield batch, np.array(vectors[row:row + len(batch)])
+
+        return batches()
+
+    def chunk_writer(self, sha, params, **meta):
+        return ChunkWriter(self._chunk_dir(sha, params), meta)
+
+    # ---- eviction ------------------------------------------------------------
+
+    def _entries(self):
+        entries = []
+        for sha in os.listdir(self.root):
+            doc_dir = self._doc_dir(sha)
+            if not os.path.isdir(doc_dir):
+                continue
+            marker = os.path.join(doc_dir, ".used")
+            used = os.path.getmtime(marker) if os.path.exists(marker) else os.path.getmtime(doc_dir)
+            entries.append((used, sha, _dir_size(doc_dir)))
+        return entries
+
+    def evict(self, keep=()):
+        """Drop least recently used documents until the cache fits `max_bytes`"""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, sha, size in entries:
+            if total <= self.max_bytes:
+                break
+            if sha in keep:
+                continue
+            shutil.rmtree(self._doc_dir(sha), ignore_errors=True)
+            total -= size
+            self._count("evictions")
+        return total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for kind in ("text", "chunk"):
+            lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_rate"] = stats[f"{kind}_hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """Process-wide `PdfCache` under `PDF_CACHE_DIR` (default `.cache/pdf`)"""
+    global _pdf_cache
+    with _pdf_cache_lock:
+        if _pdf_cache is None:
+            _pdf_cache = PdfCache()
+            metrics.register_collector("pdf_cache", _pdf_cache.stats)
+        return _pdf_cache
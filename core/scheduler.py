@@ -0,0 +1,302 @@
+"""
+Process-wide request scheduler for every LLM and embedding call.
+
+Provides:
+- token buckets for requests per minute and tokens per minute
+- a bounded concurrency pool
+- exponential backoff with jitter on retryable errors (429, 5xx, timeouts)
+- priority classes: interactive calls (chat, SQL) are admitted before
+  default calls, which are admitted before bulk jobs (PDF embedding)
+
+Calls run in the caller's thread (each Streamlit session already has its own
+script thread); the scheduler only decides *when* they may start.
+
+Usage:
+    from core.scheduler import Priority, get_scheduler
+
+    text = get_scheduler().run(lambda: model.generate_content(prompt).text,
+                               priority=Priority.INTERACTIVE, tokens=1200)
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTION_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+}
+
+
+class Priority(IntEnum):
+    """Lower value = admitted first"""
+
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BULK = 2
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when a call still fails with a retryable error after all retries"""
+
+    def __init__(self, attempts, last_error):
+        super().__init__(
+            f"Gemini is busy (rate limited or temporarily unavailable) after {attempts} attempts. "
+            "Please try again in a few seconds."
+        )
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+def is_retryable(exc):
+    """True for 429s, 5xx and timeouts from google-api-core, gRPC or HTTP clients"""
+    if isinstance(exc, RateLimitedError):
+        return False
+    if type(exc).__name__ in RETRYABLE_EXCEPTION_NAMES:
+        return True
+    for attr in ("code", "status_code"):
+        code = getattr(exc, attr, None)
+        if callable(code):
+            try:
+                code = code()
+            except Exception:
+                code = None
+        code = getattr(code, "value", code)
+        if isinstance(code, tuple):  # grpc.StatusCode values are (int, name)
+            code = code[0]
+        if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+            return True
+    return False
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) for the TPM bucket"""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = " ".join(part for part in text if isinstance(part, str))
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_minute`"""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class Scheduler:
+    """
+    Admission control + retries for upstream model calls.
+
+    Not a thread pool: `run()` blocks the calling thread until the call is
+    admitted (priority first, then FIFO), then executes it there.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=60,
+        tokens_per_minute=1_000_000,
+        max_concurrency=8,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=30.0,
+        sleep=time.sleep,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "rate_limited": 0}
+
+    # ---- admission -------------------------------------------------------
+
+    def _acquire(self, priority, tokens):
+        ticket = (int(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                        wait = max(
+                            self.request_bucket.wait_time(1),
+                            self.token_bucket.wait_time(tokens),
+                        )
+                        if wait <= 0:
+                            break
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait()
+                heapq.heappop(self._waiting)
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(tokens)
+                self._active += 1
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=Priority.DEFAULT, tokens=0):
+        """Hold one concurrency slot (after rate-limit admission) for the block"""
+        self._acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    # ---- execution -------------------------------------------------------
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _count(self, name, amount=1):
+        with self._cond:
+            self._stats[name] += amount
+
+    def _retry_or_raise(self, attempt, exc):
+        if not is_retryable(exc):
+            self._count("failures")
+            raise exc
+        if attempt > self.max_retries:
+            self._count("failures")
+            self._count("rate_limited")
+            metrics.count("llm_rate_limited_total", help_text="Calls that exhausted their retries")
+            raise RateLimitedError(attempt, exc) from exc
+        delay = self.backoff(attempt)
+        self._count("retries")
+        metrics.count("llm_retries_total", help_text="Retried upstream calls", error=type(exc).__name__)
+        logger.warning("Retryable error (%s), retry %d in %.2fs", exc, attempt, delay)
+        self._sleep(delay)
+
+    def run(self, fn, priority=Priority.DEFAULT, tokens=0):
+        """
+        Run `fn()` once admitted, retrying retryable errors with backoff.
+
+        The concurrency slot is released while backing off so a throttled call
+        does not block others.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self.slot(priority, tokens):
+                    return fn()
+            except Exception as exc:
+                self._retry_or_raise(attempt, exc)
+
+    def run_stream(self, fn, priority=Priority.DEFAULT, tokens=0):
+        """
+        Generator version of `run()` for streaming calls.
+
+        `fn()` must return an iterator. Retries happen only until the first
+        chunk arrives; the slot is held until the stream is exhausted or closed.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            self._acquire(priority, tokens)
+            try:
+                iterator = iter(fn())
+                try:
+                    first = next(iterator)
+                except StopIteration:
+                    self._release()  # empty stream (e.g. a fully safety-blocked response)
+                    return
+            except Exception as exc:
+                self._release()
+                self._retry_or_raise(attempt, exc)
+                continue
+            try:
+                yield first
+                yield from iterator
+            finally:
+                self._release()
+            return
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["waiting"] = len(self._waiting)
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler configured from `GEMINI_RPM`, `GEMINI_TPM`, `LLM_MAX_CONCURRENCY`"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(
+                requests_per_minute=int(os.getenv("GEMINI_RPM", "60")),
+                tokens_per_minute=int(os.getenv("GEMINI_TPM", "1000000")),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            )
+            metrics.register_collector("scheduler", lambda: get_scheduler().stats())
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replace the process-wide scheduler (tests and benchmarks)"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
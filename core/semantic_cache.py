@@ -0,0 +1,143 @@
+"""
+Semantic answer cache for the RAG page.
+
+Answers are cached per document set (the index fingerprint, shared by every
+session that indexed the same PDFs with the same settings) together with the
+embedding of the question. A new question whose embedding has cosine
+similarity of at least `threshold` with a cached question of the same
+document set gets the cached answer, skipping the search and the LLM call.
+
+Entries expire after `ttl` seconds; past `max_entries` the least recently
+used one is evicted. The threshold depends on the embedder: paraphrases
+score about 0.9+ with Gemini embeddings but lower with the local hashing
+embedder.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from core import metrics
+
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+DEFAULT_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: Any
+    vector: Any = field(repr=False)
+    created: float
+    similarity: float = 1.0
+
+
+class SemanticCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 clock=time.time):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # (scope, id) -> CachedAnswer, least recently used first
+        self._matrices = {}  # scope -> (keys, stacked unit vectors), rebuilt after changes
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def _unit(vector):
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._matrices.pop(key[0], None)
+
+    def _matrix(self, scope):
+        import numpy as np
+
+        if scope not in self._matrices:
+            keys = [key for key in self._entries if key[0] == scope]
+            vectors = np.vstack([self._entries[key].vector for key in keys]) if keys else None
+            self._matrices[scope] = (keys, vectors)
+        return self._matrices[scope]
+
+    def lookup(self, scope, vector):
+        """
+        The cached answer for the most similar question in `scope`, or None.
+
+        Returns:
+            CachedAnswer | None: a copy with `similarity` set to the cosine
+            similarity between `vector` and the cached question
+        """
+        query = self._unit(vector)
+        now = self._clock()
+        with self._lock:
+            keys, vectors = self._matrix(scope)
+            best = None
+            if keys:
+                similarities = vectors @ query
+                for index in similarities.argsort()[::-1]:
+                    if similarities[index] < self.threshold:
+                        break
+                    key = keys[index]
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if now - entry.created > self.ttl:
+                        self._remove(key)
+                        self._stats["expired"] += 1
+                        continue
+                    self._entries.move_to_end(key)
+                    best = CachedAnswer(entry.question, entry.answer, entry.vector, entry.created,
+                                        float(similarities[index]))
+                    break
+            self._stats["hits" if best else "misses"] += 1
+        metrics.count("semantic_cache_lookups_total", outcome="hit" if best else "miss",
+                      help_text="Semantic answer cache lookups")
+        return best
+
+    def store(self, scope, question, vector, answer):
+        with self._lock:
+            key = (scope, self._next_id)
+            self._next_id += 1
+            self._entries[key] = CachedAnswer(question, answer, self._unit(vector), self._clock())
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self, scope=None):
+        with self._lock:
+            for key in [key for key in self._entries if scope is None or key[0] == scope]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Process-wide `SemanticCache`, shared by all sessions"""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+            metrics.register_collector("semantic_cache", _semantic_cache.stats)
+        return _semantic_cache
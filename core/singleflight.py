@@ -0,0 +1,113 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When several sessions submit the same request (same model, prompt and config)
+at the same moment, only the first one (the leader) goes upstream; the others
+wait for it and share its result - or its exception.
+"""
+
+import threading
+
+from core import metrics
+
+
+class _Call:
+    """One in-flight upstream call"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def resolve(self, value):
+        self.value = value
+        self._done.set()
+
+    def fail(self, error):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for an identical in-flight request")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Abandoned(RuntimeError):
+    """The leader stopped before producing a result (e.g. a closed stream)"""
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key and counts how many were coalesced"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def join(self, key):
+        """
+        Register interest in `key`.
+
+        Returns:
+            (call, is_leader): the leader must finish the call with `complete()`
+            or `abandon()`; followers just `call.wait()`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self._stats["leaders"] += 1
+            return call, True
+
+    def _forget(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def complete(self, key, call, value=None, error=None):
+        """Publish the leader's result (or exception) and forget the key"""
+        self._forget(key, call)
+        if error is not None:
+            call.fail(error)
+        else:
+            call.resolve(value)
+
+    def abandon(self, key, call):
+        self.complete(key, call, error=Abandoned("Leader request was abandoned"))
+
+    def do(self, key, fn):
+        """Run `fn()` once for all concurrent callers with the same `key`"""
+        call, leader = self.join(key)
+        if not leader:
+            try:
+                return call.wait()
+            except Abandoned:
+                return fn()
+        try:
+            value = fn()
+        except BaseException as exc:
+            self.complete(key, call, error=exc)
+            raise
+        self.complete(key, call, value=value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+_flights = SingleFlight()
+metrics.register_collector("singleflight", _flights.stats)
+
+
+def get_single_flight():
+    """Process-wide `SingleFlight` used for LLM calls"""
+    return _flights
@@ -0,0 +1,182 @@
+"""
+Streaming SQL dump import for the SQL query page.
+
+Decoding a whole upload and handing it to `executescript` keeps the dump in
+memory twice (bytes and str), runs every statement in its own implicit
+transaction and gives no progress. `load_dump` instead:
+
+- reads the file in `chunk_bytes` pieces through an incremental UTF-8
+  decoder and splits statements as they complete (`sqlite3.complete_statement`
+  handles quotes, comments and trigger bodies), so only the current
+  statement is buffered
+- runs `batch_statements` statements per explicit transaction; the dump's own
+  BEGIN/COMMIT statements are skipped
+- sets `synchronous=OFF` and `journal_mode=OFF` for the import and restores
+  the previous settings afterwards. Without a journal a failed import leaves
+  the database in an undefined state, so only load into a fresh file
+- runs the dump's PRAGMAs (e.g. `foreign_keys=OFF`) between batches, on the
+  connection, since several have no effect inside a transaction; its own
+  `synchronous`/`journal_mode` are ignored, the import sets those
+- reports bytes, statements and rows (per second) to `on_progress`
+"""
+
+import codecs
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1024 * 1024
+LOAD_BATCH_STATEMENTS = int(os.getenv("SQL_LOAD_BATCH_STATEMENTS", "20000"))
+PROGRESS_INTERVAL = 0.25  # seconds between `on_progress` calls
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "END", "ROLLBACK")
+LOADER_PRAGMAS = ("synchronous", "journal_mode")
+
+_LEADING_COMMENTS = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?(?:\*/|$))*", re.DOTALL)
+_KEYWORD = re.compile(r"[A-Za-z]+")
+_PRAGMA_NAME = re.compile(r"PRAGMA\s+(?:\w+\s*\.\s*)?(\w+)", re.IGNORECASE)
+
+
+def iter_statements(chunks):
+    """
+    Complete SQL statements (stripped, with their `;`) from text `chunks`.
+
+    A trailing statement without `;` is yielded as is.
+    """
+    pending, scanned = "", 0
+    for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(";", scanned)
+            if end == -1:
+                break
+            scanned = end + 1
+            statement = pending[start:scanned]
+            if sqlite3.complete_statement(statement):
+                statement = statement.strip()
+                if statement != ";":
+                    yield statement
+                start = scanned
+        pending = pending[start:]
+        scanned -= start
+    if pending.strip():
+        yield pending.strip()
+
+
+def _read_text(fileobj, chunk_bytes, progress):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        data = fileobj.read(chunk_bytes)
+        progress["bytes"] += len(data)
+        if not data:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(data)
+
+
+def _keyword(statement):
+    """First keyword of `statement` (upper case), behind any leading comments"""
+    keyword = _KEYWORD.match(statement, _LEADING_COMMENTS.match(statement).end())
+    return keyword.group().upper() if keyword is not None else ""
+
+
+
+def load_dump(fileobj, conn, total_bytes=None, batch_statements=LOAD_BATCH_STATEMENTS,
+              chunk_bytes=READ_CHUNK_BYTES, on_progress=None):
+    """
+    Execute a SQL dump into `conn` statement by statement.
+
+    Args:
+        fileobj: binary file-like object with the dump (UTF-8)
+        conn (sqlite3.Connection): writable connection, ideally to a new file
+        total_bytes (int | None): size of the dump, for `on_progress`
+        batch_statements (int): statements per transaction
+        chunk_bytes (int): bytes read at a time
+        on_progress (callable | None): called with the stats dict below
+            (plus `total_bytes`) while loading and once at the end
+
+    Returns:
+        dict: statements, rows, bytes, transactions, seconds,
+        statements_per_sec, rows_per_sec
+    """
+    stats = {"statements": 0, "rows": 0, "bytes": 0, "transactions": 0, "seconds": 0.0,
+             "statements_per_sec": 0.0, "rows_per_sec": 0.0}
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    isolation_level = conn.isolation_level
+    if conn.in_transaction:
+        conn.commit()
+    conn.isolation_level = None  # transactions are managed below
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=OFF")
+    start = last_report = time.perf_counter()
+    changes = conn.total_changes
+
+    def report(final=False):
+        nonlocal last_report
+        now = time.perf_counter()
+        if not final and now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        stats["seconds"] = now - start
+        stats["rows"] = conn.total_changes - changes
+        if stats["seconds"] > 0:
+            stats["statements_per_sec"] = stats["statements"] / stats["seconds"]
+            stats["rows_per_sec"] = stats["rows"] / stats["seconds"]
+        if on_progress is not None:
+            on_progress(dict(stats, total_bytes=total_bytes))
+
+    in_batch = 0
+    try:
+        with metrics.timed("sqlite.load_dump"):
+            for statement in iter_statements(_read_text(fileobj, chunk_bytes, stats)):
+                keyword = _keyword(statement)
+                if keyword in TRANSACTION_CONTROL:
+                    continue
+                if keyword == "PRAGMA":
+                    name = _PRAGMA_NAME.search(statement)
+                    if name is not None and name.group(1).lower() in LOADER_PRAGMAS:
+                        continue
+                    if conn.in_transaction:
+                        conn.execute("COMMIT")
+                        stats["transactions"] += 1
+                        in_batch = 0
+                    conn.execute(statement)
+                    stats["statements"] += 1
+                    continue
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                conn.execute(statement)
+                stats["statements"] += 1
+                in_batch += 1
+                if in_batch >= batch_statements:
+                    conn.execute("COMMIT")
+                    stats["transactions"] += 1
+                    in_batch = 0
+                report()
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+                stats["transactions"] += 1
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.isolation_level = isolation_level
+    report(final=True)
+    metrics.count("sqlite_load_statements_total", stats["statements"], help_text="SQL dump statements executed")
+    metrics.count("sqlite_load_rows_total", stats["rows"], help_text="Rows changed by SQL dump imports")
+    logger.info(
+        "loaded SQL dump: %d bytes, %d statements (%.0f/s), %d rows (%.0f/s) in %d transactions, %.2fs",
+        stats["bytes"], stats["statements"], stats["statements_per_sec"], stats["rows"],
+        stats["rows_per_sec"], stats["transactions"], stats["seconds"],
+    )
+    return stats
@@ -0,0 +1,225 @@
+"""
+Cost guardrails for generated SQL.
+
+Whatever the model writes runs on a server thread, and a cross join or an
+unindexed join over large tables can keep it busy for minutes. Before a
+query runs, `QueryGuard.check`:
+
+- runs `EXPLAIN QUERY PLAN` and estimates the rows examined: loops under the
+  same plan node are nested (their costs multiply), separate subqueries add.
+  A full `SCAN` costs the table's rows, an equality `SEARCH` about log2 of
+  them, a range `SEARCH` a quarter of them (SQLite's own guess). The plan
+  names tables by their alias, so aliases are mapped back to tables from
+  the query's FROM/JOIN clauses
+- flags full scans of large tables and nested full scans (cartesian
+  products / joins without a usable index)
+- refuses queries whose estimate exceeds `max_cost`
+- caps returned rows: a SELECT without a top-level `LIMIT` (or with a larger
+  one) is rewritten to `SELECT * FROM (<query>) LIMIT max_rows`
+
+Every decision is logged with its estimated cost. `interruptible` then
+bounds the wall-clock time of the statements that actually run, through a
+SQLite progress handler that aborts the query after `timeout` seconds or
+when a cancel event is set.
+"""
+
+import logging
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from core import metrics
+from core.sql_results import strip_statement
+from core.sql_schema import estimate_table_rows
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "100000"))
+MAX_COST = float(os.getenv("SQL_MAX_COST", "1e9"))
+QUERY_TIMEOUT = float(os.getenv("SQL_QUERY_TIMEOUT", "30"))
+LARGE_TABLE_ROWS = int(os.getenv("SQL_LARGE_TABLE_ROWS", "100000"))
+PROGRESS_OPS = 10000  # SQLite VM instructions between timeout checks
+
+_STEP = re.compile(
+    r"^(SCAN|SEARCH) (?:TABLE |SUBQUERY )?(\S+)(?: AS (\S+))?(.*)$"
+)
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)(?:\s*(,|OFFSET)\s*(\d+))?\s*$", re.IGNORECASE)
+_REWRITABLE = ("SELECT", "WITH", "VALUES")
+_NAME = r'"(?:[^"]|"")+"|`[^`]+`|\[[^\]]+\]|\w+'
+# `FROM t a`, `JOIN t AS a`, `, t a` (comma joins). A lookahead, so a keyword
+# read as the alias (`FROM t JOIN u x`) doesn't hide the next reference
+_TABLE_REF = re.compile(rf"(?=(?:\bFROM|\bJOIN|,)\s*({_NAME})(?:\s+(?:AS\s+)?({_NAME}))?)", re.IGNORECASE)
+_LEADING_COMMENTS = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?(?:\*/|$))*", re.DOTALL)
+
+
+class QueryTimeout(Exception):
+    """Raised when `interruptible` aborted a statement"""
+
+
+@dataclass
+class GuardDecision:
+    sql: str  # the statement to run (possibly rewritten)
+    original_sql: str
+    allowed: bool
+    estimated_cost: float  # estimated rows examined
+    warnings: list = field(default_factory=list)
+    plan: list = field(default_factory=list)
+    limit_applied: Optional[int] = None
+    reason: str = ""
+
+
+def _unquote(name):
+    if name[0] in "\"`[":
+        return name[1:-1].replace('""', '"') if name[0] == '"' else name[1:-1]
+    return name
+
+
+def _aliases(sql, tables):
+    """Alias -> table for the tables in `tables` (lower-cased names) that `sql` aliases"""
+    aliases = {}
+    for match in _TABLE_REF.finditer(sql):
+        table, alias = match.groups()
+        if alias is not None and _unquote(table).lower() in tables:
+            aliases[_unquote(alias).lower()] = _unquote(table).lower()
+    return aliases
+
+
+def _first_keyword(sql):
+    return sql[_LEADING_COMMENTS.match(sql).end():].split(None, 1)[0].split("(", 1)[0].upper()
+
+
+def _limit(sql):
+    """The row count of the top-level numeric LIMIT of `sql`, or None"""
+    match = _LIMIT.search(sql)
+    if match is None:
+        return None
+    first, separator, second = match.groups()
+    return int(second) if separator == "," else int(first)
+
+
+@contextmanager
+def interruptible(conn, timeout=QUERY_TIMEOUT, cancel=None, ops=PROGRESS_OPS):
+    """
+    Abort statements run on `conn` inside the block after `timeout` seconds
+    or once `cancel` (a threading.Event) is set; raises QueryTimeout.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    aborted = []
+
+    def handler():
+        if (deadline is not None and time.monotonic() > deadline) or (cancel is not None and cancel.is_set()):
+            aborted.append(True)
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, ops)
+    try:
+        yield conn
+    except Exception as exc:
+        if aborted:
+            reason = "cancelled" if cancel is not None and cancel.is_set() else f"timed out after {timeout:g}s"
+            metrics.count("sql_guard_interrupts_total", reason=reason.split()[0],
+                          help_text="Queries aborted by the SQL guard")
+            raise QueryTimeout(f"Query {reason}") from exc
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+class QueryGuard:
+    def __init__(self, max_rows=MAX_ROWS, max_cost=MAX_COST, timeout=QUERY_TIMEOUT,
+                 large_table_rows=LARGE_TABLE_ROWS):
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.large_table_rows = large_table_rows
+
+    def _estimate(self, plan, table_rows, sql=""):
+        """(estimated rows examined, warnings) for the `EXPLAIN QUERY PLAN` rows of `sql`"""
+        # Subqueries and CTEs the plan scans by name cost like the largest table
+        default_rows = max(table_rows.values(), default=self.large_table_rows)
+        table_rows = {table.lower(): rows for table, rows in table_rows.items()}
+        aliases = _aliases(sql, table_rows)
+        loops = {}  # parent node -> [(kind, name, rows, factor)], outermost loop first
+        warnings = []
+        for _, parent, _, detail in plan:
+            match = _STEP.match(detail)
+            if match is None or "CONSTANT ROW" in detail:
+                continue
+            kind, name, alias, using = match.groups()
+            table = aliases.get(name.lower(), name.lower())
+            rows = table_rows.get(table, default_rows)
+            if kind == "SCAN":
+                factor = rows
+            elif "AUTOMATIC" in using:
+                factor = math.log2(rows + 1) + 1
+                warnings.append(f"no index for the join on {alias or name}; SQLite builds a temporary one")
+            elif "=" in using and not any(op in using for op in ("<", ">")):
+                factor = math.log2(rows + 1) + 1
+            else:
+                factor = max(1.0, rows / 4)
+            loops.setdefault(parent, []).append((kind, alias or name, rows, factor))
+
+        cost = 0.0
+        for steps in loops.values():
+            outer = 1.0
+            for position, (kind, name, rows, factor) in enumerate(steps):
+                if kind == "SCAN" and position and outer * rows >= self.large_table_rows:
+                    warnings.append(
+                        f"full scan of {name} (~{rows:,} rows) for each of ~{outer:,.0f} outer rows: "
+                        f"cartesian product or join without an index"
+                    )
+                elif kind == "SCAN" and rows >= self.large_table_rows:
+                    warnings.append(f"full scan of {name} (~{rows:,} rows)")
+                outer *= factor
+                cost += outer
+        return cost, warnings
+
+    def check(self, conn, sql, table_rows=None, cap_rows=True):
+        """
+        Decide whether (and how) to run `sql`.
+
+        Args:
+            conn (sqlite3.Connection): connection to the database the query targets
+            sql (str): a single statement
+            table_rows (dict | None): approximate rows per table; estimated
+                with `estimate_table_rows` if not given
+            cap_rows (bool): add/lower a LIMIT to `max_rows`
+
+        Returns:
+            GuardDecision
+        """
+        sql = strip_statement(sql)
+        if table_rows is None:
+            table_rows = estimate_table_rows(conn)
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except Exception as exc:
+            decision = GuardDecision(sql, sql, False, 0.0, reason=f"invalid query: {exc}")
+        else:
+            cost, warnings = self._estimate(plan, table_rows, sql)
+            decision = GuardDecision(sql, sql, True, cost, warnings, [row[3] for row in plan])
+            if self.max_cost and cost > self.max_cost:
+                decision.allowed = False
+                decision.reason = f"estimated {cost:,.0f} rows examined exceeds the limit of {self.max_cost:,.0f}"
+            elif cap_rows and self.max_rows and _first_keyword(sql) in _REWRITABLE:
+                limit = _limit(sql)
+                if limit is None or limit > self.max_rows:
+                    # Own lines, so a trailing `--` comment can't swallow the parenthesis
+                    decision.sql = f"SELECT * FROM (\n{sql}\n) LIMIT {self.max_rows}"
+                    decision.limit_applied = self.max_rows
+
+        outcome = "rejected" if not decision.allowed else "rewritten" if decision.limit_applied else "allowed"
+        metrics.count("sql_guard_decisions_total", outcome=outcome, help_text="SQL guard decisions")
+        logger.info(
+            "sql guard: %s (estimated cost %.0f rows examined%s%s): %s",
+            outcome, decision.estimated_cost,
+            f", {decision.reason}" if decision.reason else "",
+            "".join(f"; {warning}" for warning in decision.warnings),
+            " ".join(sql.split())[:200],
+        )
+        return decision
@@ -0,0 +1,220 @@
+"""
+Paged and streamed SQL query results for the SQL query page.
+
+`pd.read_sql_query` materializes every row of a result in one DataFrame, and
+`to_csv()` then builds the whole export as one string, so a careless
+`SELECT *` on a large table exhausts the worker's memory. Instead:
+
+- `count_rows` counts the result with `SELECT COUNT(*) FROM (<query>)`
+  without fetching it
+- `fetch_page` returns one page (`LIMIT`/`OFFSET` around the query)
+- `export_csv` / `export_parquet` write the result batch by batch from the
+  cursor (`fetchmany`) into a file object, so memory is bounded by
+  `batch_size` rows. Parquet needs the optional pyarrow package.
+  Streamlit's download button still holds the finished export in memory to
+  serve it (`export_bytes` hands it over as bytes), so exports stop with
+  `ExportTooLarge` once they pass `max_bytes`.
+
+Statements that can't be wrapped in a subquery (PRAGMA, EXPLAIN, ...) fall
+back to running the query and skipping/counting rows from its cursor. Only
+the errors such a wrap produces trigger the fallback; anything else, in
+particular an interrupt from the SQL guard's timeout, propagates instead of
+running the query a second time.
+"""
+
+import csv
+import importlib.util
+import io
+import os
+import sqlite3
+import tempfile
+
+from core import metrics
+
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+DEFAULT_PAGE_SIZE = int(os.getenv("SQL_PAGE_SIZE", "100"))
+EXPORT_BATCH_ROWS = int(os.getenv("SQL_EXPORT_BATCH_ROWS", "5000"))
+EXPORT_MAX_BYTES = int(os.getenv("SQL_EXPORT_MAX_BYTES", str(200 * 1024 ** 2)))
+# What SQLite reports for `SELECT ... FROM (<statement>)` when the statement
+# isn't a query: "near ...: syntax error", or "no such table: PRAGMA" for a
+# PRAGMA without arguments (read as a table name)
+_UNWRAPPABLE_ERRORS = ("syntax error", "no such table")
+
+
+class ExportTooLarge(ValueError):
+    """Raised when an export grows past its `max_bytes`"""
+
+
+def strip_statement(sql):
+    """`sql` without surrounding whitespace and trailing semicolons or comments"""
+    end = i = 0
+    while i < len(sql):
+        if sql.startswith("--", i):
+            i = sql.find("\n", i)
+            i = len(sql) if i == -1 else i + 1
+        elif sql.startswith("/*", i):
+            i = sql.find("*/", i + 2)
+            i = len(sql) if i == -1 else i + 2
+        elif sql[i] in "'\"`[":
+            # Quoted string or identifier; a doubled quote just starts the next one
+            i = sql.find("]" if sql[i] == "[" else sql[i], i + 1)
+            i = end = len(sql) if i == -1 else i + 1
+        else:
+            if not sql[i].isspace() and sql[i] != ";":
+                end = i + 1
+            i += 1
+    return sql[:end].strip()
+
+
+def _unwrappable(exc):
+    """True if `exc` (raised by the wrapped statement) calls for the cursor fallback"""
+    message = str(exc)
+    return message != "interrupted" and any(error in message for error in _UNWRAPPABLE_ERRORS)
+
+
+def _check_size(fileobj, start, max_bytes):
+    if max_bytes and fileobj.tell() - start > max_bytes:
+        raise ExportTooLarge(
+            f"The export is larger than {max_bytes / 1024 ** 2:,.0f} MB; select fewer rows or columns"
+        )
+
+
+def _columns(cursor):
+    return [column[0] for column in cursor.description or ()]
+
+
+def iter_batches(conn, sql, batch_size=EXPORT_BATCH_ROWS):
+    """
+    Yield (column names, rows) for each batch of at most `batch_size` rows
+    of `sql`; an empty result yields one empty batch.
+    """
+    cursor = conn.execute(strip_statement(sql))
+    columns = _columns(cursor)
+    try:
+        rows = cursor.fetchmany(batch_size)
+        yield columns, rows
+        while rows:
+            rows = cursor.fetchmany(batch_size)
+            if rows:
+                yield columns, rows
+    finally:
+        cursor.close()
+
+
+def count_rows(conn, sql):
+    """Number of rows `sql` returns"""
+    sql = strip_statement(sql)
+    with metrics.timed("sqlite.count"):
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM (\n{sql}\n)").fetchone()[0]
+        except sqlite3.OperationalError as exc:
+            if not _unwrappable(exc):
+                raise
+            return sum(len(rows) for _, rows in iter_batches(conn, sql))
+
+
+def fetch_page(conn, sql, page, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of the result of `sql`.
+
+    Args:
+        conn (sqlite3.Connection): connection to run the query on
+        sql (str): a single query
+        page (int): zero-based page number
+        page_size (int): rows per page
+
+    Returns:
+        (list[str], list[tuple]): column names and the page's rows
+    """
+    sql = strip_statement(sql)
+    with metrics.timed("sqlite.query"):
+        try:
+            # Own lines, so a trailing `--` comment can't swallow the parenthesis
+            cursor = conn.execute(f"SELECT * FROM (\n{sql}\n) LIMIT ? OFFSET ?", (page_size, page * page_size))
+        except sqlite3.OperationalError as exc:
+            if not _unwrappable(exc):
+                raise
+            cursor = conn.execute(sql)
+            skip = page * page_size
+            while skip > 0 and cursor.fetchmany(min(skip, EXPORT_BATCH_ROWS)):
+                skip -= EXPORT_BATCH_ROWS
+        try:
+            return _columns(cursor), cursor.fetchmany(page_size)
+        finally:
+            cursor.close()
+
+
+def export_csv(conn, sql, fileobj, batch_size=EXPORT_BATCH_ROWS, max_bytes=EXPORT_MAX_BYTES):
+    """
+    Write the result of `sql` as UTF-8 CSV (with header) to binary, seekable
+    `fileobj`; returns the row count. Raises ExportTooLarge past `max_bytes`
+    (0 = no limit).
+    """
+    start = fileobj.tell()
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    rows_written = 0
+    try:
+        with metrics.timed("sqlite.export", format="csv"):
+            for columns, rows in iter_batches(conn, sql, batch_size):
+                if not rows_written:
+                    writer.writerow(columns)
+                writer.writerows(rows)
+                rows_written += len(rows)
+                text.flush()
+                _check_size(fileobj, start, max_bytes)
+    finally:
+        text.detach()  # leave `fileobj` open for the caller
+    return rows_written
+
+
+def export_parquet(conn, sql, fileobj, batch_size=EXPORT_BATCH_ROWS, max_bytes=EXPORT_MAX_BYTES):
+    """
+    Write the result of `sql` as Parquet to binary, seekable `fileobj`;
+    returns the row count. Raises ExportTooLarge past `max_bytes` (0 = no limit).
+
+    Column types are inferred from the first batch (all-NULL columns become
+    strings). SQLite allows mixed types in a column; a later value that
+    doesn't fit the inferred type raises ValueError.
+    """
+    if not PARQUET_AVAILABLE:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    start = fileobj.tell()
+    writer = schema = None
+    rows_written = 0
+    with metrics.timed("sqlite.export", format="parquet"):
+        for columns, rows in iter_batches(conn, sql, batch_size):
+            values = list(zip(*rows)) or [() for _ in columns]
+            if schema is None:
+                fields = []
+                for name, column in zip(columns, values):
+                    kind = pa.array(column).type
+                    fields.append(pa.field(name, pa.string() if pa.types.is_null(kind) else kind))
+                schema = pa.schema(fields)
+                writer = pq.ParquetWriter(fileobj, schema)
+            try:
+                arrays = [pa.array(column, type=field.type) for column, field in zip(values, schema)]
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as exc:
+                raise ValueError(f"Mixed column types can't be exported as Parquet, use CSV ({exc})") from exc
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            rows_written += len(rows)
+            _check_size(fileobj, start, max_bytes)
+        writer.close()
+    return rows_written
+
+
+def export_bytes(conn, sql, file_format="csv", max_bytes=EXPORT_MAX_BYTES):
+    """
+    The whole export of `sql` as bytes, for `st.download_button` (which
+    accepts bytes but not an open temp file). It is written to an anonymous
+    temp file first, so only the finished export is held in memory.
+    """
+    export = export_parquet if file_format == "parquet" else export_csv
+    with tempfile.TemporaryFile() as output:
+        export(conn, sql, output, max_bytes=max_bytes)
+        output.seek(0)
+        return output.read()
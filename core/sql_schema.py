@@ -0,0 +1,187 @@
+"""
+Fingerprinted, process-wide schema snapshots for the SQL query page.
+
+Schema introspection ran a `PRAGMA table_info` per table on every database
+load, in every session, and only kept column names and types. A snapshot
+now also has each table's primary key, indexes, foreign keys and
+approximate row count (for prompts and the SQL guard's cost estimates), and
+is computed once per database content:
+
+- the fingerprint is the SHA-256 of the database file plus
+  `PRAGMA schema_version`, so every session that loads the same file
+  shares one snapshot wherever the upload was stored, and a schema change
+  made through a connection yields a new one. File digests are memoized by
+  (path, size, mtime), so reloading an unchanged file doesn't rehash it
+- concurrent requests for the same fingerprint are coalesced; the first
+  computes, the others wait for its result
+- at most `max_entries` snapshots are kept, least recently used evicted
+
+Snapshots are shared between sessions and must not be modified.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from core import metrics
+from core.singleflight import SingleFlight
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("SQL_SCHEMA_CACHE_ENTRIES", "64"))
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def estimate_table_rows(conn):
+    """
+    Approximate row counts of all tables: `sqlite_stat1` (written by
+    ANALYZE) where available, otherwise `MAX(rowid)` (an index lookup, but
+    wrong after many deletes). Tables without rowid and no stats are omitted.
+    """
+    rows = {}
+    try:
+        for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+            rows[table] = int(stat.split()[0])  # the first number is the table's row count
+    except Exception:
+        pass
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    for table in tables:
+        if table in rows:
+            continue
+        quoted = '"' + table.replace('"', '""') + '"'
+        try:
+            rows[table] = conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0
+        except Exception:
+            continue
+    return rows
+
+
+def introspect(conn):
+    """
+    Schema of every table reachable through `conn`.
+
+    Returns:
+        dict: table name -> {"columns", "types", "not_null", "primary_key",
+        "indexes": [{"name", "columns", "unique"}],
+        "foreign_keys": [{"columns", "table", "to_columns"}], "rows"}
+        ("rows" is approximate, None if unknown)
+    """
+    row_counts = estimate_table_rows(conn)
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    )]
+    schema = {}
+    for table in tables:
+        columns = conn.execute(
+            "SELECT name, type, \"notnull\", pk FROM pragma_table_info(?) ORDER BY cid", (table,)
+        ).fetchall()
+        indexes = []
+        for name, unique in conn.execute("SELECT name, \"unique\" FROM pragma_index_list(?)", (table,)):
+            indexed = conn.execute("SELECT name FROM pragma_index_info(?) ORDER BY seqno", (name,)).fetchall()
+            indexes.append({"name": name, "columns": [column for (column,) in indexed], "unique": bool(unique)})
+        foreign_keys = {}
+        for key_id, target, source, to in conn.execute(
+            "SELECT id, \"table\", \"from\", \"to\" FROM pragma_foreign_key_list(?) ORDER BY id, seq", (table,)
+        ):
+            key = foreign_keys.setdefault(key_id, {"columns": [], "table": target, "to_columns": []})
+            key["columns"].append(source)
+            key["to_columns"].append(to)
+        schema[table] = {
+            "columns": [column[0] for column in columns],
+            "types": [column[1] for column in columns],
+            "not_null": [column[0] for column in columns if column[2]],
+            "primary_key": [column[0] for column in sorted(columns, key=lambda c: c[3]) if column[3]],
+            "indexes": indexes,
+            "foreign_keys": list(foreign_keys.values()),
+            "rows": row_counts.get(table),
+        }
+    return schema
+
+
+class SchemaCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._snapshots = OrderedDict()  # fingerprint -> schema, least recently used first
+        self._digests = OrderedDict()  # path -> ((size, mtime_ns), file SHA-256)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "files_hashed": 0}
+
+    def file_digest(self, path):
+        """SHA-256 of the file at `path`, memoized while its size and mtime are unchanged"""
+        st = os.stat(path)
+        path, version = os.path.abspath(path), (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[0] == version:
+            return known[1]
+        sha = hashlib.sha256()
+        with metrics.timed("sqlite.fingerprint"), open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._digests[path] = (version, digest)
+            self._digests.move_to_end(path)
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+            self._stats["files_hashed"] += 1
+        return digest
+
+    def fingerprint(self, conn, path):
+        """Database fingerprint: file hash + schema version"""
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        return f"{self.file_digest(path)}:{schema_version}"
+
+    def get(self, conn, path):
+        """
+        The schema snapshot of the database `path`, read through `conn`.
+
+        Returns:
+            dict: see `introspect`; shared, don't modify
+        """
+        fingerprint = self.fingerprint(conn, path)
+        with self._lock:
+            schema = self._snapshots.get(fingerprint)
+            if schema is not None:
+                self._snapshots.move_to_end(fingerprint)
+                self._stats["hits"] += 1
+                return schema
+        call, leader = self._flight.join(fingerprint)
+        if not leader:
+            with self._lock:
+                self._stats["hits"] += 1
+            return call.wait()
+        try:
+            with metrics.timed("sqlite.schema"):
+                schema = introspect(conn)
+        except Exception as exc:
+            self._flight.complete(fingerprint, call, error=exc)
+            raise
+        with self._lock:
+            self._snapshots[fingerprint] = schema
+            self._stats["misses"] += 1
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+                self._stats["evictions"] += 1
+        self._flight.complete(fingerprint, call, schema)
+        return schema
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._snapshots))
+
+
+_schema_cache = None
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema_cache():
+    """Process-wide `SchemaCache`, shared by all sessions"""
+    global _schema_cache
+    with _schema_cache_lock:
+        if _schema_cache is None:
+            _schema_cache = SchemaCache()
+            metrics.register_collector("sql_schema_cache", _schema_cache.stats)
+        return _schema_cache
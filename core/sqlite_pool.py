@@ -0,0 +1,274 @@
+"""
+Pooled, tuned SQLite connections for the SQL query page.
+
+A connection per Streamlit session is a poor fit: reruns happen on different
+threads (so `check_same_thread` has to be off), nothing closes the
+connection when the user loads another database, and default pragmas leave
+large analytical databases reading through a 2 MB page cache.
+
+`ConnectionPool` keeps up to `size` connections to one database file, hands
+each to one thread at a time and closes those that have been idle for
+`idle_timeout` seconds. Connections are read-only (`mode=ro` URI) unless
+writes are requested, and are opened with:
+
+- `mmap_size`: pages are read through a memory map instead of `read()` calls
+- `cache_size`: a larger page cache for repeated scans
+- `temp_store=MEMORY`: sorts and temporary b-trees stay off disk
+- `journal_mode=WAL` (writable connections only): readers don't block the
+  writer, and read-only connections can keep reading while a database is
+  being loaded
+
+`SQLitePools` holds one pool per (file, read-only) pair for the process, so
+every session querying the same database shares its connections. Idle
+connections are swept whenever a pool is requested and, for the
+process-wide pools, every `SQLITE_SWEEP_INTERVAL` seconds by a daemon
+thread, so a quiet app doesn't keep file handles open indefinitely.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("SQLITE_IDLE_TIMEOUT", "600"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(1024 ** 3)))
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+SWEEP_INTERVAL = float(os.getenv("SQLITE_SWEEP_INTERVAL", "60"))
+BUSY_TIMEOUT = 30
+
+
+def connect(path, readonly=True):
+    """
+    Open a tuned connection to `path`.
+
+    Args:
+        path (str): database file
+        readonly (bool): open with `mode=ro`, so the connection cannot write
+            (and the file must exist)
+
+    Returns:
+        sqlite3.Connection: usable from any thread (one at a time)
+    """
+    with metrics.timed("sqlite.connect", mode="ro" if readonly else "rw"):
+        if readonly:
+            uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        else:
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if not readonly:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path, readonly=True, size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.path = path
+        self.readonly = readonly
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.last_used = time.time()
+        self._idle = []  # (connection, returned at), most recently returned last
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"opened": 0, "reused": 0, "waits": 0, "closed_idle": 0}
+
+    @contextmanager
+    def connection(self, timeout=BUSY_TIMEOUT):
+        """
+        Check out a connection for the duration of the `with` block.
+
+        Blocks (up to `timeout` seconds) while all `size` connections are in
+        use. An open transaction is rolled back when the block exits.
+        """
+        conn = self._acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Connection pool for {self.path} is closed")
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._in_use += 1
+                    self._stats["reused"] += 1
+                    return conn
+                if self._in_use < self.size:
+                    self._in_use += 1
+                    break
+                self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise TimeoutError(f"No free connection to {self.path} after {timeout}s")
+        try:
+            conn = connect(self.path, self.readonly)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["opened"] += 1
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._in_use -= 1
+            self.last_used = time.time()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.append((conn, self.last_used))
+            self._cond.notify()
+
+    def close_idle(self, now=None):
+        """Close connections idle for longer than `idle_timeout`; returns how many"""
+        cutoff = (now if now is not None else time.time()) - self.idle_timeout
+        with self._cond:
+            stale = [conn for conn, returned in self._idle if returned < cutoff]
+            self._idle = [(conn, returned) for conn, returned in self._idle if returned >= cutoff]
+            self._stats["closed_idle"] += len(stale)
+        for conn in stale:
+            conn.close()
+        return len(stale)
+
+    def close(self):
+        """Close idle connections now and checked-out ones when they are returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    @property
+    def unused(self):
+        with self._cond:
+            return not self._idle and not self._in_use
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, idle=len(self._idle), in_use=self._in_use)
+
+
+class SQLitePools:
+    """Process-wide `ConnectionPool`s keyed by (absolute path, read-only)"""
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._pools = {}
+        self._retired = {"opened": 0, "reused": 0, "waits": 0, "closed_idle": 0}  # from dropped pools
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+    def _retire(self, pool):
+        for key in self._retired:
+            self._retired[key] += pool.stats()[key]
+
+    def pool(self, path, readonly=True):
+        self.close_idle()
+        key = (os.path.abspath(path), readonly)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ConnectionPool(key[0], readonly, self.size, self.idle_timeout)
+            pool.last_used = time.time()  # not swept between here and the caller's checkout
+            return pool
+
+    def connection(self, path, readonly=True):
+        """`with pools.connection(path) as conn:` - a pooled connection to `path`"""
+        return self.pool(path, readonly).connection()
+
+    def close_idle(self, now=None):
+        """Close idle connections and forget pools that have nothing open"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            pools = list(self._pools.items())
+        closed = sum(pool.close_idle(now) for _, pool in pools)
+        with self._lock:
+            for key, pool in pools:
+                if pool.unused and now - pool.last_used > pool.idle_timeout and self._pools.get(key) is pool:
+                    self._retire(self._pools.pop(key))
+        if closed:
+            logger.info("closed %d idle SQLite connections", closed)
+        return closed
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """Run `close_idle` every `interval` seconds on a daemon thread"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._stop_sweeper.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep, args=(interval,), name="sqlite-pool-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        with self._lock:
+            sweeper, self._sweeper = self._sweeper, None
+        self._stop_sweeper.set()
+        if sweeper is not None:
+            sweeper.join()
+
+    def _sweep(self, interval):
+        while not self._stop_sweeper.wait(interval):
+            try:
+                self.close_idle()
+            except Exception:
+                logger.exception("sweeping idle SQLite connections failed")
+
+    def release(self, path):
+        """Close every pool for `path` (e.g. before the file is replaced or deleted)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            pools = [self._pools.pop(key) for key in list(self._pools) if key[0] == path]
+            for pool in pools:
+                self._retire(pool)
+        for pool in pools:
+            pool.close()
+
+    def stats(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            totals = dict(self._retired, pools=len(pools), idle=0, in_use=0)
+        for pool in pools:
+            for key, value in pool.stats().items():
+                totals[key] += value
+        return totals
+
+
+_sqlite_pools = None
+_sqlite_pools_lock = threading.Lock()
+
+
+def get_sqlite_pools():
+    """Process-wide `SQLitePools`, shared by all sessions"""
+    global _sqlite_pools
+    with _sqlite_pools_lock:
+        if _sqlite_pools is None:
+            _sqlite_pools = SQLitePools()
+            _sqlite_pools.start_sweeper()
+            metrics.register_collector("sqlite_pools", _sqlite_pools.stats)
+        return _sqlite_pools
@@ -0,0 +1,439 @@
+"""
+FAISS index storage for the RAG page.
+
+`FAISS.load_local` unpickles the docstore and reads the whole index from disk;
+doing that for every question dominated answer latency. Loaded stores are
+kept in a process-level cache keyed by index directory and invalidated
+automatically when the files on disk change (modification time + size), with
+LRU eviction by estimated memory footprint.
+
+Indexes live in namespaces, one per browser session and document set, so
+concurrent users never overwrite each other's index:
+
+    <root>/<session id>/<document-set fingerprint>/index.faiss
+    <root>/<session id>/<document-set fingerprint>/index.pkl
+    <root>/<session id>/<document-set fingerprint>/manifest.json
+
+Every index is written to a temporary directory and renamed into place, and
+namespaces not used for `ttl` seconds are removed by `cleanup()`.
+
+The index type is selectable (`INDEX_SPECS`): exact flat search, IVF, HNSW or
+IVF-PQ, with IVF variants trained on a sample of the first vectors. Indexes
+larger than `MMAP_MIN_BYTES` are loaded memory-mapped and read-only, so
+several worker processes share their pages through the OS page cache.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("FAISS_CACHE_MAX_BYTES", str(1024 ** 3)))
+DEFAULT_ROOT = os.getenv("FAISS_INDEX_DIR", os.path.join(".cache", "indexes"))
+DEFAULT_TTL = float(os.getenv("FAISS_INDEX_TTL", str(24 * 3600)))
+INDEX_FILES = ("index.faiss", "index.pkl")
+MANIFEST = "manifest.json"
+MMAP_MIN_BYTES = int(os.getenv("FAISS_MMAP_MIN_BYTES", str(64 * 1024 ** 2)))
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "16384"))
+IVF_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+DEFAULT_SPEC = os.getenv("FAISS_INDEX_SPEC", "flat")
+
+INDEX_SPECS = {
+    "flat": "Exact search (best for a few thousand chunks)",
+    "ivf-flat": "Inverted lists, exact vectors (fast, near-exact)",
+    "hnsw": "Graph search (fastest queries, more memory)",
+    "ivf-pq": "Inverted lists + product quantization (smallest)",
+}
+
+
+def _needs_training(spec):
+    return spec.lower() in ("ivf-flat", "ivf-pq") or spec.upper().startswith("IVF")
+
+
+def _pq_subquantizers(dim):
+    """Largest m dividing `dim` with at least 8 dimensions per sub-vector"""
+    return max(m for m in range(1, dim // 8 + 1) if dim % m == 0) if dim >= 8 else 1
+
+
+def resolve_spec(spec, dim, n_train):
+    """
+    `faiss.index_factory` string for `spec` given `n_train` training vectors.
+
+    Named specs scale the number of IVF lists with the sample (~4*sqrt(n),
+    at least 39 points per centroid) and fall back to simpler indexes when
+    there is too little data to train; anything else is passed to
+    `index_factory` as is.
+    """
+    name = spec.lower()
+    if name == "flat":
+        return "Flat"
+    if name == "hnsw":
+        return "HNSW32"
+    if name in ("ivf-flat", "ivf-pq"):
+        nlist = min(int(4 * math.sqrt(n_train)), n_train // 39)
+        if nlist < 2:
+            return "Flat"
+        # PQ codebooks have 256 centroids per sub-quantizer
+        if name == "ivf-pq" and n_train >= 256 * 39:
+            return f"IVF{nlist},PQ{_pq_subquantizers(dim)}"
+        return f"IVF{nlist},Flat"
+    return spec
+
+
+def _tune(index):
+    import faiss
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(ivf.nlist, IVF_NPROBE)
+    except RuntimeError:
+        pass
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = HNSW_EF_SEARCH
+
+
+class IndexBuilder:
+    """
+    Builds a LangChain FAISS store of type `spec` from `(text, vector)` batches.
+
+    Indexes that need training buffer the first `train_size` vectors, train
+    on them and then add everything; others are created on the first batch.
+    """
+
+    def __init__(self, embeddings, spec=DEFAULT_SPEC, train_size=TRAIN_SAMPLE):
+        self.embeddings = embeddings
+        self.spec = spec
+        self.train_size = train_size
+        self.factory = None
+        self.store = None
+        self.build_seconds = 0.0
+        self._pending = []
+
+    def add(self, pairs):
+        start = time.perf_counter()
+        if self.store is not None:
+            self.store.add_embeddings(pairs)
+        else:
+            self._pending.extend(pairs)
+            if not _needs_training(self.spec) or len(self._pending) >= self.train_size:
+                self._create()
+        self.build_seconds += time.perf_counter() - start
+
+    def finish(self):
+        """The built store, or None if nothing was added"""
+        if self.store is None and self._pending:
+            start = time.perf_counter()
+            self._create()
+            self.build_seconds += time.perf_counter() - start
+        return self.store
+
+    def _create(self):
+        import faiss
+        import numpy as np
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        vectors = np.asarray([vector for _, vector in self._pending], dtype=np.float32)
+        self.factory = resolve_spec(self.spec, vectors.shape[1], len(vectors))
+        index = faiss.index_factory(vectors.shape[1], self.factory)
+        if not index.is_trained:
+            with metrics.timed("faiss.train", spec=self.factory):
+                index.train(vectors)
+        _tune(index)
+        self.store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        self.store.add_embeddings(self._pending)
+        self._pending = []
+
+
+def index_signature(path):
+    """(mtime_ns, size) of the index files; changes whenever the index is rewritten"""
+    signature = []
+    for name in INDEX_FILES:
+        stat = os.stat(os.path.join(path, name))
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def estimate_footprint(path, mmap=False):
+    """
+    In-memory size is close to the on-disk size of the vectors + pickled
+    docstore; a memory-mapped index lives in the page cache, not the process.
+    """
+    names = INDEX_FILES[1:] if mmap else INDEX_FILES
+    return sum(os.path.getsize(os.path.join(path, name)) for name in names)
+
+
+def use_mmap(path):
+    return os.path.getsize(os.path.join(path, "index.faiss")) >= MMAP_MIN_BYTES
+
+
+def read_store(path, embeddings, mmap=False):
+    """
+    Load the store saved at `path`. With `mmap` the FAISS index is mapped
+    read-only instead of read into memory, so it cannot be added to.
+
+    `IO_FLAG_MMAP_IFC` maps Flat, IVF and HNSW data alike; combined with
+    `IO_FLAG_MMAP` it fails for IVF indexes, so only one flag is used
+    (`IO_FLAG_MMAP`, which maps IVF inverted lists only, on faiss versions
+    without the other). An index that can't be mapped is read normally.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    if not mmap:
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    import faiss
+
+    index_path = os.path.join(path, "index.faiss")
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        index = faiss.read_index(index_path, flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as exc:
+        logger.warning("Memory-mapping %s failed, reading it into memory: %s", index_path, exc)
+        index = faiss.read_index(index_path)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+class IndexCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (signature, store, size)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _key(self, path):
+        return os.path.abspath(path)
+
+    def _put(self, key, signature, store, size):
+        self._entries[key] = (signature, store, size)
+        self._entries.move_to_end(key)
+        total = sum(entry[2] for entry in self._entries.values())
+        # Always keep the entry just added, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            total -= evicted_size
+            self._stats["evictions"] += 1
+
+    def load(self, path, embeddings):
+        """
+        Return the vector store saved at `path`, loading it only if needed.
+
+        Raises:
+            FileNotFoundError: no index has been saved at `path`
+        """
+        key = self._key(path)
+        signature = index_signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # One loader per index; concurrent sessions wait for it instead of loading too
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == signature:
+                    self._stats["hits"] += 1
+                    return entry[1]
+                self._stats["misses"] += 1
+
+            mmap = use_mmap(path)
+            with metrics.timed("faiss.load", mmap=str(mmap).lower()):
+                store = read_store(path, embeddings, mmap=mmap)
+            with self._lock:
+                self._put(key, signature, store, estimate_footprint(path, mmap))
+            return store
+
+    def save(self, store, path, manifest=None):
+        """Atomically save `store` to `path` and keep it cached as the current version"""
+        with metrics.timed("faiss.save"):
+            write_atomic(store, path, manifest)
+        key = self._key(path)
+        with self._lock:
+            self._put(key, index_signature(path), store, estimate_footprint(path))
+
+    def invalidate(self, path):
+        with self._lock:
+            if self._entries.pop(self._key(path), None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = sum(entry[2] for entry in self._entries.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def write_atomic(store, path, manifest=None):
+    """
+    Write `store` (and `manifest` as manifest.json) to `path` via a temporary
+    sibling directory, so readers see either the old index or the new one.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        store.save_local(tmp_dir)
+        if manifest is not None:
+            with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+                json.dump(manifest, f)
+        if os.path.isdir(path):
+            # Directories cannot be replaced in one rename; swap the old one out first
+            old_dir = tempfile.mkdtemp(dir=parent, prefix=".old-")
+            os.replace(path, os.path.join(old_dir, "index"))
+            os.replace(tmp_dir, path)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def docset_fingerprint(doc_shas, params):
+    """Identity of an index: the set of document hashes and the chunking/embedding params"""
+    payload = json.dumps([params, sorted(set(doc_shas))])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class IndexNamespaces:
+    """Per-session, per-document-set index directories under `root`"""
+
+    def __init__(self, root=DEFAULT_ROOT, ttl=DEFAULT_TTL, cache=None):
+        self.root = root
+        self.ttl = ttl
+        self.cache = cache if cache is not None else _index_cache
+
+    def path(self, session_id, doc_shas, params):
+        return os.path.join(self.root, session_id, docset_fingerprint(doc_shas, params))
+
+    def manifest(self, path):
+        """The manifest saved with the index at `path`, or None if there is none"""
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def reusable(self, path, doc_shas, params):
+        """
+        Documents already indexed at `path` if that index can be extended to
+        cover `doc_shas` - same params and no document removed - else None.
+        """
+        manifest = self.manifest(path) if path else None
+        if manifest is None or manifest.get("params") != params:
+            return None
+        indexed = set(manifest.get("documents", ()))
+        return indexed if indexed <= set(doc_shas) else None
+
+    def load(self, path, embeddings, writable=False):
+        """
+        Cached load that also marks the namespace as recently used. With
+        `writable` the caller gets a private in-memory copy it may add to.
+        """
+        if writable:
+            with metrics.timed("faiss.load", mmap="false"):
+                store = read_store(path, embeddings)
+        else:
+            store = self.cache.load(path, embeddings)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return store
+
+    def save(self, store, session_id, doc_shas, params, **info):
+        """
+        Save `store` as the index for this session and document set; returns
+        its path. `info` (e.g. index spec, build time) goes into the manifest.
+        """
+        fingerprint = docset_fingerprint(doc_shas, params)
+        path = os.path.join(self.root, session_id, fingerprint)
+        manifest = dict(info, params=params, documents=sorted(set(doc_shas)), fingerprint=fingerprint,
+                        created=time.time())
+        self.cache.save(store, path, manifest)
+        return path
+
+    def drop(self, path):
+        self.cache.invalidate(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def cleanup(self, now=None):
+        """Remove namespaces unused for `ttl` seconds and leftover temp dirs; returns the count"""
+        if not os.path.isdir(self.root):
+            return 0
+        now = time.time() if now is None else now
+        removed = 0
+        for session in os.scandir(self.root):
+            if not session.is_dir():
+                continue
+            for entry in os.scandir(session.path):
+                try:
+                    idle = now - entry.stat().st_mtime
+                except OSError:
+                    continue
+                if entry.is_dir() and idle > self.ttl:
+                    self.drop(entry.path)
+                    removed += 1
+            try:
+                os.rmdir(session.path)  # only succeeds once the session has no namespaces left
+            except OSError:
+                pass
+        if removed:
+            metrics.count("faiss_namespaces_removed_total", removed, help_text="Abandoned FAISS index namespaces removed")
+        return removed
+
+
+_index_cache = IndexCache()
+metrics.register_collector("faiss_index_cache", _index_cache.stats)
+
+
+def load_index(path, embeddings):
+    """Cached `FAISS.load_local(path, embeddings)`"""
+    return _index_cache.load(path, embeddings)
+
+
+def save_index(store, path, manifest=None):
+    """Atomic `store.save_local(path)` that also refreshes the process-level cache"""
+    _index_cache.save(store, path, manifest)
+
+
+def invalidate_index(path):
+    _index_cache.invalidate(path)
+
+
+def get_index_cache():
+    return _index_cache
+
+
+_namespaces = None
+
+
+def get_index_namespaces():
+    global _namespaces
+    if _namespaces is None:
+        _namespaces = IndexNamespaces()
+    return _namespaces
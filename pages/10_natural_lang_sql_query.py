@@ -2,16 +2,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import streamlit as st
-import os
 import sqlite3
+import os
+import math
+import functools
 import pandas as pd
 import tempfile
-import google.generativeai as genai
-
-# ============================================================
-# CONFIGURE GEMINI API
-# ============================================================
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from core import metrics
+from core.llm import generate_text
+from core.scheduler import Priority, RateLimitedError
+from core.sql_dump import load_dump
+from core.sql_results import (
+    DEFAULT_PAGE_SIZE, EXPORT_MAX_BYTES, PARQUET_AVAILABLE, count_rows, export_bytes, fetch_page
+)
+from core.sql_guard import QueryGuard, interruptible
+from core.sql_schema import get_schema_cache
+from core.sqlite_pool import connect, get_sqlite_pools
+
+metrics.set_page("sql_query")
 
 # ============================================================
 # CUSTOM CSS FOR ENHANCED UI
@@ -107,7 +115,7 @@ st.markdown("""
 - 🤖 Convert natural language to SQL
 - 🔍 Execute queries on your database
 - 📊 View results in table format
-- 💾 Download results as CSV
+- 💾 Download results as CSV or Parquet
 - 📝 Sample database included
 """)
 
@@ -116,14 +124,16 @@ st.markdown("---")
 # ============================================================
 # SESSION STATE INITIALIZATION
 # ============================================================
-if "db_connection" not in st.session_state:
-    st.session_state.db_connection = None
 if "db_path" not in st.session_state:
     st.session_state.db_path = None
 if "db_name" not in st.session_state:
     st.session_state.db_name = None
+if "db_load_stats" not in st.session_state:
+    st.session_state.db_load_stats = None
 if "table_schema" not in st.session_state:
     st.session_state.table_schema = None
+if "query_result" not in st.session_state:
+    st.session_state.query_result = None
 if "query_history" not in st.session_state:
     st.session_state.query_history = []
 
@@ -177,24 +187,22 @@ def create_sample_database():
         st.error(f"❌ Error creating sample database: {str(e)}")
         return None
 
-def get_database_schema(conn):
-    """Get schema information from database"""
+def set_database(db_path, db_name, load_stats=None):
+    """Make `db_path` the session's database; its connections come from the shared pool"""
+    previous = st.session_state.db_path
+    if previous and previous != db_path:
+        get_sqlite_pools().release(previous)
+    st.session_state.db_path = db_path
+    st.session_state.db_name = db_name
+    st.session_state.db_load_stats = load_stats
+    st.session_state.query_result = None
+    with get_sqlite_pools().connection(db_path) as conn:
+        st.session_state.table_schema = get_database_schema(conn, db_path)
+
+def get_database_schema(conn, db_path):
+    """Get schema information from database (cached per database fingerprint, shared by all sessions)"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        schema_info = {}
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            schema_info[table_name] = {
-                "columns": [col[1] for col in columns],
-                "types": [col[2] for col in columns]
-            }
-        
-        return schema_info
+        return get_schema_cache().get(conn, db_path)
     except Exception as e:
         st.error(f"❌ Error getting schema: {str(e)}")
         return None
@@ -206,6 +214,11 @@ def generate_sql_query(natural_language_query, schema_info):
         for table_name, info in schema_info.items():
             columns = ", ".join([f"{col} ({type_})" for col, type_ in zip(info["columns"], info["types"])])
             schema_text += f"- Table: {table_name} ({columns})\n"
+            for key in info["foreign_keys"]:
+                schema_text += (
+                    f"  - {', '.join(key['columns'])} references "
+                    f"{key['table']}({', '.join(key['to_columns'])})\n"
+                )
         
         prompt = f"""You are an expert SQL developer. 
 Convert the following natural language query to SQL for a SQLite database.
@@ -219,72 +232,102 @@ DO NOT include Markdown formatting, backticks (```), or the word 'sql'.
 Ensure the query is valid for SQLite."""
         
         
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
+        # Deterministic prompt (schema + question) -> cache the generated SQL
+        response_text = generate_text(
+            'gemini-2.0-flash', prompt, cache=True, priority=Priority.INTERACTIVE
+        )
         
         # CLEANUP: Remove backticks and 'sql' tag if the model ignores instructions
-        sql_query = response.text.strip().replace("```sql", "").replace("```", "").strip()
+        sql_query = response_text.strip().replace("```sql", "").replace("```", "").strip()
         return sql_query
+    except RateLimitedError as e:
+        st.warning(f"⏳ {str(e)}")
+        return None
     except Exception as e:
         st.error(f"❌ Error generating SQL: {str(e)}")
         return None
 
-def execute_sql_query(conn, sql_query):
-    """Execute SQL query and return results"""
+query_guard = QueryGuard()
+
+def guard_sql_query(db_path, sql_query, cap_rows=True):
+    """Check the query plan's estimated cost and cap the rows before running it"""
+    table_rows = {
+        table: info["rows"] for table, info in (st.session_state.table_schema or {}).items()
+        if info["rows"] is not None
+    }
+    try:
+        with get_sqlite_pools().connection(db_path) as conn, interruptible(conn, query_guard.timeout):
+            return query_guard.check(conn, sql_query, table_rows=table_rows, cap_rows=cap_rows)
+    except Exception as e:
+        st.error(f"❌ Error checking query: {str(e)}")
+        return None
+
+def execute_sql_query(db_path, sql_query):
+    """Execute SQL query (read-only) and return the number of result rows"""
     try:
-        df = pd.read_sql_query(sql_query, conn)
-        return df
+        with get_sqlite_pools().connection(db_path) as conn, interruptible(conn, query_guard.timeout):
+            return count_rows(conn, sql_query)
     except Exception as e:
         st.error(f"❌ Error executing query: {str(e)}")
         return None
 
-def load_sql_file(file_path):
-    """Load SQL file and create database"""
+def fetch_result_page(db_path, sql_query, page, page_size):
+    """One page (zero-based) of the query results as a DataFrame"""
     try:
-        temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
-        db_path = temp_db.name
-        temp_db.close()
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Read and execute SQL file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-            
-        # Execute all statements
-        cursor.executescript(sql_content)
-        conn.commit()
-        
-        return db_path, conn
+        with get_sqlite_pools().connection(db_path) as conn, interruptible(conn, query_guard.timeout):
+            columns, rows = fetch_page(conn, sql_query, page, page_size)
+        return pd.DataFrame(rows, columns=columns)
     except Exception as e:
-        st.error(f"❌ Error loading SQL file: {str(e)}")
-        return None, None
+        st.error(f"❌ Error fetching results: {str(e)}")
+        return None
+
+def export_results(db_path, sql_query, file_format):
+    """
+    The full results as bytes (runs when a download button is clicked).
+    Streamlit serves them from memory, hence `SQL_EXPORT_MAX_BYTES`.
+    """
+    with get_sqlite_pools().connection(db_path) as conn, interruptible(conn, query_guard.timeout):
+        return export_bytes(conn, sql_query, file_format)
+
+def load_sql_file(file_path):
+    """Load SQL file and create database"""
+    with open(file_path, 'rb') as f:
+        return load_sql_dump(f, os.path.getsize(file_path))
+
+def show_load_progress(progress_bar, stats):
+    total = stats["total_bytes"]
+    fraction = min(stats["bytes"] / total, 1.0) if total else 0.0
+    progress_bar.progress(
+        fraction,
+        text=f"{stats['bytes'] / 1e6:.1f} / {(total or 0) / 1e6:.1f} MB · "
+             f"{stats['statements']:,} statements ({stats['statements_per_sec']:,.0f}/s) · "
+             f"{stats['rows']:,} rows ({stats['rows_per_sec']:,.0f}/s)"
+    )
 
-def load_sql_dump(file_content):
-    """Load SQL dump from uploaded file"""
+def load_sql_dump(fileobj, total_bytes=None):
+    """Stream a SQL dump (binary file object) into a new database file; returns (db_path, load stats)"""
+    temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+    db_path = temp_db.name
+    temp_db.close()
+    
+    progress_bar = st.progress(0.0, text="Loading SQL dump...")
+    conn = connect(db_path, readonly=False)
     try:
-        temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
-        db_path = temp_db.name
-        temp_db.close()
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Decode if bytes
-        if isinstance(file_content, bytes):
-            sql_content = file_content.decode('utf-8')
-        else:
-            sql_content = file_content
-        
-        # Execute all statements
-        cursor.executescript(sql_content)
-        conn.commit()
-        
-        return db_path, conn
+        stats = load_dump(
+            fileobj, conn, total_bytes=total_bytes,
+            on_progress=lambda stats: show_load_progress(progress_bar, stats)
+        )
     except Exception as e:
         st.error(f"❌ Error loading SQL dump: {str(e)}")
+        stats = None
+    finally:
+        conn.close()
+        progress_bar.empty()
+    
+    if stats is None:
+        os.remove(db_path)
         return None, None
+    return db_path, stats
 
 # ============================================================
 # MAIN APP
@@ -312,14 +355,11 @@ with tab1:
         with col2:
             if st.button("Load SQL File", type="primary"):
                 with st.spinner("Loading SQL file..."):
-                    file_content = sql_file.read()
-                    db_path, conn = load_sql_dump(file_content)
+                    sql_file.seek(0)
+                    db_path, load_stats = load_sql_dump(sql_file, sql_file.size)
                     
-                    if conn:
-                        st.session_state.db_connection = conn
-                        st.session_state.db_path = db_path
-                        st.session_state.db_name = sql_file.name
-                        st.session_state.table_schema = get_database_schema(conn)
+                    if db_path:
+                        set_database(db_path, sql_file.name, load_stats)
                         st.success(f"✅ SQL file loaded successfully!")
                         st.rerun()
 
@@ -348,11 +388,7 @@ with tab2:
                         f.write(db_file.getbuffer())
                     
                     try:
-                        conn = sqlite3.connect(db_path)
-                        st.session_state.db_connection = conn
-                        st.session_state.db_path = db_path
-                        st.session_state.db_name = db_file.name
-                        st.session_state.table_schema = get_database_schema(conn)
+                        set_database(db_path, db_file.name)
                         st.success(f"✅ Database loaded successfully!")
                         st.rerun()
                     except Exception as e:
@@ -377,11 +413,7 @@ with tab3:
         with st.spinner("Creating sample database..."):
             db_path = create_sample_database()
             if db_path:
-                conn = sqlite3.connect(db_path)
-                st.session_state.db_connection = conn
-                st.session_state.db_path = db_path
-                st.session_state.db_name = "sample_database.db"
-                st.session_state.table_schema = get_database_schema(conn)
+                set_database(db_path, "sample_database.db")
                 st.success("✅ Sample database loaded!")
                 st.rerun()
 
@@ -389,7 +421,7 @@ with tab3:
 # DATABASE INFO
 # ============================================================
 
-if st.session_state.db_connection and st.session_state.table_schema:
+if st.session_state.db_path and st.session_state.table_schema:
     st.markdown("---")
     st.subheader("📊 Database Information")
     
@@ -404,22 +436,40 @@ if st.session_state.db_connection and st.session_state.table_schema:
         total_columns = sum(len(info["columns"]) for info in st.session_state.table_schema.values())
         st.metric("Total Columns", total_columns)
     
+    load_stats = st.session_state.db_load_stats
+    if load_stats:
+        st.caption(
+            f"Imported {load_stats['statements']:,} statements ({load_stats['statements_per_sec']:,.0f}/s) "
+            f"and {load_stats['rows']:,} rows ({load_stats['rows_per_sec']:,.0f}/s) "
+            f"from {load_stats['bytes'] / 1e6:.1f} MB in {load_stats['seconds']:.1f}s"
+        )
+    
     # Show schema details
     with st.expander("🔍 Database Schema Details"):
         for table_name, info in st.session_state.table_schema.items():
-            st.markdown(f"**Table: {table_name}**")
+            rows = f" (~{info['rows']:,} rows)" if info["rows"] is not None else ""
+            st.markdown(f"**Table: {table_name}**{rows}")
             schema_df = pd.DataFrame({
                 "Column Name": info["columns"],
-                "Data Type": info["types"]
+                "Data Type": info["types"],
+                "Primary Key": [col in info["primary_key"] for col in info["columns"]],
+                "Not Null": [col in info["not_null"] for col in info["columns"]]
             })
             st.dataframe(schema_df, use_container_width=True, hide_index=True)
+            for index in info["indexes"]:
+                unique = "unique " if index["unique"] else ""
+                st.caption(f"🔑 {unique}index {index['name']} on ({', '.join(index['columns'])})")
+            for key in info["foreign_keys"]:
+                st.caption(
+                    f"🔗 ({', '.join(key['columns'])}) → {key['table']}({', '.join(key['to_columns'])})"
+                )
             st.divider()
 
 # ============================================================
 # QUERY GENERATOR
 # ============================================================
 
-if st.session_state.db_connection:
+if st.session_state.db_path:
     st.markdown("---")
     st.subheader("🤖 Query Generator")
     
@@ -431,6 +481,10 @@ if st.session_state.db_connection:
             placeholder="e.g., 'Show me all students with marks greater than 85'",
             key="natural_query"
         )
+        cap_rows = st.checkbox(
+            f"Limit results to {query_guard.max_rows:,} rows (adds a LIMIT to unbounded queries)",
+            value=True, key="cap_rows"
+        )
     
     with col2:
         generate_btn = st.button("🚀 Generate & Execute", type="primary", use_container_width=True)
@@ -440,36 +494,30 @@ if st.session_state.db_connection:
         with st.spinner("🤔 Generating SQL query..."):
             sql_query = generate_sql_query(natural_query, st.session_state.table_schema)
             
-            if sql_query:
-                st.markdown("---")
-                
-                # Show generated SQL
-                st.markdown("**Generated SQL Query:**")
-                st.markdown(f"""
-                    <div class="query-box">
-                    {sql_query}
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                # Execute query
+            decision = guard_sql_query(st.session_state.db_path, sql_query, cap_rows) if sql_query else None
+            
+            if decision and not decision.allowed:
+                st.session_state.query_result = None
+                st.error(f"🛑 Query blocked: {decision.reason}")
+                st.code(sql_query, language="sql")
+                for warning in decision.warnings:
+                    st.warning(f"⚠️ {warning}")
+            
+            elif decision:
+                # Execute query (count only; pages are fetched below as they are viewed)
                 with st.spinner("⚡ Executing query..."):
-                    results = execute_sql_query(st.session_state.db_connection, sql_query)
+                    total_rows = execute_sql_query(st.session_state.db_path, decision.sql)
                     
-                    if results is not None:
-                        st.success(f"✅ Query executed successfully! ({len(results)} rows)")
-                        
-                        # Show results
-                        st.markdown("**Query Results:**")
-                        st.dataframe(results, use_container_width=True, hide_index=True)
-                        
-                        # Download CSV
-                        csv = results.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download as CSV",
-                            data=csv,
-                            file_name="query_results.csv",
-                            mime="text/csv"
-                        )
+                    if total_rows is not None:
+                        st.session_state.query_result = {
+                            "sql": decision.sql,
+                            "generated_sql": sql_query,
+                            "total": total_rows,
+                            "estimated_cost": decision.estimated_cost,
+                            "warnings": decision.warnings,
+                            "limit": decision.limit_applied,
+                        }
+                        st.session_state.result_page = 1
                         
                         # Add to history
                         st.session_state.query_history.append({
@@ -477,6 +525,69 @@ if st.session_state.db_connection:
                             "sql": sql_query,
                             "timestamp": pd.Timestamp.now()
                         })
+    
+    query_result = st.session_state.query_result
+    if query_result:
+        sql_query, total_rows = query_result["sql"], query_result["total"]
+        st.markdown("---")
+        
+        # Show generated SQL
+        st.markdown("**Generated SQL Query:**")
+        st.markdown(f"""
+            <div class="query-box">
+            {query_result["generated_sql"]}
+            </div>
+        """, unsafe_allow_html=True)
+        
+        st.success(f"✅ Query executed successfully! ({total_rows:,} rows)")
+        st.caption(f"Estimated cost: ~{query_result['estimated_cost']:,.0f} rows examined")
+        for warning in query_result["warnings"]:
+            st.warning(f"⚠️ {warning}")
+        if query_result["limit"] and total_rows >= query_result["limit"]:
+            st.info(f"ℹ️ Results capped at {query_result['limit']:,} rows (LIMIT added to the query)")
+        
+        # Show results, one page at a time
+        st.markdown("**Query Results:**")
+        page_sizes = sorted({50, 100, 500, 1000, DEFAULT_PAGE_SIZE})
+        col1, col2 = st.columns(2)
+        with col1:
+            page_size = st.selectbox(
+                "Rows per page", page_sizes, index=page_sizes.index(DEFAULT_PAGE_SIZE), key="result_page_size"
+            )
+        num_pages = max(1, math.ceil(total_rows / page_size))
+        if st.session_state.get("result_page", 1) > num_pages:
+            st.session_state.result_page = num_pages
+        with col2:
+            page = st.number_input(
+                f"Page (of {num_pages:,})", min_value=1, max_value=num_pages, step=1, key="result_page"
+            )
+        
+        results = fetch_result_page(st.session_state.db_path, sql_query, page - 1, page_size)
+        if results is not None:
+            st.dataframe(results, use_container_width=True, hide_index=True)
+        
+        # Downloads are exported from the cursor only when clicked
+        if EXPORT_MAX_BYTES:
+            st.caption(
+                f"Downloads are held in server memory while they are served, so they are limited to "
+                f"{EXPORT_MAX_BYTES / 1024 ** 2:,.0f} MB; a larger export fails — narrow the query instead."
+            )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 Download as CSV",
+                data=functools.partial(export_results, st.session_state.db_path, sql_query, "csv"),
+                file_name="query_results.csv",
+                mime="text/csv"
+            )
+        with col2:
+            if PARQUET_AVAILABLE:
+                st.download_button(
+                    label="📥 Download as Parquet",
+                    data=functools.partial(export_results, st.session_state.db_path, sql_query, "parquet"),
+                    file_name="query_results.parquet",
+                    mime="application/vnd.apache.parquet"
+                )
 
 # ============================================================
 # QUERY HISTORY
@@ -520,8 +631,8 @@ with st.expander("💡 How to Use"):
     ### 3. Get Results
     - AI converts to SQL
     - Query runs on your database
-    - Results shown in table
-    - Download as CSV
+    - Results shown in table, page by page
+    - Download as CSV or Parquet
     
     ### Supported File Formats
     - `.sql` - SQL dump files
@@ -2,8 +2,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import streamlit as st
-import os
-import google.generativeai as genai
+from core import metrics, models
+from core.llm import stream_text
+from core.scheduler import RateLimitedError
+
+metrics.set_page("text_generation")
 
  
 # CUSTOM CSS FOR ENHANCED UI
@@ -69,12 +72,10 @@ st.markdown("""
 # CONFIGURE GEMINI API
  
 try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        genai.configure(api_key=api_key)
-    else:
-        st.error("❌ GOOGLE_API_KEY not found in .env file")
-        st.stop()
+    models.configure()
+except models.ConfigurationError as e:
+    st.error(f"❌ {str(e)}")
+    st.stop()
 except Exception as e:
     st.error(f"❌ Error configuring Gemini API: {str(e)}")
     st.stop()
@@ -168,9 +169,9 @@ def gemini_text_generation():
             with st.spinner("✨ Generating your content... (This may take a moment)"):
                 try:
                     # Use the latest working model
-                    model = genai.GenerativeModel('gemini-2.5-flash')
-                    
-                    response = model.generate_content(
+                    # Stream tokens as they arrive instead of waiting for up to 8192 tokens
+                    stream = stream_text(
+                        'gemini-2.5-flash',
                         prompt,
                         generation_config={
                             'temperature': temperature,
@@ -186,14 +187,14 @@ def gemini_text_generation():
                             <h3 style="margin-top: 0; color: #667eea;">✅ Generated Content</h3>
                     """, unsafe_allow_html=True)
                     
-                    if response.candidates[0].content.parts:
-                            st.write(response.candidates[0].content.parts[0].text)
+                    st.write_stream(stream)
                     
                     st.markdown("</div>", unsafe_allow_html=True)
+                    st.caption(stream.summary())
                     
                     # Display in code box for easy copying
                     st.markdown("**📋 Copy below:**")
-                    st.code(response.text, language="text")
+                    st.code(stream.text, language="text")
                     
                     # Additional options
                     col1, col2 = st.columns(2)
@@ -205,6 +206,9 @@ def gemini_text_generation():
                         if st.button("🔄 Generate Again", type="secondary"):
                             st.rerun()
                 
+                except RateLimitedError as e:
+                    st.warning(f"⏳ {str(e)}")
+                
                 except Exception as e:
                     error_msg = str(e)
                     st.markdown(f"""
@@ -1,11 +1,11 @@
 import streamlit as st
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from core import metrics
+from core.llm import generate_text
+from core.scheduler import RateLimitedError
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+metrics.set_page("image_analysis")
 
 # Navigation
 if st.button("🏠 Back to Home"):
@@ -27,13 +27,16 @@ def analyze_image_with_gemini():
     
     if uploaded_file and st.button("Analyze", type="primary"):
         
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')        
         image_data = uploaded_file.read()
-        response = model.generate_content([
-            "Analyze this image in detail. Describe what you see.",
-            {"mime_type": uploaded_file.type, "data": image_data}
-        ])
-        st.write(response.text)
+        try:
+            response_text = generate_text('gemini-2.0-flash-exp', [
+                "Analyze this image in detail. Describe what you see.",
+                {"mime_type": uploaded_file.type, "data": image_data}
+            ])
+        except RateLimitedError as e:
+            st.warning(f"⏳ {str(e)}")
+            return
+        st.write(response_text)
 
 analyze_image_with_gemini()
 
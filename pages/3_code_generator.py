@@ -1,11 +1,11 @@
 import streamlit as st
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from core import metrics
+from core.llm import stream_text
+from core.scheduler import RateLimitedError
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+metrics.set_page("code_generator")
 
 if st.button("🏠 Back to Home"):
     st.switch_page("main.py")
@@ -23,10 +23,18 @@ def generate_code_with_gemini():
     
     if st.button("Generate Code", type="primary"):
         if description:
-            model = genai.GenerativeModel('gemini-2.5-flash')
             prompt = f"Write {language} code for: {description}"
-            response = model.generate_content(prompt)
-            st.code(response.text, language=language.lower())
+            # Re-clicks with the same description are answered from the response cache
+            stream = stream_text('gemini-2.5-flash', prompt, cache=True)
+            # Stream into a placeholder so the code block grows as tokens arrive
+            placeholder = st.empty()
+            try:
+                for _ in stream:
+                    placeholder.code(stream.text, language=language.lower())
+            except RateLimitedError as e:
+                st.warning(f"⏳ {str(e)}")
+                return
+            st.caption(stream.summary())
 
 generate_code_with_gemini()
 
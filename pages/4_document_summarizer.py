@@ -1,11 +1,11 @@
 import streamlit as st
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from core import metrics
+from core.llm import stream_text
+from core.scheduler import RateLimitedError
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+metrics.set_page("document_summarizer")
 
 if st.button("🏠 Back to Home"):
     st.switch_page("main.py")
@@ -23,10 +23,15 @@ def summarize_document():
     
     if st.button("Summarize", type="primary"):
         if text:
-            model = genai.GenerativeModel('gemini-2.5-flash')
             prompt = f"Summarize this {summary_length.lower()}: {text}"
-            response = model.generate_content(prompt)
-            st.write(response.text)
+            # Summaries of identical text are cached (temperature is left as is, so opt in)
+            stream = stream_text('gemini-2.5-flash', prompt, cache=True)
+            try:
+                st.write_stream(stream)
+            except RateLimitedError as e:
+                st.warning(f"⏳ {str(e)}")
+                return
+            st.caption(stream.summary())
 
 summarize_document()
 
@@ -5,20 +5,20 @@ import streamlit as st
 import os
 import json
 from datetime import datetime
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage, AIMessage
+from core import metrics, models
+from core.llm import stream_chat
+from core.scheduler import RateLimitedError
+
+metrics.set_page("chat_assistant")
 
  
 # CONFIGURE GEMINI API
  
 try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        genai.configure(api_key=api_key)
-    else:
-        st.error("❌ GOOGLE_API_KEY not found in .env file")
-        st.stop()
+    models.configure()
+except models.ConfigurationError as e:
+    st.error(f"❌ {str(e)}")
+    st.stop()
 except Exception as e:
     st.error(f"❌ Error configuring Gemini API: {str(e)}")
     st.stop()
@@ -90,6 +90,7 @@ st.markdown("""
 HISTORY_FILE = "chat_history.json"
 SESSION_KEY = "chat_messages"
 STATS_KEY = "chat_stats"
+TIMING_KEY = "chat_last_timing"
 
 
 # NAVIGATION
@@ -189,6 +190,9 @@ def convert_history_to_langchain_messages(messages_data, limit=20):
     Returns:
         list: List of HumanMessage and AIMessage objects
     """
+    # Deferred: only needed when a message is actually sent
+    from langchain.schema import HumanMessage, AIMessage
+    
     langchain_messages = []
     
     # Only use last N messages for context (to avoid token limit)
@@ -237,6 +241,10 @@ def chat_with_memory():
                 st.metric("AI", stats.get("ai_messages", 0))
             st.markdown("---")
         
+        # Latency of the last reply
+        if st.session_state.get(TIMING_KEY):
+            st.caption(f"Last reply: {st.session_state[TIMING_KEY]}")
+        
         # Export button
         if st.button("💾 Export Chat History", type="secondary"):
             if SESSION_KEY in st.session_state and st.session_state[SESSION_KEY]:
@@ -353,17 +361,26 @@ def chat_with_memory():
                         </div>
                     """, unsafe_allow_html=True)
                 
-                # Initialize model
-                model = ChatGoogleGenerativeAI(
-                    model="gemini-2.5-flash",
+                # ✅ KEY: Stream the reply to the FULL conversation history
+                stream = stream_chat(
+                    "gemini-2.5-flash",
+                    langchain_messages,
                     temperature=0.7,
                     max_output_tokens=1024
                 )
                 
-                # ✅ KEY: Invoke with FULL conversation history
-                response = model.invoke(langchain_messages)
+                # Render tokens as they arrive
+                placeholder = st.empty()
+                for _ in stream:
+                    placeholder.markdown(f"""
+                        <div class="message-ai">
+                            <strong>🤖 Assistant:</strong><br>
+                            {stream.text}
+                        </div>
+                    """, unsafe_allow_html=True)
                 
-                ai_response = response.content
+                ai_response = stream.text
+                st.session_state[TIMING_KEY] = stream.summary()
                 
                 # Add AI response to history
                 messages = add_message_to_history(messages, "assistant", ai_response)
@@ -376,19 +393,13 @@ def chat_with_memory():
                 # Save to file
                 save_conversation_history(messages, stats)
                 
-                # Display AI response
-                st.markdown(f"""
-                    <div class="message-ai">
-                        <strong>🤖 Assistant:</strong><br>
-                        {ai_response}
-                    </div>
-                """, unsafe_allow_html=True)
-                
                 st.success("✅ Response generated and history updated")
                 
                 # Rerun to show updated history
                 st.rerun()
                 
+            except RateLimitedError as e:
+                st.warning(f"⏳ {str(e)}")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
                 st.info("""
@@ -2,11 +2,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import streamlit as st
-import os
 from PIL import Image
-import google.generativeai as genai
+from core import metrics
+from core.llm import generate_text
+from core.scheduler import RateLimitedError
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+metrics.set_page("calorie_counter")
 
  
 # CUSTOM CSS FOR ENHANCED UI
@@ -100,9 +101,7 @@ st.markdown("""
 
 def get_gemini_response(input_prompt, image, system_prompt):
     """Get response from Gemini model with image"""
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content([system_prompt, image[0], input_prompt])
-    return response.text
+    return generate_text("gemini-2.5-flash", [system_prompt, image[0], input_prompt])
 
 def input_image_setup(uploaded_image):
     """Setup image for Gemini API"""
@@ -230,6 +229,8 @@ if st.button("🔍 Analyze Image", type="primary", use_container_width=True):
                     
             except FileNotFoundError:
                 st.error("❌ No image uploaded yet!")
+            except RateLimitedError as e:
+                st.warning(f"⏳ {str(e)}")
             except Exception as e:
                 st.error(f"❌ Error analyzing image: {str(e)}")
     else:
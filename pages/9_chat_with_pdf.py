@@ -1,18 +1,36 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-import streamlit as st
 import os
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
+import time
+import uuid
+
+import streamlit as st
+from core import metrics, models
+from core.ingest import CHUNK_OVERLAP, CHUNK_SIZE, ingest_pdfs
+from core.jobs import JobState, get_job_manager
+from core.pdf import count_pages, read_bytes
+from core.pdf_cache import digest, get_pdf_cache, params_key
+from core.context import CONTEXT_FETCH_K, pack_context
+from core.dedupe import DEDUPE_ENABLED, NearDuplicateFilter
+from core.embedding_providers import DEFAULT_PROVIDER, embedding_providers, get_embedding_provider
+from core.vector_index import DEFAULT_SPEC, INDEX_SPECS, estimate_footprint, get_index_namespaces
+from core.semantic_cache import get_semantic_cache
+from core.scheduler import Priority, RateLimitedError, get_scheduler
+
+# PyPDF2, FAISS and the LangChain chain/prompt modules are imported inside the
+# functions that use them, so the first load of this page does not pay for them
+# until a PDF is processed or a question is asked.
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+metrics.set_page("chat_with_pdf")
+
+# Each browser session gets its own index namespace; see core/vector_index.py
+SESSION_KEY = "pdf_session_id"
+INDEX_KEY = "pdf_index_path"
+JOB_KEY = "pdf_ingest_job"
+JOB_OUTCOME_KEY = "pdf_ingest_outcome"
+if SESSION_KEY not in st.session_state:
+    st.session_state[SESSION_KEY] = uuid.uuid4().hex
 
  
 # CUSTOM CSS FOR ENHANCED UI
@@ -109,29 +127,144 @@ st.markdown("""
 # FUNCTIONS
  
 
-def get_pdf_text(pdf_docs):
-    """Extract text from PDF documents"""
-    text = ""
-    for pdf in pdf_docs:
-        pdf_read = PdfReader(pdf)
-        for page in pdf_read.pages:
-            text += page.extract_text()
-    return text
-
-def get_text_chunks(text):
-    """Split text into manageable chunks"""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
-
-def get_vector_store(text_chunks):
-    """Create and save vector store from text chunks"""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+def get_vector_store(job, documents, session_id, previous=None, index_spec=DEFAULT_SPEC,
+                     embedding_provider=DEFAULT_PROVIDER):
+    """
+    Background job: stream PDFs through extract -> chunk -> embed -> index and
+    save the index in this session's namespace. If `previous` (the session's
+    current index) covers a subset of the documents with the same settings,
+    only the new documents are embedded and added to it. The index remembers
+    its embedding provider so questions are embedded the same way.
+    
+    Runs on the job pool, so it reports through `job` rather than Streamlit
+    elements and leaves updating the session to the page.
+    
+    Args:
+        documents (dict): PDF bytes by content hash
+    
+    Returns:
+        dict: summary with the new index `path` (unchanged if nothing was new)
+    """
+    namespaces = get_index_namespaces()
+    namespaces.cleanup()
+    
+    provider = get_embedding_provider(embedding_provider)
+    dedupe = NearDuplicateFilter() if DEDUPE_ENABLED else None
+    chunk_params = params_key(CHUNK_SIZE, CHUNK_OVERLAP, provider.model_id, dedupe.key if dedupe is not None else None)
+    params = f"{chunk_params}:{index_spec}"
+    
+    embeddings = provider.embeddings()
+    indexed = namespaces.reusable(previous, documents, params)
+    if indexed is not None and indexed == set(documents):
+        return {"path": previous, "unchanged": True}
+    if indexed:
+        job.update("loading index")
+    base = namespaces.load(previous, embeddings, writable=True) if indexed else None
+    new_documents = [data for sha, data in documents.items() if sha not in (indexed or ())]
+    job.update("extracting and embedding", pages=0, chunks=0,
+               total_pages=sum(count_pages(data) for data in new_documents))
+    
+    def on_progress(stats):
+        job.update(pages=stats["pages"], chunks=stats["chunks"])
+        job.check_cancelled()
+    
+    vector_store, stats = ingest_pdfs(
+        new_documents, embeddings, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+        on_progress=on_progress, cache=get_pdf_cache(), embedding_model=provider.model_id,
+        vector_store=base, index_spec=index_spec, dedupe=dedupe,
+    )
+    if vector_store is None:
+        raise ValueError("No text could be extracted from the uploaded PDFs")
+    job.update(pages=stats["pages"], chunks=stats["chunks"])
+    job.check_cancelled()
+    
+    job.update("writing index")
+    spec = stats.get("index_spec") or namespaces.manifest(previous).get("index_spec")
+    path = namespaces.save(vector_store, session_id, documents, params,
+                           index_spec=spec, build_seconds=stats.get("build_seconds"),
+                           embedding_provider=provider.name)
+    job.update("done", index_written=True)
+    return {
+        "path": path,
+        "stats": stats,
+        "spec": spec,
+        "vectors": vector_store.index.ntotal,
+        "index_bytes": estimate_footprint(path),
+        "new_documents": len(new_documents),
+        "already_indexed": len(indexed) if base is not None else 0,
+    }
+
+def show_ingest_result(result):
+    """Summary of a finished ingestion job"""
+    if result.get("unchanged"):
+        st.caption("⚡ These PDFs are already indexed for this session")
+        return
+    stats = result["stats"]
+    st.markdown("""
+        <div class="response-box">
+            <span class="status-badge">✓ SUCCESS</span>
+            <p style="margin-top: 10px;"><strong>PDFs processed successfully!</strong></p>
+            <p>You can now ask questions about the uploaded PDF content below.</p>
+        </div>
+    """, unsafe_allow_html=True)
+    st.caption(f"✅ {stats['pages']} pages · {stats['chunks']} chunks in {stats['seconds']:.1f}s · "
+               f"🧮 `{result['spec']}` index · {result['vectors']} vectors · "
+               f"{result['index_bytes'] / 1024 ** 2:.1f} MB"
+               + (f" · built in {stats['build_seconds']:.2f}s" if "build_seconds" in stats else ""))
+    if stats["pages"]:
+        st.caption(f"📄 Extracted {stats['pages']} pages in {stats['extract_seconds']:.1f}s "
+                   f"({stats['pages_per_second']:.0f} pages/s)")
+    if stats["duplicate_chunks"]:
+        st.caption(f"♻️ {stats['duplicate_chunks']} near-duplicate chunks skipped · "
+                   f"{stats['embeddings_saved']} embedding calls and "
+                   f"{stats['index_bytes_saved'] / 1024:.0f} KB of index saved")
+    if result["already_indexed"]:
+        st.caption(f"➕ Added {result['new_documents']} new PDFs to the existing index "
+                   f"({result['already_indexed']} already indexed)")
+    if stats["cached_documents"]:
+        st.caption(f"⚡ {stats['cached_documents']} of {result['new_documents']} PDFs reused from cache "
+                   f"(no re-extraction or re-embedding)")
+
+def finish_ingest_job(job):
+    """Adopt the finished job's index for this session and keep its outcome for display"""
+    if job.state == JobState.SUCCEEDED:
+        path, previous = job.result["path"], st.session_state.get(INDEX_KEY)
+        if previous and previous != path:
+            get_index_namespaces().drop(previous)
+        st.session_state[INDEX_KEY] = path
+    st.session_state[JOB_OUTCOME_KEY] = {"state": job.state, "error": job.error, "result": job.result}
+    del st.session_state[JOB_KEY]
+
+@st.fragment(run_every=1.0)
+def ingest_job_status():
+    """Progress of the session's ingestion job; re-runs on its own every second"""
+    job = get_job_manager().get(st.session_state.get(JOB_KEY))
+    if job is None or job.done:
+        if job is not None:
+            finish_ingest_job(job)
+        else:
+            del st.session_state[JOB_KEY]
+        st.rerun()  # full run: stops this polling fragment and shows the outcome
+    
+    status = job.snapshot()
+    progress = status["progress"]
+    total_pages = progress.get("total_pages") or 0
+    st.progress(min(1.0, progress.get("pages", 0) / total_pages) if total_pages else 0.0,
+                text=f"⏳ {status['stage'].capitalize()}... ({status['seconds']:.0f}s)")
+    st.markdown(
+        f"📄 Pages extracted: **{progress.get('pages', 0)}**"
+        + (f" / {total_pages}" if total_pages else "")
+        + f" · 🧩 Chunks embedded: **{progress.get('chunks', 0)}**"
+        + f" · 💾 Index written: **{'yes' if progress.get('index_written') else 'not yet'}**"
+    )
+    if st.button("✖️ Cancel processing", disabled=status["cancel_requested"]):
+        job.cancel()
 
 def get_conversational_chain():
     """Create QA chain for answering questions"""
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+    
     prompt_template = """
     Answer the question as detailed as possible from the provided context. Make sure to provide all the details.
     
@@ -145,29 +278,67 @@ def get_conversational_chain():
     Answer:
     """
     
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.3)
+    model = models.get_chat_model("gemini-1.5-flash-latest", temperature=0.3)
     prompt = PromptTemplate(template=prompt_template, input_variables=['context', 'question'])
     chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
     return chain
 
+def show_answer(answer):
+    st.markdown(f"""
+        <div class="response-box">
+            <strong>🤖 AI Response:</strong><br><br>
+            {answer}
+        </div>
+    """, unsafe_allow_html=True)
+
 def user_input(user_question):
     """Process user question and get response"""
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-        docs = new_db.similarity_search(user_question)
+        path = st.session_state.get(INDEX_KEY)
+        if path is None:
+            raise FileNotFoundError(path)
+        namespaces = get_index_namespaces()
+        manifest = namespaces.manifest(path) or {}
+        spec = manifest.get("index_spec", "Flat")
+        embeddings = get_embedding_provider(manifest.get("embedding_provider", "gemini")).embeddings()
+        query_vector = embeddings.embed_query(user_question)
+        
+        # Same PDFs + settings => same fingerprint, so sessions share cached answers
+        scope = manifest.get("fingerprint") or os.path.basename(path)
+        cached = get_semantic_cache().lookup(scope, query_vector)
+        if cached is not None:
+            show_answer(cached.answer)
+            st.caption(f"⚡ Cached answer to a similar question (“{cached.question}”, "
+                       f"similarity {cached.similarity:.2f})")
+            return
+        
+        # Loaded once per process; reloaded only when the index on disk changes
+        new_db = namespaces.load(path, embeddings)
+        search_start = time.perf_counter()
+        with metrics.timed("faiss.search", spec=spec):
+            candidates = new_db.similarity_search_by_vector(query_vector, k=CONTEXT_FETCH_K)
+        search_ms = (time.perf_counter() - search_start) * 1000
+        # Fetch more than needed, then de-duplicate and fit the prompt token budget
+        docs, packing = pack_context(candidates)
         
         chain = get_conversational_chain()
-        response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+        with metrics.timed("llm.qa_chain"):
+            response = get_scheduler().run(
+                lambda: chain({"input_documents": docs, "question": user_question}, return_only_outputs=True),
+                priority=Priority.INTERACTIVE,
+                tokens=sum(len(doc.page_content) for doc in docs) // 4,
+            )
+        
+        get_semantic_cache().store(scope, user_question, query_vector, response["output_text"])
         
-        st.markdown(f"""
-            <div class="response-box">
-                <strong>🤖 AI Response:</strong><br><br>
-                {response["output_text"]}
-            </div>
-        """, unsafe_allow_html=True)
+        show_answer(response["output_text"])
+        st.caption(f"🔎 {len(candidates)} passages retrieved in {search_ms:.1f} ms (`{spec}` index) · "
+                   f"📦 context {packing['tokens_before']:,} → {packing['tokens_after']:,} tokens "
+                   f"in {len(docs)} passages")
     except FileNotFoundError:
         st.error("❌ No PDF uploaded yet! Please upload PDF files and click 'Process' button first.")
+    except RateLimitedError as e:
+        st.warning(f"⏳ {str(e)}")
     except Exception as e:
         st.error(f"❌ Error: {str(e)}")
 
@@ -200,27 +371,54 @@ if pdf_docs:
         with cols[idx]:
             st.info(f"✅ {file.name}\n\n{file.size / 1024:.1f} KB")
 
-# Process button
-if st.button("🔄 Process PDF Files", type="primary", use_container_width=True):
+with st.expander("⚙️ Index settings"):
+    index_spec = st.selectbox(
+        "Index type",
+        list(INDEX_SPECS),
+        index=list(INDEX_SPECS).index(DEFAULT_SPEC) if DEFAULT_SPEC in INDEX_SPECS else 0,
+        format_func=lambda spec: f"{spec} - {INDEX_SPECS[spec]}",
+        help="Approximate indexes are trained on a sample of the first chunks and "
+             "fall back to exact search when there are too few chunks to train on.",
+    )
+    providers = embedding_providers()
+    embedding_provider = st.selectbox(
+        "Embeddings",
+        list(providers),
+        index=list(providers).index(DEFAULT_PROVIDER) if DEFAULT_PROVIDER in providers else 0,
+        format_func=lambda name: providers[name].description or name,
+        help="The local embedder runs on this server's CPU: no API calls or quota, "
+             "but less accurate retrieval than Gemini.",
+    )
+
+# Process button: ingestion runs as a background job so the page stays usable
+job_running = JOB_KEY in st.session_state
+if st.button("🔄 Process PDF Files", type="primary", use_container_width=True, disabled=job_running):
     if pdf_docs:
-        with st.spinner("⏳ Processing PDFs... This may take a moment..."):
-            try:
-                raw_text = get_pdf_text(pdf_docs)
-                text_chunks = get_text_chunks(raw_text)
-                get_vector_store(text_chunks)
-                
-                st.markdown("""
-                    <div class="response-box">
-                        <span class="status-badge">✓ SUCCESS</span>
-                        <p style="margin-top: 10px;"><strong>PDFs processed successfully!</strong></p>
-                        <p>You can now ask questions about the uploaded PDF content below.</p>
-                    </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"❌ Error processing PDFs: {str(e)}")
+        documents = {}
+        for pdf in pdf_docs:
+            data = read_bytes(pdf)
+            documents.setdefault(digest(data), data)
+        job = get_job_manager().submit(
+            "pdf_ingest", get_vector_store, documents, st.session_state[SESSION_KEY],
+            st.session_state.get(INDEX_KEY), index_spec, embedding_provider,
+        )
+        st.session_state[JOB_KEY] = job.id
+        st.session_state.pop(JOB_OUTCOME_KEY, None)
+        job_running = True
     else:
         st.warning("⚠️ Please upload at least one PDF file before processing.")
 
+if job_running:
+    ingest_job_status()
+elif JOB_OUTCOME_KEY in st.session_state:
+    outcome = st.session_state[JOB_OUTCOME_KEY]
+    if outcome["state"] == JobState.SUCCEEDED:
+        show_ingest_result(outcome["result"])
+    elif outcome["state"] == JobState.CANCELLED:
+        st.info("✖️ Processing was cancelled; the previous index (if any) is still in use.")
+    else:
+        st.error(f"❌ Error processing PDFs: {outcome['error']}")
+
 st.markdown("---")
 
 # Section 2: Ask Questions
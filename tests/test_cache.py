@@ -0,0 +1,98 @@
+"""LRU and SQLite eviction, TTL expiry and hit accounting of the response cache."""
+
+from core.cache import DiskCache, LRUCache, ResponseCache, make_key
+
+
+def test_key_changes_with_model_prompt_and_config():
+    base = make_key("model", "prompt", {"temperature": 0})
+    assert base == make_key("model", "prompt", {"temperature": 0})
+    assert base != make_key("other", "prompt", {"temperature": 0})
+    assert base != make_key("model", "prompt!", {"temperature": 0})
+    assert base != make_key("model", "prompt", {"temperature": 0.5})
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    assert lru.get("a") == "1"  # "b" is now the oldest
+    lru.set("c", "3")
+    assert lru.get("b") is None
+    assert lru.get("a") == "1"
+    assert lru.get("c") == "3"
+    assert len(lru) == 2
+
+
+def test_disk_cache_evicts_oldest_access_over_size_bound(tmp_path):
+    disk = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=20)
+    try:
+        disk.set("a", "x" * 8)
+        disk.set("b", "y" * 8)
+        assert disk.get("a") == "x" * 8  # "b" is now least recently accessed
+        disk.set("c", "z" * 8)
+        assert disk.get("b") is None
+        assert disk.get("a") == "x" * 8
+        assert disk.get("c") == "z" * 8
+    finally:
+        disk.close()
+
+
+def test_disk_cache_expires_entries_after_ttl(tmp_path, monkeypatch):
+    import core.cache
+
+    now = [1000.0]
+    monkeypatch.setattr(core.cache.time, "time", lambda: now[0])
+    disk = DiskCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    try:
+        disk.set("a", "answer")
+        now[0] += 30
+        assert disk.get("a") == "answer"
+        now[0] += 31
+        assert disk.get("a") is None
+    finally:
+        disk.close()
+
+
+def test_disk_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    disk = DiskCache(path)
+    disk.set("a", "answer")
+    disk.close()
+    disk = DiskCache(path)
+    try:
+        assert disk.get("a") == "answer"
+    finally:
+        disk.close()
+
+
+def test_response_cache_counts_memory_and_disk_hits(tmp_path):
+    disk = DiskCache(str(tmp_path / "cache.sqlite"))
+    try:
+        cache = ResponseCache(memory=LRUCache(max_entries=4), disk=disk)
+        assert cache.get("k") is None
+        cache.set("k", "v")
+        assert cache.get("k") == "v"
+
+        # A fresh memory tier (as after a restart) falls through to disk once
+        cache.memory.clear()
+        assert cache.get("k") == "v"
+        assert cache.get("k") == "v"
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["writes"] == 1
+        assert stats["memory_hits"] == 2
+        assert stats["disk_hits"] == 1
+        assert stats["hit_rate"] == 3 / 4
+        assert stats["memory_entries"] == 1
+    finally:
+        disk.close()
+
+
+def test_response_cache_without_disk_tier():
+    cache = ResponseCache(memory=LRUCache(max_entries=1))
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") is None
+    assert cache.get("b") == "2"
+    assert cache.stats()["hit_rate"] == 0.5
@@ -0,0 +1,69 @@
+"""Context packing stays within the token budget and drops overlapping text."""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from core.context import MIN_PARTIAL_TOKENS, pack_context  # noqa: E402
+from core.scheduler import estimate_tokens  # noqa: E402
+
+
+def words(start, count):
+    return " ".join(f"word{i:05d}" for i in range(start, start + count))
+
+
+def docs(*texts):
+    return [Document(page_content=text, metadata={"rank": rank}) for rank, text in enumerate(texts)]
+
+
+def test_packed_context_fits_the_budget():
+    chunks = docs(*(words(i * 100, 100) for i in range(8)))  # 8 x ~250 tokens
+    packed, stats = pack_context(chunks, budget_tokens=600, mmr_lambda=None)
+    assert stats["tokens_after"] <= 600
+    assert sum(estimate_tokens(doc.page_content) for doc in packed) <= 600
+    assert [doc.metadata["rank"] for doc in packed] == [0, 1, 2]
+    # The chunk that did not fit is cut on a word boundary, not mid-word
+    last = packed[-1].page_content
+    assert len(last) < len(chunks[2].page_content)
+    assert chunks[2].page_content.startswith(last)
+    assert chunks[2].page_content[len(last)] == " "
+
+
+def test_no_partial_chunk_below_the_minimum():
+    chunks = docs(words(0, 100), words(100, 100))
+    budget = estimate_tokens(chunks[0].page_content) + MIN_PARTIAL_TOKENS - 1
+    packed, stats = pack_context(chunks, budget_tokens=budget, mmr_lambda=None)
+    assert [doc.page_content for doc in packed] == [chunks[0].page_content]
+    assert stats["selected"] == 1
+
+
+def test_contained_chunks_are_dropped_and_overlaps_trimmed():
+    first = words(0, 60)
+    contained = words(10, 30)
+    overlapping = words(40, 60)  # shares word00040..word00059 with `first`
+    packed, stats = pack_context(docs(first, contained, overlapping), budget_tokens=10_000, mmr_lambda=None)
+    assert [doc.metadata["rank"] for doc in packed] == [0, 2]
+    assert packed[1].page_content == words(60, 40)
+    assert stats["overlap_chars_removed"] == len(contained) + len(words(40, 20)) + 1
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_mmr_prefers_a_different_passage_over_a_near_duplicate():
+    original = words(0, 80)
+    near_duplicate = words(0, 79) + " changed"
+    other = words(500, 80)
+    budget = estimate_tokens(original) * 2
+    chunks = docs(original, near_duplicate, other)
+
+    packed, _ = pack_context(chunks, budget_tokens=budget, mmr_lambda=0.5, min_overlap=10_000)
+    assert [doc.metadata["rank"] for doc in packed] == [0, 2]
+    packed, _ = pack_context(chunks, budget_tokens=budget, mmr_lambda=None, min_overlap=10_000)
+    assert [doc.metadata["rank"] for doc in packed] == [0, 1]
+
+
+def test_empty_input():
+    packed, stats = pack_context([], budget_tokens=100, mmr_lambda=0.5)
+    assert packed == []
+    assert stats["selected"] == stats["tokens_after"] == 0
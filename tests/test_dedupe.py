@@ -0,0 +1,63 @@
+"""MinHash near-duplicate detection drops repeats and keeps distinct chunks."""
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from core.dedupe import NearDuplicateFilter  # noqa: E402
+
+
+def passage(seed, length=200):
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(length))
+
+
+def edit(text, changes, seed=0):
+    """`text` with `changes` words replaced"""
+    rng = random.Random(seed)
+    words = text.split()
+    for position in rng.sample(range(len(words)), changes):
+        words[position] = "edited"
+    return " ".join(words)
+
+
+def test_exact_repeat_is_dropped():
+    dedupe = NearDuplicateFilter()
+    text = passage(1)
+    assert dedupe.check(text, owner=0) is None
+    assert dedupe.check(text, owner=1) == 0
+
+
+def test_near_duplicate_is_dropped_and_reports_its_owner():
+    dedupe = NearDuplicateFilter()
+    original = passage(1)
+    assert dedupe.check(original, owner="report-a") is None
+    assert dedupe.check(passage(2), owner="report-b") is None
+    # One word in 200 changed: the re-upload of a slightly different version
+    assert dedupe.check(edit(original, 1), owner="report-c") == "report-a"
+
+
+def test_distinct_and_heavily_edited_chunks_are_kept():
+    dedupe = NearDuplicateFilter()
+    original = passage(1)
+    assert dedupe.check(original, owner=0) is None
+    assert dedupe.check(passage(2), owner=1) is None
+    assert dedupe.check(edit(original, 60), owner=2) is None
+
+
+def test_case_and_whitespace_do_not_matter():
+    dedupe = NearDuplicateFilter()
+    text = passage(1)
+    assert dedupe.check(text, owner=0) is None
+    assert dedupe.check("  " + text.upper().replace(" ", "\n"), owner=1) == 0
+
+
+def test_threshold_is_part_of_the_key():
+    assert NearDuplicateFilter(threshold=0.8).key != NearDuplicateFilter(threshold=0.9).key
+
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(num_perm=64, bands=10)
@@ -0,0 +1,87 @@
+"""The fake backend the benchmarks and tests run against: determinism, streaming, errors."""
+
+import math
+
+import pytest
+
+from core.fake_backend import FakeBackend, FakeConfig, InternalServerError, ResourceExhausted
+from core.scheduler import is_retryable
+
+
+def make_backend(**config):
+    return FakeBackend(FakeConfig(**dict({"latency_ms": 0, "sleep": lambda seconds: None}, **config)))
+
+
+def test_answers_are_deterministic():
+    first = make_backend(output_words=30).generative_model("gemini-2.0-flash")
+    second = make_backend(output_words=30).generative_model("gemini-2.0-flash")
+    text = first.generate_content("Explain caching").text
+    assert text == second.generate_content("Explain caching").text
+    assert len(text.split()) == 30
+    assert text != first.generate_content("Explain indexing").text
+
+
+def test_sql_prompts_get_a_runnable_query():
+    model = make_backend().generative_model("gemini-2.0-flash")
+    prompt = "Write a SQLite query.\nSchema:\n- Table: students (id, name)\n- Table: courses (id)"
+    assert model.generate_content(prompt).text == "SELECT * FROM students;"
+
+
+def test_stream_chunks_carry_usage_on_the_last_chunk():
+    model = make_backend(chunks=4, output_words=40).generative_model("gemini-2.0-flash")
+    chunks = list(model.generate_content("Explain caching", stream=True))
+    assert len(chunks) == 4
+    assert "".join(chunk.text for chunk in chunks).strip() == model.generate_content("Explain caching").text
+    assert all(chunk.usage_metadata is None for chunk in chunks[:-1])
+    usage = chunks[-1].usage_metadata
+    assert usage.prompt_token_count > 0 and usage.candidates_token_count > 0
+
+
+@pytest.mark.parametrize("config, error, code", [
+    ({"error_429": 1.0}, ResourceExhausted, 429),
+    ({"error_500": 1.0}, InternalServerError, 500),
+])
+def test_injected_errors_are_retryable(config, error, code):
+    model = make_backend(**config).generative_model("gemini-2.0-flash")
+    with pytest.raises(error) as info:
+        model.generate_content("hello")
+    assert info.value.code == code
+    assert is_retryable(info.value)
+    with pytest.raises(error):  # streaming requests fail before the first chunk
+        model.generate_content("hello", stream=True)
+
+
+def test_error_rates_follow_the_seed():
+    def failures(seed):
+        engine = make_backend(error_429=0.3, seed=seed).engine
+        outcomes = []
+        for _ in range(200):
+            try:
+                engine.maybe_fail()
+                outcomes.append(False)
+            except ResourceExhausted:
+                outcomes.append(True)
+        return outcomes
+
+    assert failures(1) == failures(1)
+    assert 30 < sum(failures(1)) < 90
+
+
+def test_embeddings_are_deterministic_unit_vectors():
+    pytest.importorskip("numpy")
+    embeddings = make_backend(embedding_dim=64, embedding_latency_ms=0).embeddings("models/embedding-001")
+    first, second, again = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert len(first) == 64
+    assert first == again == embeddings.embed_query("alpha")
+    assert first != second
+    assert math.isclose(math.fsum(x * x for x in first), 1.0, rel_tol=1e-5)
+
+
+def test_chat_model_streams_with_usage():
+    pytest.importorskip("langchain_core")
+    chat = make_backend(chunks=3, output_words=12).chat_model("gemini-2.0-flash")
+    message = chat.invoke("Explain caching")
+    assert message.usage_metadata["output_tokens"] > 0
+    chunks = list(chat.stream("Explain caching"))
+    assert "".join(chunk.content for chunk in chunks).strip() == message.content
+    assert chunks[-1].usage_metadata["total_tokens"] > 0
@@ -0,0 +1,66 @@
+"""PDF ingestion: extraction is timed on its own and repeated chunks are not embedded."""
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from benchmarks.corpus import write_pdf  # noqa: E402
+from core import metrics  # noqa: E402
+from core.fake_backend import FakeBackend, FakeConfig  # noqa: E402
+from core.ingest import ingest_pdfs  # noqa: E402
+
+EMBED_SECONDS = 0.2
+
+
+def stage(name, page):
+    series = metrics.snapshot()["metrics"][f"{metrics.PREFIX}stage_duration_seconds"]
+    return [s for s in series if s["labels"]["stage"] == name and s["labels"]["page"] == page]
+
+
+def test_extraction_is_timed_apart_from_embedding():
+    metrics.set_page("test_ingest_timing")
+    config = FakeConfig(latency_ms=0, embedding_dim=16, embedding_latency_ms=EMBED_SECONDS * 1000)
+    embeddings = FakeBackend(config).embeddings("models/embedding-001")
+    pdf = write_pdf([f"Page {i} " + "text " * 200 for i in range(6)])
+
+    _, stats = ingest_pdfs([pdf, pdf], embeddings, chunk_size=500, chunk_overlap=50, batch_size=4)
+
+    assert stats["pages"] == 12
+    assert stats["batches"] >= 4
+    assert 0 < stats["extract_seconds"] < stats["seconds"] - stats["batches"] * EMBED_SECONDS * 0.9
+    assert stats["pages_per_second"] == pytest.approx(12 / stats["extract_seconds"])
+    [throughput] = [
+        s for s in metrics.snapshot()["metrics"][f"{metrics.PREFIX}pdf_extract_pages_per_second"]
+        if s["labels"]["page"] == "test_ingest_timing"
+    ]
+    assert throughput["sum"] == pytest.approx(stats["pages_per_second"])
+    [extract] = stage("pdf.extract", "test_ingest_timing")
+    assert extract["count"] == 2  # one per document
+    assert extract["sum"] == pytest.approx(stats["extract_seconds"])
+    assert stage("pdf.ingest", "test_ingest_timing")[0]["sum"] >= stats["batches"] * EMBED_SECONDS * 0.9
+
+
+def test_failed_extraction_is_recorded_as_error():
+    metrics.set_page("test_ingest_error")
+    embeddings = FakeBackend(FakeConfig(latency_ms=0, embedding_latency_ms=0)).embeddings("models/embedding-001")
+    with pytest.raises(Exception):
+        ingest_pdfs([b"%PDF-1.4 not really a pdf"], embeddings)
+    assert [s["labels"]["outcome"] for s in stage("pdf.extract", "test_ingest_error")] == ["error"]
+
+
+def test_near_duplicate_chunks_are_not_embedded():
+    pytest.importorskip("numpy")
+    from core.dedupe import NearDuplicateFilter
+
+    config = FakeConfig(latency_ms=0, embedding_dim=16, embedding_latency_ms=0)
+    embeddings = FakeBackend(config).embeddings("models/embedding-001")
+    pdf = write_pdf([f"Page {i} " + " ".join(f"term{i}x{j}" for j in range(150)) for i in range(3)])
+
+    store, single = ingest_pdfs([pdf], embeddings, chunk_size=500, chunk_overlap=50)
+    store_twice, stats = ingest_pdfs([pdf, pdf], embeddings, chunk_size=500, chunk_overlap=50,
+                                     dedupe=NearDuplicateFilter())
+
+    assert stats["duplicate_chunks"] == stats["embeddings_saved"] == single["chunks"]
+    assert store_twice.index.ntotal == store.index.ntotal
@@ -0,0 +1,98 @@
+"""Background jobs report results, errors and progress, and cancel cooperatively."""
+
+import threading
+import time
+
+from core.jobs import JobManager, JobState
+
+
+def wait_done(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, f"job still {job.state.value}"
+        time.sleep(0.01)
+    return job
+
+
+def test_job_result_and_progress():
+    manager = JobManager(max_workers=1)
+
+    def work(job, count):
+        for i in range(count):
+            job.update("embedding", batches=i + 1)
+        return "store"
+
+    job = wait_done(manager.submit("ingest", work, 3))
+    assert job.state is JobState.SUCCEEDED
+    assert job.result == "store"
+    snapshot = job.snapshot()
+    assert snapshot["stage"] == "embedding"
+    assert snapshot["progress"] == {"batches": 3}
+    assert snapshot["seconds"] >= 0
+    assert manager.get(job.id) is job
+
+
+def test_failed_job_keeps_the_error_message():
+    manager = JobManager(max_workers=1)
+
+    def work(job):
+        raise ValueError("not a PDF")
+
+    job = wait_done(manager.submit("ingest", work))
+    assert job.state is JobState.FAILED
+    assert job.error == "not a PDF"
+    assert job.result is None
+
+
+def test_running_job_stops_at_its_next_cancellation_check():
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    checks = []
+
+    def work(job):
+        started.set()
+        while True:
+            checks.append(1)
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    job = manager.submit("ingest", work)
+    assert started.wait(5)
+    assert manager.cancel(job.id) is job
+    wait_done(job)
+    assert job.state is JobState.CANCELLED
+    assert job.snapshot()["cancel_requested"]
+    assert len(checks) >= 1
+
+
+def test_queued_job_cancelled_before_it_starts_never_runs():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+    ran = []
+    blocker = manager.submit("blocker", lambda job: release.wait(5))
+    queued = manager.submit("ingest", lambda job: ran.append(1))
+    assert queued.state is JobState.QUEUED
+    manager.cancel(queued.id)
+    release.set()
+
+    wait_done(blocker)
+    wait_done(queued)
+    assert queued.state is JobState.CANCELLED
+    assert ran == []
+    assert queued.snapshot()["seconds"] == 0.0
+
+
+def test_finished_jobs_are_forgotten_after_retention():
+    manager = JobManager(max_workers=1, retention=0.05)
+    old = wait_done(manager.submit("ingest", lambda job: None))
+    time.sleep(0.1)
+    new = manager.submit("ingest", lambda job: None)
+    assert manager.get(old.id) is None
+    assert manager.get(new.id) is new
+    wait_done(new)
+    assert manager.stats()[JobState.SUCCEEDED.value] == 1
+
+
+def test_cancel_unknown_job():
+    assert JobManager(max_workers=1).cancel("missing") is None
+
@@ -0,0 +1,33 @@
+"""Parallel PDF extraction: same pages as the serial path, temp file cleaned up."""
+
+import tempfile
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from benchmarks.corpus import write_pdf  # noqa: E402
+from core.pdf import PARALLEL_MIN_PAGES, iter_pages  # noqa: E402
+
+PAGES = [f"Page number {i} of the test document." for i in range(max(PARALLEL_MIN_PAGES, 40))]
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return write_pdf(PAGES, padding=64 * 1024)
+
+
+def test_pool_matches_serial(pdf, tmp_path):
+    serial = list(iter_pages([pdf], workers=1))
+    assert [text.strip() for text in serial] == PAGES
+    assert list(iter_pages([pdf, pdf], workers=2)) == serial * 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_closing_early_removes_temp_file(pdf, tmp_path):
+    pages = iter_pages([pdf], workers=2)
+    assert next(pages).strip() == PAGES[0]
+    assert len(list(tmp_path.glob("*.pdf"))) == 1
+    pages.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,66 @@
+"""Scheduler streaming against the fake backend: every path must give its slot back."""
+
+import pytest
+
+from core.fake_backend import FakeBackend, FakeConfig, InternalServerError
+from core.scheduler import RateLimitedError, Scheduler
+
+
+def make_scheduler(max_concurrency=2):
+    return Scheduler(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000,
+                     max_concurrency=max_concurrency, max_retries=2, sleep=lambda seconds: None)
+
+
+def fake_model(**config):
+    config = FakeConfig(**dict({"latency_ms": 0, "sleep": lambda seconds: None}, **config))
+    return FakeBackend(config).generative_model("gemini-2.0-flash")
+
+
+def test_stream_releases_slot_when_exhausted():
+    scheduler = make_scheduler()
+    model = fake_model(chunks=4)
+    pieces = list(scheduler.run_stream(lambda: model.generate_content("hello", stream=True)))
+    assert len(pieces) == 4
+    assert scheduler.stats()["active"] == 0
+
+
+def test_empty_stream_releases_slot():
+    scheduler = make_scheduler(max_concurrency=2)
+    for _ in range(3):  # more empty streams than slots: a leak would block the third
+        assert list(scheduler.run_stream(lambda: iter(()))) == []
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.run(lambda: "ok") == "ok"
+
+
+def test_stream_request_error_retries_then_releases_slot():
+    scheduler = make_scheduler()
+    model = fake_model(error_500=1.0)
+    with pytest.raises(RateLimitedError) as info:
+        list(scheduler.run_stream(lambda: model.generate_content("hello", stream=True)))
+    assert isinstance(info.value.__cause__, InternalServerError)
+    assert scheduler.stats()["retries"] == 2
+    assert scheduler.stats()["active"] == 0
+
+
+def test_stream_error_after_first_chunk_releases_slot():
+    scheduler = make_scheduler()
+
+    def broken():
+        yield "first"
+        raise ValueError("mid-stream failure")
+
+    stream = scheduler.run_stream(broken)
+    assert next(stream) == "first"
+    with pytest.raises(ValueError):
+        next(stream)
+    assert scheduler.stats()["active"] == 0
+
+
+def test_stream_closed_early_releases_slot():
+    scheduler = make_scheduler()
+    model = fake_model(chunks=8)
+    stream = scheduler.run_stream(lambda: model.generate_content("hello", stream=True))
+    next(stream)
+    assert scheduler.stats()["active"] == 1
+    stream.close()
+    assert scheduler.stats()["active"] == 0
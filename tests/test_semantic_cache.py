@@ -0,0 +1,87 @@
+"""Semantic answer cache threshold, scoping, expiry and eviction."""
+
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from core.semantic_cache import SemanticCache  # noqa: E402
+
+
+def at_angle(similarity):
+    """A 2-d vector whose cosine similarity with (1, 0) is `similarity`"""
+    return [similarity, math.sqrt(1 - similarity ** 2)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "similarity, hit",
+    [(1.0, True), (0.95, True), (0.91, True), (0.89, False), (0.0, False)],
+    ids=["same", "close", "just-above", "just-below", "orthogonal"],
+)
+def test_hit_only_at_or_above_threshold(similarity, hit):
+    cache = SemanticCache(threshold=0.9)
+    cache.store("docs", "question", [1.0, 0.0], "answer")
+    found = cache.lookup("docs", at_angle(similarity))
+    if hit:
+        assert found.answer == "answer"
+        assert found.similarity == pytest.approx(similarity, abs=1e-6)
+    else:
+        assert found is None
+
+
+def test_vectors_are_compared_by_direction_not_length():
+    cache = SemanticCache(threshold=0.99)
+    cache.store("docs", "question", [3.0, 4.0], "answer")
+    assert cache.lookup("docs", [0.3, 0.4]).answer == "answer"
+
+
+def test_most_similar_question_wins():
+    cache = SemanticCache(threshold=0.5)
+    cache.store("docs", "far", at_angle(0.6), "far answer")
+    cache.store("docs", "near", at_angle(0.95), "near answer")
+    assert cache.lookup("docs", [1.0, 0.0]).question == "near"
+
+
+def test_answers_are_scoped_to_the_document_set():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("docs-a", "question", [1.0, 0.0], "answer a")
+    assert cache.lookup("docs-b", [1.0, 0.0]) is None
+    cache.store("docs-b", "question", [1.0, 0.0], "answer b")
+    assert cache.lookup("docs-a", [1.0, 0.0]).answer == "answer a"
+    assert cache.lookup("docs-b", [1.0, 0.0]).answer == "answer b"
+    cache.clear("docs-a")
+    assert cache.lookup("docs-a", [1.0, 0.0]) is None
+    assert cache.lookup("docs-b", [1.0, 0.0]) is not None
+
+
+def test_expired_entries_are_misses():
+    clock = Clock()
+    cache = SemanticCache(threshold=0.9, ttl=60, clock=clock)
+    cache.store("docs", "question", [1.0, 0.0], "answer")
+    clock.now += 59
+    assert cache.lookup("docs", [1.0, 0.0]) is not None
+    clock.now += 2
+    assert cache.lookup("docs", [1.0, 0.0]) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["entries"]) == (1, 1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.store("docs", "a", [1.0, 0.0], "answer a")
+    cache.store("docs", "b", [0.0, 1.0], "answer b")
+    assert cache.lookup("docs", [1.0, 0.0]) is not None  # "b" is now least recently used
+    cache.store("docs", "c", [-1.0, 0.0], "answer c")
+    assert cache.lookup("docs", [0.0, 1.0]) is None
+    assert cache.lookup("docs", [1.0, 0.0]).answer == "answer a"
+    assert cache.lookup("docs", [-1.0, 0.0]).answer == "answer c"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,97 @@
+"""Concurrent identical calls share one upstream call, its result and its errors."""
+
+import threading
+import time
+
+import pytest
+
+from core.singleflight import SingleFlight
+
+FOLLOWERS = 4
+
+
+def run_concurrently(flight, key, fn):
+    """Start a leader blocked in `fn`, join followers, then release the leader"""
+    release = threading.Event()
+    started = threading.Event()
+    outcomes = [None] * (FOLLOWERS + 1)
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def worker(slot, target):
+        try:
+            outcomes[slot] = ("value", flight.do(key, target))
+        except Exception as exc:
+            outcomes[slot] = ("error", exc)
+
+    threads = [threading.Thread(target=worker, args=(0, leader_fn))]
+    threads[0].start()
+    assert started.wait(5)
+    for slot in range(1, FOLLOWERS + 1):
+        threads.append(threading.Thread(target=worker, args=(slot, fn)))
+        threads[-1].start()
+    while flight.stats()["coalesced"] < FOLLOWERS:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return "answer"
+
+    outcomes = run_concurrently(flight, "key", fn)
+    assert outcomes == [("value", "answer")] * (FOLLOWERS + 1)
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": FOLLOWERS, "in_flight": 0}
+
+
+def test_leader_error_propagates_to_every_follower():
+    flight = SingleFlight()
+    error = ValueError("upstream failed")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise error
+
+    outcomes = run_concurrently(flight, "key", fn)
+    assert outcomes == [("error", error)] * (FOLLOWERS + 1)
+    assert len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_key_is_forgotten_after_completion():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("first")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    # A later call is a fresh leader, not a follower of the failed one
+    assert flight.do("key", lambda: "second") == "second"
+    assert flight.stats() == {"leaders": 2, "coalesced": 0, "in_flight": 0}
+
+
+def test_followers_of_an_abandoned_leader_run_their_own_call():
+    flight = SingleFlight()
+    call, leader = flight.join("key")
+    assert leader
+    result = []
+    follower = threading.Thread(target=lambda: result.append(flight.do("key", lambda: "own")))
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    flight.abandon("key", call)
+    follower.join(5)
+    assert result == ["own"]
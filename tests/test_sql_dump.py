@@ -0,0 +1,82 @@
+"""SQL dump loading: statement splitting and the dump's own transaction statements."""
+
+import io
+import sqlite3
+
+import pytest
+
+from core.sql_dump import iter_statements, load_dump
+
+
+def load(text, **kwargs):
+    conn = sqlite3.connect(":memory:")
+    stats = load_dump(io.BytesIO(text.encode("utf-8")), conn, **kwargs)
+    return conn, stats
+
+
+def test_iter_statements_keeps_semicolons_in_strings_and_triggers():
+    text = (
+        "INSERT INTO t VALUES ('a;b');\n"
+        "CREATE TRIGGER tr AFTER INSERT ON t BEGIN UPDATE t SET x = 1; END;\n"
+        "SELECT 1"
+    )
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert list(iter_statements(chunks)) == [
+        "INSERT INTO t VALUES ('a;b');",
+        "CREATE TRIGGER tr AFTER INSERT ON t BEGIN UPDATE t SET x = 1; END;",
+        "SELECT 1",
+    ]
+
+
+@pytest.mark.parametrize("header", [
+    "",
+    "-- header\n",
+    "-- exported by a tool\n-- second line\n",
+    "/* header */ ",
+    "/* multi\n   line */\n-- and a line comment\n",
+])
+def test_dump_transaction_statements_are_skipped(header):
+    dump = (
+        "PRAGMA foreign_keys=OFF;\n"
+        f"{header}BEGIN TRANSACTION;\n"
+        "CREATE TABLE t (x INTEGER);\n"
+        "INSERT INTO t VALUES (1);\n"
+        "INSERT INTO t VALUES (2);\n"
+        f"{header}COMMIT;\n"
+    )
+    conn, stats = load(dump, batch_statements=2)
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    assert stats["statements"] == 4
+    assert stats["transactions"] == 2
+
+
+def test_dump_pragmas_run_outside_the_batch_transaction():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA foreign_keys=ON")
+    statements = []
+    conn.set_trace_callback(lambda statement: statements.append((statement, conn.in_transaction)))
+    dump = (
+        "CREATE TABLE parent (id INTEGER PRIMARY KEY);\n"
+        "CREATE TABLE child (parent_id INTEGER REFERENCES parent (id));\n"
+        "-- the dump disables checks for its own insert order\n"
+        "PRAGMA foreign_keys=OFF;\n"
+        "PRAGMA synchronous=FULL;\n"
+        "INSERT INTO child VALUES (1);\n"  # orphan until the parent row below
+        "INSERT INTO parent VALUES (1);\n"
+    )
+    stats = load_dump(io.BytesIO(dump.encode("utf-8")), conn)
+    assert conn.execute("SELECT COUNT(*) FROM child").fetchone()[0] == 1
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 0
+    assert [in_transaction for statement, in_transaction in statements if "foreign_keys=OFF" in statement] == [False]
+    assert not any(statement.startswith("PRAGMA synchronous=FULL") for statement, _ in statements)
+    assert stats["statements"] == 5
+    assert stats["transactions"] == 2
+
+
+def test_load_restores_pragmas_after_a_failure():
+    conn = sqlite3.connect(":memory:")
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    with pytest.raises(sqlite3.OperationalError):
+        load_dump(io.BytesIO(b"CREATE TABLE t (x);\nINSERT INTO missing VALUES (1);\n"), conn)
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+    assert not conn.in_transaction
@@ -0,0 +1,105 @@
+"""SQL guard: plan-based cost estimates, warn/reject thresholds and the row cap."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from core.sql_guard import QueryGuard, QueryTimeout, interruptible
+
+TABLE_ROWS = {"small": 9, "big": 500_000}
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(
+        "CREATE TABLE small (id INTEGER PRIMARY KEY, name TEXT);"
+        "CREATE TABLE big (id INTEGER PRIMARY KEY, small_id INTEGER, value REAL);"
+        "CREATE INDEX big_small ON big (small_id);"
+    )
+    conn.executemany("INSERT INTO small VALUES (?, ?)", [(i, f"name {i}") for i in range(9)])
+    conn.executemany("INSERT INTO big VALUES (?, ?, ?)", [(i, i % 9, i / 2) for i in range(1000)])
+    return conn
+
+
+def check(conn, sql, **guard):
+    return QueryGuard(**dict({"large_table_rows": 100_000}, **guard)).check(conn, sql, TABLE_ROWS)
+
+
+def test_aliased_tables_are_costed_as_their_table(conn):
+    plain = check(conn, "SELECT * FROM small JOIN big ON big.small_id = small.id WHERE small.id = 3")
+    aliased = check(conn, "SELECT * FROM small s JOIN big AS b ON b.small_id = s.id WHERE s.id = 3")
+    assert aliased.allowed
+    assert aliased.estimated_cost == plain.estimated_cost
+    assert aliased.estimated_cost < 1000
+    assert aliased.warnings == plain.warnings == []
+
+
+def test_alias_behind_a_join_keyword(conn):
+    decision = check(conn, "SELECT * FROM small JOIN big b ON b.small_id = small.id WHERE small.id = 3")
+    assert decision.warnings == []
+
+
+def test_cartesian_product_is_rejected(conn):
+    decision = check(conn, "SELECT * FROM big a, big b")
+    assert not decision.allowed
+    assert decision.estimated_cost == pytest.approx(500_000 + 500_000 ** 2)
+    assert "exceeds the limit" in decision.reason
+    assert any("cartesian product" in warning for warning in decision.warnings)
+
+
+def test_small_cartesian_product_only_warns(conn):
+    decision = check(conn, "SELECT * FROM small s, big b")
+    assert decision.allowed
+    assert any("full scan of b" in warning for warning in decision.warnings)
+    assert not any("of s " in warning for warning in decision.warnings)
+
+
+@pytest.mark.parametrize("large_table_rows, warned", [(500_000, True), (500_001, False)])
+def test_full_scan_warning_threshold(conn, large_table_rows, warned):
+    decision = check(conn, "SELECT * FROM big WHERE value > 3", large_table_rows=large_table_rows)
+    assert decision.allowed
+    assert bool(decision.warnings) == warned
+
+
+@pytest.mark.parametrize("max_cost, allowed", [(500_000, True), (499_999, False)])
+def test_reject_threshold(conn, max_cost, allowed):
+    decision = check(conn, "SELECT * FROM big WHERE value > 3", max_cost=max_cost)
+    assert decision.estimated_cost == 500_000
+    assert decision.allowed == allowed
+
+
+@pytest.mark.parametrize("sql, limit", [
+    ("SELECT * FROM big", 100),
+    ("SELECT * FROM big;", 100),
+    ("SELECT * FROM big; -- note", 100),
+    ("-- all rows\nSELECT * FROM big /* tail */ ;", 100),
+    ("SELECT * FROM big LIMIT 5; -- note", None),
+    ("SELECT * FROM big LIMIT 5000 -- too many\n;", 100),
+    ("WITH b AS (SELECT * FROM big) SELECT * FROM b", 100),
+])
+def test_row_cap(conn, sql, limit):
+    decision = check(conn, sql, max_rows=100)
+    assert decision.allowed
+    assert decision.limit_applied == limit
+    rows = conn.execute(decision.sql).fetchall()
+    assert len(rows) == (100 if limit else 5)
+
+
+def test_non_queries_are_not_capped(conn):
+    decision = check(conn, "PRAGMA table_info(big)", max_rows=1)
+    assert decision.allowed and decision.limit_applied is None
+
+
+def test_invalid_query_is_rejected(conn):
+    decision = check(conn, "SELECT * FROM missing")
+    assert not decision.allowed
+    assert decision.reason.startswith("invalid query")
+
+
+def test_interruptible_cancel(conn):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(QueryTimeout, match="cancelled"), interruptible(conn, timeout=None, cancel=cancel, ops=100):
+        conn.execute("SELECT COUNT(*) FROM big a, big b").fetchone()
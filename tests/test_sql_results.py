@@ -0,0 +1,101 @@
+"""Paged SQL results: subquery wrapping, its fallback, and guard interrupts."""
+
+import csv
+import io
+import sqlite3
+
+import pytest
+
+from core.sql_guard import QueryTimeout, interruptible
+from core.sql_results import ExportTooLarge, count_rows, export_bytes, export_csv, export_parquet, fetch_page
+
+SLOW_QUERY = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+    "SELECT i FROM n"
+)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(25)])
+    return conn
+
+
+@pytest.mark.parametrize("sql", ["SELECT x FROM t; -- note", "SELECT x FROM t /* a; b */ ;\n-- end"])
+def test_trailing_semicolons_and_comments_are_stripped(conn, sql):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert count_rows(conn, sql) == 25
+    assert statements[0].startswith("SELECT COUNT(*)")  # wrapped, not the cursor fallback
+    assert len(statements) == 1
+
+
+def test_pages_and_count(conn):
+    sql = "SELECT x FROM t ORDER BY x -- trailing comment;"
+    assert count_rows(conn, sql) == 25
+    columns, rows = fetch_page(conn, sql, page=2, page_size=10)
+    assert columns == ["x"]
+    assert rows == [(20,), (21,), (22,), (23,), (24,)]
+
+
+@pytest.mark.parametrize("sql, total", [("PRAGMA table_info(t)", 1), ("PRAGMA user_version", 1)])
+def test_statements_that_cant_be_wrapped_fall_back_to_the_cursor(conn, sql, total):
+    assert count_rows(conn, sql) == total
+    columns, rows = fetch_page(conn, sql, page=0, page_size=10)
+    assert len(rows) == total
+
+
+def test_errors_in_the_query_itself_propagate(conn):
+    with pytest.raises(sqlite3.OperationalError, match="no such column"):
+        count_rows(conn, "SELECT missing FROM t")
+
+
+@pytest.mark.parametrize("run", [
+    lambda conn: count_rows(conn, SLOW_QUERY),
+    lambda conn: fetch_page(conn, SLOW_QUERY + " ORDER BY i DESC", page=0),
+], ids=["count_rows", "fetch_page"])
+def test_timeout_is_not_retried_through_the_fallback(conn, run):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    with pytest.raises(QueryTimeout), interruptible(conn, timeout=0.05):
+        run(conn)
+    assert len(statements) == 1
+
+
+def test_csv_export_streams_every_row(conn):
+    output = io.BytesIO()
+    assert export_csv(conn, "SELECT x FROM t", output, batch_size=7) == 25
+    rows = list(csv.reader(io.StringIO(output.getvalue().decode("utf-8"))))
+    assert rows[0] == ["x"]
+    assert [int(x) for (x,) in rows[1:]] == list(range(25))
+
+
+@pytest.mark.parametrize("export", [export_csv, export_parquet], ids=["csv", "parquet"])
+def test_export_stops_past_max_bytes(conn, export):
+    if export is export_parquet:
+        pytest.importorskip("pyarrow")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(20000)])
+    output = io.BytesIO()
+    with pytest.raises(ExportTooLarge):
+        export(conn, "SELECT x, 'padding padding padding' AS y FROM t", output, batch_size=1000, max_bytes=20000)
+    assert not output.closed
+    assert output.tell() < 20000 + 50000  # stopped after about one batch past the limit
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_export_bytes_are_accepted_by_streamlit_downloads(conn, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    download_data = pytest.importorskip("streamlit.runtime.download_data_util")
+    data = export_bytes(conn, "SELECT x FROM t", file_format)
+    # What a deferred `st.download_button(data=callable)` does with the callable's result
+    converted, _ = download_data.convert_data_to_bytes_and_infer_mime(data, ValueError("unsupported type"))
+    assert converted == data
+    if file_format == "csv":
+        assert data.decode("utf-8").splitlines()[:2] == ["x", "0"]
+    else:
+        import pyarrow.parquet as pq
+
+        assert pq.read_table(io.BytesIO(data)).column("x").to_pylist() == list(range(25))
@@ -0,0 +1,97 @@
+"""Schema snapshots: introspection, fingerprint sharing and invalidation on change."""
+
+import shutil
+import sqlite3
+
+import pytest
+
+from core.sql_schema import SchemaCache, introspect
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, email TEXT NOT NULL UNIQUE);
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY,
+            customer_id INTEGER NOT NULL REFERENCES customers(id),
+            total REAL
+        );
+        CREATE INDEX orders_customer ON orders(customer_id);
+        """
+    )
+    conn.executemany("INSERT INTO customers (email) VALUES (?)", [(f"c{i}@example.com",) for i in range(5)])
+    conn.executemany("INSERT INTO orders (customer_id, total) VALUES (?, ?)", [(i % 5 + 1, i) for i in range(20)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_introspect_reports_keys_indexes_and_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        schema = introspect(conn)
+    assert list(schema) == ["customers", "orders"]
+    orders = schema["orders"]
+    assert orders["columns"] == ["id", "customer_id", "total"]
+    assert orders["types"] == ["INTEGER", "INTEGER", "REAL"]
+    assert orders["not_null"] == ["customer_id"]
+    assert orders["primary_key"] == ["id"]
+    assert orders["indexes"] == [{"name": "orders_customer", "columns": ["customer_id"], "unique": False}]
+    assert orders["foreign_keys"] == [{"columns": ["customer_id"], "table": "customers", "to_columns": ["id"]}]
+    assert orders["rows"] == 20
+    assert schema["customers"]["rows"] == 5
+    assert [index["unique"] for index in schema["customers"]["indexes"]] == [True]
+
+
+def test_row_counts_prefer_analyze_statistics(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM orders WHERE id > 2")  # MAX(rowid) stays 2, not 20
+        conn.execute("INSERT INTO orders (id, customer_id) VALUES (100, 1)")
+        conn.commit()
+        assert introspect(conn)["orders"]["rows"] == 100
+        conn.execute("ANALYZE")
+        assert introspect(conn)["orders"]["rows"] == 3
+
+
+def test_snapshot_is_shared_by_copies_of_the_same_file(db_path, tmp_path):
+    copy = str(tmp_path / "upload-copy.db")
+    shutil.copyfile(db_path, copy)
+    cache = SchemaCache()
+    with sqlite3.connect(db_path) as first, sqlite3.connect(copy) as second:
+        snapshot = cache.get(first, db_path)
+        assert cache.get(second, copy) is snapshot
+        assert cache.get(first, db_path) is snapshot
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["entries"]) == (1, 2, 1)
+    assert stats["files_hashed"] == 2  # the unchanged file is not rehashed
+
+
+def test_schema_change_invalidates_the_snapshot(db_path):
+    cache = SchemaCache()
+    with sqlite3.connect(db_path) as conn:
+        before = cache.get(conn, db_path)
+        fingerprint = cache.fingerprint(conn, db_path)
+        conn.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+        conn.commit()
+        assert cache.fingerprint(conn, db_path) != fingerprint
+        after = cache.get(conn, db_path)
+    assert after is not before
+    assert after["orders"]["columns"] == ["id", "customer_id", "total", "status"]
+    assert before["orders"]["columns"] == ["id", "customer_id", "total"]
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_snapshot_is_evicted(db_path, tmp_path):
+    cache = SchemaCache(max_entries=1)
+    other = str(tmp_path / "other.db")
+    with sqlite3.connect(other) as conn:
+        conn.execute("CREATE TABLE t (x)")
+    with sqlite3.connect(db_path) as shop, sqlite3.connect(other) as conn:
+        cache.get(shop, db_path)
+        cache.get(conn, other)
+        cache.get(shop, db_path)
+    stats = cache.stats()
+    assert (stats["misses"], stats["evictions"], stats["entries"]) == (3, 2, 1)
@@ -0,0 +1,134 @@
+"""SQLite connection pools: reuse, size limit, idle closing and the background sweep."""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from core.sqlite_pool import SQLitePools
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_sweeper_closes_idle_connections_without_new_requests(db_path):
+    pools = SQLitePools(idle_timeout=0.05)
+    pools.start_sweeper(interval=0.02)
+    try:
+        with pools.connection(db_path) as conn:
+            assert conn.execute("SELECT x FROM t").fetchone() == (1,)
+        assert pools.stats()["idle"] == 1
+        assert wait_for(lambda: pools.stats()["pools"] == 0)
+        assert pools.stats()["closed_idle"] == 1
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")  # closed by the sweeper
+    finally:
+        pools.stop_sweeper()
+
+
+def test_connections_are_reused(db_path):
+    pools = SQLitePools()
+    with pools.connection(db_path) as first:
+        pass
+    with pools.connection(db_path) as second:
+        assert second is first
+    stats = pools.stats()
+    assert (stats["opened"], stats["reused"], stats["idle"], stats["in_use"]) == (1, 1, 1, 0)
+
+
+def test_readonly_connections_cannot_write(db_path):
+    pools = SQLitePools()
+    with pools.connection(db_path) as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO t VALUES (2)")
+    with pools.connection(db_path, readonly=False) as conn:
+        conn.execute("INSERT INTO t VALUES (2)")
+        conn.commit()
+    assert pools.stats()["pools"] == 2
+
+
+def test_pool_size_bounds_open_connections(db_path):
+    pool = SQLitePools(size=2).pool(db_path)
+    with pool.connection() as first, pool.connection() as second:
+        assert first is not second
+        with pytest.raises(TimeoutError):
+            with pool.connection(timeout=0.05):
+                pass
+    assert pool.stats()["waits"] >= 1
+    assert pool.stats()["opened"] == 2
+
+
+def test_waiter_gets_the_connection_returned_by_another_thread(db_path):
+    pool = SQLitePools(size=1).pool(db_path)
+    release = threading.Event()
+    checked_out = threading.Event()
+
+    def holder():
+        with pool.connection():
+            checked_out.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    assert checked_out.wait(5)
+    threading.Timer(0.05, release.set).start()
+    with pool.connection(timeout=5) as conn:
+        assert conn.execute("SELECT x FROM t").fetchone() == (1,)
+    thread.join(5)
+    assert pool.stats()["opened"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return(db_path):
+    pools = SQLitePools(size=1)
+    with pools.connection(db_path, readonly=False) as conn:
+        conn.execute("INSERT INTO t VALUES (2)")
+    with pools.connection(db_path, readonly=False) as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+
+def test_idle_connections_close_after_the_timeout(db_path):
+    pools = SQLitePools(idle_timeout=60)
+    with pools.connection(db_path):
+        pass
+    assert pools.close_idle(now=time.time() + 30) == 0
+    assert pools.stats()["idle"] == 1
+    assert pools.close_idle(now=time.time() + 61) == 1
+    stats = pools.stats()
+    assert (stats["pools"], stats["idle"], stats["closed_idle"], stats["opened"]) == (0, 0, 1, 1)
+
+
+def test_checked_out_connections_are_not_closed_as_idle(db_path):
+    pools = SQLitePools(idle_timeout=60)
+    with pools.connection(db_path) as conn:
+        assert pools.close_idle(now=time.time() + 120) == 0
+        assert conn.execute("SELECT x FROM t").fetchone() == (1,)
+    assert pools.stats()["pools"] == 1
+
+
+def test_release_closes_the_pools_for_a_file(db_path):
+    pools = SQLitePools()
+    with pools.connection(db_path) as conn:
+        pass
+    pools.release(db_path)
+    assert pools.stats()["pools"] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
@@ -0,0 +1,183 @@
+"""Index types load memory-mapped; loaded indexes are cached, namespaced and reused."""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from core.embeddings import HashingEmbeddings  # noqa: E402
+from core.vector_index import (  # noqa: E402
+    INDEX_SPECS,
+    IndexBuilder,
+    IndexCache,
+    IndexNamespaces,
+    docset_fingerprint,
+    read_store,
+    write_atomic,
+)
+
+DIM = 32
+PARAMS = {"chunk_size": 1000, "embeddings": "hashing"}
+# Enough vectors that ivf-pq really builds PQ (it falls back to IVF-Flat below 256*39)
+VECTORS = 10_000
+
+
+@pytest.fixture(scope="module")
+def pairs():
+    import numpy as np
+
+    vectors = np.random.default_rng(0).standard_normal((VECTORS, DIM)).astype(np.float32)
+    return [(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)]
+
+
+def small_store(texts):
+    embeddings = HashingEmbeddings(dim=DIM)
+    builder = IndexBuilder(embeddings, "flat")
+    builder.add([(text, embeddings.embed_query(text)) for text in texts])
+    return builder.finish()
+
+
+@pytest.mark.parametrize("spec", sorted(INDEX_SPECS))
+def test_index_loads_memory_mapped(spec, pairs, tmp_path):
+    embeddings = HashingEmbeddings(dim=DIM)
+    builder = IndexBuilder(embeddings, spec)
+    builder.add(pairs)
+    store = builder.finish()
+    if spec.startswith("ivf"):
+        assert builder.factory.startswith("IVF")
+    if spec == "ivf-pq":
+        assert "PQ" in builder.factory
+    path = str(tmp_path / spec)
+    write_atomic(store, path)
+
+    loaded = read_store(path, embeddings, mmap=True)
+    assert loaded.index.ntotal == VECTORS
+    found = loaded.similarity_search_by_vector(pairs[123][1], k=4)
+    assert len(found) == 4
+    if spec != "ivf-pq":  # PQ is lossy; the others find the exact vector
+        assert found[0].page_content == "chunk 123"
+
+
+def test_cache_serves_repeat_loads_from_memory(tmp_path):
+    path = str(tmp_path / "index")
+    write_atomic(small_store(["a", "b"]), path)
+    cache = IndexCache()
+    embeddings = HashingEmbeddings(dim=DIM)
+
+    first = cache.load(path, embeddings)
+    assert cache.load(path, embeddings) is first
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_reloads_an_index_rewritten_on_disk(tmp_path):
+    path = str(tmp_path / "index")
+    write_atomic(small_store(["a", "b"]), path)
+    cache = IndexCache()
+    embeddings = HashingEmbeddings(dim=DIM)
+    first = cache.load(path, embeddings)
+
+    # Rewritten behind the cache's back (e.g. by another worker process)
+    write_atomic(small_store(["a", "b", "c"]), path)
+    reloaded = cache.load(path, embeddings)
+    assert reloaded is not first
+    assert reloaded.index.ntotal == 3
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_save_replaces_the_cached_entry(tmp_path):
+    path = str(tmp_path / "index")
+    cache = IndexCache()
+    store = small_store(["a", "b", "c"])
+    cache.save(store, path)
+    assert cache.load(path, HashingEmbeddings(dim=DIM)) is store
+    assert cache.stats()["misses"] == 0
+
+
+def test_cache_evicts_least_recently_used_over_budget(tmp_path):
+    embeddings = HashingEmbeddings(dim=DIM)
+    paths = [str(tmp_path / name) for name in "abc"]
+    for path in paths:
+        write_atomic(small_store(["x", "y"]), path)
+    probe = IndexCache()
+    probe.load(paths[0], embeddings)
+    cache = IndexCache(max_bytes=probe.stats()["bytes"] * 2)
+
+    cache.load(paths[0], embeddings)
+    cache.load(paths[1], embeddings)
+    cache.load(paths[0], embeddings)  # paths[1] is now least recently used
+    cache.load(paths[2], embeddings)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+    cache.load(paths[0], embeddings)
+    assert cache.stats()["misses"] == 3  # paths[0] stayed cached
+    cache.load(paths[1], embeddings)
+    assert cache.stats()["misses"] == 4
+
+
+def test_cache_invalidate_forces_a_reload(tmp_path):
+    path = str(tmp_path / "index")
+    write_atomic(small_store(["a"]), path)
+    cache = IndexCache()
+    embeddings = HashingEmbeddings(dim=DIM)
+    first = cache.load(path, embeddings)
+    cache.invalidate(path)
+    assert cache.load(path, embeddings) is not first
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_fingerprint_ignores_document_order_and_duplicates():
+    assert docset_fingerprint(["b", "a", "a"], PARAMS) == docset_fingerprint(["a", "b"], PARAMS)
+    assert docset_fingerprint(["a", "b"], PARAMS) != docset_fingerprint(["a"], PARAMS)
+    assert docset_fingerprint(["a"], PARAMS) != docset_fingerprint(["a"], dict(PARAMS, chunk_size=500))
+
+
+def test_namespaces_are_separate_per_session_and_document_set(tmp_path):
+    namespaces = IndexNamespaces(root=str(tmp_path), cache=IndexCache())
+    one = namespaces.save(small_store(["a"]), "session-1", ["doc-a"], PARAMS)
+    two = namespaces.save(small_store(["a"]), "session-2", ["doc-a"], PARAMS)
+    three = namespaces.save(small_store(["a", "b"]), "session-1", ["doc-a", "doc-b"], PARAMS)
+    assert len({one, two, three}) == 3
+    assert one == namespaces.path("session-1", ["doc-a"], PARAMS)
+    assert namespaces.manifest(three)["documents"] == ["doc-a", "doc-b"]
+
+
+def test_index_is_reusable_only_when_documents_are_added(tmp_path):
+    namespaces = IndexNamespaces(root=str(tmp_path), cache=IndexCache())
+    path = namespaces.save(small_store(["a"]), "session", ["doc-a"], PARAMS)
+    assert namespaces.reusable(path, ["doc-a", "doc-b"], PARAMS) == {"doc-a"}
+    assert namespaces.reusable(path, ["doc-a"], PARAMS) == {"doc-a"}
+    assert namespaces.reusable(path, ["doc-b"], PARAMS) is None  # doc-a was removed
+    assert namespaces.reusable(path, ["doc-a", "doc-b"], dict(PARAMS, chunk_size=500)) is None
+    assert namespaces.reusable(None, ["doc-a"], PARAMS) is None
+
+
+def test_writable_load_is_a_private_copy(tmp_path):
+    cache = IndexCache()
+    namespaces = IndexNamespaces(root=str(tmp_path), cache=cache)
+    embeddings = HashingEmbeddings(dim=DIM)
+    path = namespaces.save(small_store(["a"]), "session", ["doc-a"], PARAMS)
+    shared = namespaces.load(path, embeddings)
+    copy = namespaces.load(path, embeddings, writable=True)
+    assert copy is not shared
+    copy.add_embeddings([("b", embeddings.embed_query("b"))])
+    assert shared.index.ntotal == 1
+
+
+def test_cleanup_removes_only_idle_namespaces(tmp_path):
+    namespaces = IndexNamespaces(root=str(tmp_path), ttl=60, cache=IndexCache())
+    idle = namespaces.save(small_store(["a"]), "idle-session", ["doc-a"], PARAMS)
+    active = namespaces.save(small_store(["a"]), "active-session", ["doc-a"], PARAMS)
+    now = time.time()
+    os.utime(idle, (now - 120, now - 120))
+    os.utime(active, (now - 30, now - 30))
+
+    assert namespaces.cleanup(now=now) == 1
+    assert not os.path.exists(idle)
+    assert not os.path.exists(os.path.dirname(idle))  # empty session directory removed too
+    assert os.path.isdir(active)